@@ -1,18 +1,43 @@
+import argparse
 import os
 
 import gtk
 
 from EPLaunchLite.EPLaunchLiteWindow import Window
-from EPLaunchLite.Settings import load_settings, save_settings
+from EPLaunchLite.EnergyPlusInstalls import InstallationIndex
+from EPLaunchLite.PreprocessCache import PreprocessCache
+from EPLaunchLite.ResultCache import ResultCache
+from EPLaunchLite.Settings import Keys, load_settings, save_settings
+from EPLaunchLite.VersionCache import VersionCache
+from EPLaunchLite.WeatherLibrary import WeatherLibrary
+
+# parse known arguments only, since app bundles may pass along extra platform specific arguments
+parser = argparse.ArgumentParser(description="EP-Launch-Lite")
+parser.add_argument('--no-cache', action='store_true', help="always re-run simulations instead of reusing results")
+args, _unknown = parser.parse_known_args()
 
 # once done doing any preliminary processing, actually run the application
 this_settings_file_name = os.path.join(os.path.expanduser("~"), ".eplaunchlite.json")
+this_result_cache = None
+this_preprocess_cache = None
+if not args.no_cache:
+    this_result_cache = ResultCache(os.path.join(os.path.expanduser("~"), ".eplaunchlite_cache"))
+    this_preprocess_cache = PreprocessCache(os.path.join(os.path.expanduser("~"), ".eplaunchlite_preprocess"))
+this_version_cache = VersionCache(os.path.join(os.path.expanduser("~"), ".eplaunchlite_versions.json"))
+this_install_index_file_name = os.path.join(os.path.expanduser("~"), ".eplaunchlite_installs.json")
+this_weather_cache_dir = os.path.join(os.path.expanduser("~"), ".eplaunchlite_weather")
+this_weather_library_file_name = os.path.join(os.path.expanduser("~"), ".eplaunchlite_weather_library.json")
 
 # we will keep the form in a loop to handle requested restarts (language change, etc.)
 running = True
 while running:
     this_settings = load_settings(this_settings_file_name)
-    main_window = Window(this_settings)
+    this_install_index = InstallationIndex(this_install_index_file_name, this_settings[Keys.install_roots])
+    this_weather_library = WeatherLibrary(this_weather_library_file_name, this_settings[Keys.weather_folders])
+    main_window = Window(
+        this_settings, this_result_cache, this_version_cache, this_install_index, this_weather_cache_dir,
+        this_weather_library, this_preprocess_cache
+    )
     gtk.main()
     save_settings(main_window.settings, this_settings_file_name)
     running = main_window.doing_restart
@@ -0,0 +1,290 @@
+"""
+This module runs simulations as asyncio subprocesses, so a service can await hundreds of them from one event loop
+
+Where EnergyPlusThread spends an OS thread on every run and reports through callbacks meant for a GUI main loop, an
+AsyncSimulation is awaited, streams its output and progress through async iterators, and is cancelled by cancelling
+the task that awaits it.  Either way a run ends up in the same SimulationJob structure.  This module needs python 3.6
+or newer, and is never imported by the GUI or the threaded runner.
+"""
+
+import asyncio
+import collections
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+from EnergyPlusThread import EnergyPlusThread, SimulationCommand
+from ErrorFileParser import ErrorFileParser
+from ProcessGroup import HAS_PROC, IS_WINDOWS, live_group_members, new_group_kwargs, signal_group
+from ProgressParser import ProgressParser
+from RunMetrics import RunMetrics
+from RunMode import RunMode
+from SimulationQueue import JobStatus, SimulationJob
+
+# ends every output and progress iterator once the simulation has finished
+_END = object()
+
+# the longest output line read whole, since the asyncio stream reader refuses lines beyond its limit
+_LINE_LIMIT = 1024 * 1024
+
+
+class AsyncSimulation(SimulationCommand):
+    """
+    This class runs a single EnergyPlus simulation on the running asyncio event loop
+
+    Output lines and progress are handed to every iterator created before they arrive, and each iterator buffers them
+    until it is read, so a consumer that stops reading should break out of its loop rather than just stop iterating.
+    """
+
+    def __init__(self, run_script, input_file, weather_file, run_dir=None, result_cache=None, run_dir_allocator=None,
+                 limits=None, max_output_lines=1000, job_id=1, preprocess_cache=None, run_mode=RunMode.Annual):
+        """
+        * run_script: The EnergyPlus executable
+        * input_file: The path to the input file to simulate
+        * weather_file: The path to the weather file to simulate with
+        * run_dir: The folder for the output, defaulting to an output folder next to the input file
+        * result_cache: An optional ResultCache, so identical simulations are only run once
+        * run_dir_allocator: An optional RunDirectoryAllocator giving the run a unique folder
+        * limits: An optional ResourceLimits for the simulation process
+        * max_output_lines: The number of trailing stdout lines kept in the result
+        * job_id: The id given to the resulting SimulationJob
+        * preprocess_cache: An optional PreprocessCache, so unchanged inputs are only expanded once
+        * run_mode: One of the RunMode constants, to stop after the design days or the sizing calculations
+        """
+        self.run_script = run_script
+        self.input_file = input_file
+        self.weather_file = weather_file
+        self.requested_run_dir = run_dir
+        self.result_cache = result_cache
+        self.preprocess_cache = preprocess_cache
+        self.run_dir_allocator = run_dir_allocator
+        self.limits = limits
+        self.max_output_lines = max_output_lines
+        self.run_mode = run_mode
+        self.run_dir = ''
+        self.process = None
+        self.std_err = None
+        self.error_report = None
+        self.job = SimulationJob(job_id, input_file, weather_file, run_script, run_dir, limits)
+        self._line_queues = []
+        self._progress_queues = []
+        self._finished = False
+        self.preprocess_cancel = threading.Event()
+
+    def lines(self):
+        """
+        This function iterates the stdout and stderr lines of the simulation as they are written
+
+        * Returns: An async iterator of lines, without their trailing newlines, ending when the simulation does
+        """
+        return self._subscribe(self._line_queues)
+
+    def progress(self):
+        """
+        This function iterates the progress of the simulation as it is reported
+
+        * Returns: An async iterator of SimulationProgress instances, ending when the simulation does
+        """
+        return self._subscribe(self._progress_queues)
+
+    def _subscribe(self, subscribers):
+        # the queue is registered right away, rather than when iteration starts, so nothing written in between is lost
+        queue = asyncio.Queue()
+        if self._finished:
+            queue.put_nowait(_END)
+        else:
+            subscribers.append(queue)
+        return self._drain(queue, subscribers)
+
+    @staticmethod
+    async def _drain(queue, subscribers):
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                yield item
+        finally:
+            if queue in subscribers:
+                subscribers.remove(queue)
+
+    @staticmethod
+    def _publish(subscribers, item):
+        for queue in subscribers:
+            queue.put_nowait(item)
+
+    async def run(self):
+        """
+        This function runs the simulation to completion
+
+        If the awaiting task is cancelled, the whole process group of the simulation is terminated, escalating to a
+        kill after EnergyPlusThread.TerminateTimeout seconds, before the cancellation is passed on.  The job is then
+        left with the cancelled status.
+
+        * Returns: The finished SimulationJob, with the succeeded or failed status
+        """
+        self.job.status = JobStatus.Running
+        try:
+            return await self._run()
+        finally:
+            self._finished = True
+            self._publish(self._line_queues, _END)
+            self._publish(self._progress_queues, _END)
+
+    async def _run(self):
+        base_file_name = os.path.splitext(os.path.basename(self.input_file))[0]
+        cache_key = self.get_cache_key()
+        allocated = self.choose_run_dir(base_file_name)
+        std_out = None if cache_key is None else self.restore_cached(cache_key)
+        if std_out is not None:
+            self._parse_error_file(base_file_name)
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, True)
+            return self._finish(JobStatus.Succeeded, std_out, RunMetrics.read(self.run_dir))
+        try:
+            os.remove(self.get_error_file_path(base_file_name))
+        except OSError:
+            pass
+        # expanding an input on a cache miss runs the preprocessing tools, which must not hold up the event loop
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self.preprocess)
+        except asyncio.CancelledError:
+            # the executor thread cannot be interrupted, so the preprocessing tools are told to stop instead
+            self.preprocess_cancel.set()
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, False)
+            self._parse_error_file(base_file_name)
+            self._finish(JobStatus.Cancelled, None, None)
+            raise
+        self.prepare_run_mode()
+        progress_parser = ProgressParser(self.get_run_period_days())
+        std_out_tail = collections.deque(maxlen=self.max_output_lines)
+        std_err_tail = collections.deque(maxlen=self.max_output_lines)
+        start_time = time.time()
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.get_command(base_file_name),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                limit=_LINE_LIMIT,
+                **new_group_kwargs(None if self.limits is None else self.limits.apply))
+        except BaseException as e:
+            # the executable could not be started, or the task was cancelled first, so the run ends here
+            self.clean_up_run_mode()
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, False)
+            self._parse_error_file(base_file_name)
+            self._finish(JobStatus.Cancelled if isinstance(e, asyncio.CancelledError) else JobStatus.Failed, None, None)
+            raise
+        status = None
+        try:
+            await asyncio.gather(self._pump(self.process.stdout, std_out_tail, progress_parser),
+                                 self._pump(self.process.stderr, std_err_tail, progress_parser))
+            await self.process.wait()
+        except asyncio.CancelledError:
+            status = JobStatus.Cancelled
+            await self._terminate()
+            raise
+        finally:
+            self.clean_up_run_mode()
+            if status is None:
+                status = JobStatus.Succeeded if self.process.returncode == 0 else JobStatus.Failed
+            # the child watcher reaps the process, so only the wall time and return code can be measured here
+            metrics = RunMetrics(time.time() - start_time, self.process.returncode)
+            try:
+                metrics.write(self.run_dir)
+            except (IOError, OSError):
+                pass
+            self.std_err = '\n'.join(std_err_tail)
+            self._parse_error_file(base_file_name)
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, status == JobStatus.Succeeded)
+            std_out = '\n'.join(std_out_tail)
+            if status == JobStatus.Succeeded and cache_key is not None:
+                try:
+                    self.result_cache.store(cache_key, self.run_dir, std_out)
+                except (IOError, OSError, shutil.Error):
+                    pass  # a failure to cache the results should never turn a good run into a failed one
+            self._finish(status, None if status == JobStatus.Cancelled else std_out, metrics)
+        return self.job
+
+    async def _pump(self, stream, tail, progress_parser):
+        while True:
+            raw_line = await stream.readline()
+            if not raw_line:
+                return
+            line = raw_line.decode('utf-8', 'replace').rstrip('\r\n')
+            tail.append(line)
+            self._publish(self._line_queues, line)
+            progress = progress_parser.parse_line(line)
+            if progress is not None:
+                self.job.progress = progress
+                self._publish(self._progress_queues, progress)
+
+    def _group_alive(self):
+        if IS_WINDOWS:
+            return self.process.returncode is None
+        if HAS_PROC:
+            return bool(live_group_members(self.process.pid))
+        return self.process.returncode is None or signal_group(self.process, 0)
+
+    async def _wait_for_group(self, timeout):
+        deadline = time.time() + timeout
+        while self._group_alive():
+            if time.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def _terminate(self):
+        # the same terminate, wait, then kill sequence as ProcessGroup.terminate_group, without blocking the loop
+        if IS_WINDOWS:
+            taskkill = await asyncio.create_subprocess_exec('taskkill', '/T', '/F', '/PID', str(self.process.pid),
+                                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            await taskkill.wait()
+        elif signal_group(self.process, signal.SIGTERM):
+            if not await self._wait_for_group(EnergyPlusThread.TerminateTimeout):
+                for _ in range(5):
+                    signal_group(self.process, signal.SIGKILL)
+                    if await self._wait_for_group(1.0):
+                        break
+        await self.process.wait()
+
+    def _parse_error_file(self, base_file_name):
+        self.error_report = ErrorFileParser()
+        try:
+            self.error_report.parse_file(self.get_error_file_path(base_file_name))
+        except (IOError, OSError):
+            pass
+
+    def _finish(self, status, std_out, metrics):
+        self.job.status = status
+        self.job.std_out = std_out
+        self.job.run_dir = self.run_dir
+        self.job.metrics = metrics
+        self.job.error_counts = dict(self.error_report.counts)
+        return self.job
+
+
+async def run_many(simulations, max_concurrent=None):
+    """
+    This function runs many simulations concurrently on the running event loop
+
+    Cancelling the task awaiting this function cancels every simulation that is still running or waiting to start.
+
+    * simulations: An iterable of AsyncSimulation instances
+    * max_concurrent: The maximum number of simulations running at once, or None for no limit
+    * Returns: The list of finished SimulationJob instances, in the same order as the simulations
+    """
+    simulations = list(simulations)
+    if max_concurrent is None:
+        return list(await asyncio.gather(*[simulation.run() for simulation in simulations]))
+    slots = asyncio.Semaphore(max_concurrent)
+
+    async def run_in_slot(simulation):
+        async with slots:
+            return await simulation.run()
+    return list(await asyncio.gather(*[run_in_slot(simulation) for simulation in simulations]))
@@ -0,0 +1,94 @@
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+# identifies the file layout, and changes whenever it does
+MAGIC = b'EPLCOL02'
+
+
+def column_bytes(column):
+    """
+    This function gets the raw bytes of a column of doubles
+
+    * column: An array.array or memoryview of doubles
+    * Returns: The bytes of the column in native byte order
+    """
+    # array.tobytes only exists from python 3.2, where tostring is deprecated
+    if hasattr(column, 'tobytes'):
+        return column.tobytes()
+    return column.tostring()
+
+
+def write_columns(file_path, columns, meta=None):
+    """
+    This function writes named columns of doubles to a binary column file, replacing any existing file atomically
+
+    The file is a short json header followed by the raw column data, padded so every column starts on an eight byte
+    boundary and can be viewed in place once the file is memory-mapped.
+
+    * file_path: The path of the column file to write
+    * columns: A dictionary of column name to an array.array or memoryview of doubles; columns may differ in length
+    * meta: An optional json serializable dictionary stored with the columns, such as a signature of the source file
+    """
+    names = sorted(columns)
+    header = json.dumps({
+        'meta': meta,
+        'byteorder': sys.byteorder,
+        'names': names,
+        'lengths': [len(columns[name]) for name in names],
+    }).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+    folder = os.path.dirname(file_path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for name in names:
+            f.write(column_bytes(columns[name]))
+    os.rename(temp_path, file_path)
+
+
+def read_columns(file_path):
+    """
+    This function memory-maps a column file written by write_columns
+
+    * file_path: The path of the column file
+    * Returns: A (meta, columns) tuple, where each column is a read-only sequence of doubles viewing the mapped file,
+      or None if the file is missing, damaged, or was written on a machine with a different byte order
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        return None
+    start = len(MAGIC) + 4
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        header_length = struct.unpack('<I', mapped[len(MAGIC):start])[0]
+        header = json.loads(mapped[start:start + header_length].decode('utf-8'))
+        if header['byteorder'] != sys.byteorder:
+            return None
+        names = header['names']
+        lengths = header['lengths']
+    except (ValueError, KeyError, struct.error):
+        return None
+    offset = start + header_length
+    if len(mapped) != offset + 8 * sum(lengths):
+        return None
+    columns = {}
+    for name, length in zip(names, lengths):
+        size = length * 8
+        try:
+            # view the mapped bytes directly, so a column costs nothing until it is actually read
+            columns[name] = memoryview(mapped)[offset:offset + size].cast('d')
+        except (AttributeError, TypeError):
+            columns[name] = array.array('d', mapped[offset:offset + size])
+        offset += size
+    return header['meta'], columns
@@ -0,0 +1,577 @@
+"""
+This module is the headless command line interface to EP-Launch-Lite, run as `python -m EPLaunchLite`
+
+It reuses the simulation, installation, and settings modules but deliberately never imports gtk or any module that
+does, so it can run on machines without a display or a GUI toolkit.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from EnergyPlusInstalls import InstallationIndex
+from ErrorFileParser import Severity
+from FileWatcher import FileWatcher, watched_files
+from ParametricSweep import ParametricSweep
+from PostProcessing import PostProcessPool
+from PreprocessCache import PreprocessCache
+from ResultCache import ResultCache
+from ResourceLimits import IOClass, ResourceLimits
+from ResultsFile import open_results
+from RunDirectories import RunDirectoryAllocator
+from RunMode import RunMode
+from Settings import Keys, load_settings
+from SimulationQueue import JobStatus, SimulationQueue
+from SQLResults import RunSet
+from WeatherFile import WeatherFile
+from WeatherLibrary import WeatherLibrary
+
+
+class ExitCodes:
+    Success = 0
+    SimulationFailed = 1
+    UsageError = 2
+    EnergyPlusNotFound = 3
+    Cancelled = 130
+
+
+def home_file(name):
+    return os.path.join(os.path.expanduser("~"), name)
+
+
+class UsageError(Exception):
+    pass
+
+
+def read_manifest(manifest_file_name):
+    """
+    This function reads a batch manifest, a json list of {"idf": ..., "epw": ...} objects, optionally wrapped in an
+    object under a "jobs" key; relative paths are resolved against the folder holding the manifest
+
+    * manifest_file_name: The path to the manifest file
+    * Returns: A list of (input_file, weather_file) tuples
+    """
+    try:
+        with open(manifest_file_name) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError) as e:
+        raise UsageError("Could not read manifest %s: %s" % (manifest_file_name, e))
+    if isinstance(manifest, dict):
+        manifest = manifest.get('jobs', [])
+    base_dir = os.path.dirname(os.path.abspath(manifest_file_name))
+    pairs = []
+    for entry in manifest:
+        try:
+            pairs.append((os.path.join(base_dir, entry['idf']), os.path.join(base_dir, entry['epw'])))
+        except (KeyError, TypeError):
+            raise UsageError("Every manifest entry needs both an idf and an epw: %s" % json.dumps(entry))
+    return pairs
+
+
+def find_run_script(args, settings):
+    """
+    This function picks the EnergyPlus executable for a command line run
+
+    * args: The parsed command line arguments
+    * settings: The loaded settings dictionary, providing the installation roots
+    * Returns: The path to the EnergyPlus executable, or None if no matching installation was found
+    """
+    if args.energyplus:
+        return args.energyplus
+    index = InstallationIndex(home_file(".eplaunchlite_installs.json"), settings[Keys.install_roots])
+    if args.version:
+        install = index.find_version(args.version)
+    else:
+        install = index.latest()
+    if install is None:
+        return None
+    return install.run_script
+
+
+def is_executable(run_script):
+    return os.path.isfile(run_script) and os.access(run_script, os.X_OK)
+
+
+def locate_run_script(args, settings):
+    """
+    This function finds the EnergyPlus executable for a command line run and checks that it can be started, reporting
+    the problem on stderr if not
+
+    * args: The parsed command line arguments
+    * settings: The loaded settings dictionary, providing the installation roots
+    * Returns: The path to the EnergyPlus executable, or None if there is none that can be run
+    """
+    run_script = find_run_script(args, settings)
+    if run_script is None:
+        sys.stderr.write("Could not find an EnergyPlus installation\n")
+        return None
+    if not is_executable(run_script):
+        sys.stderr.write("EnergyPlus executable not found or not executable: %s\n" % run_script)
+        return None
+    return run_script
+
+
+def wait_for_jobs(queue, quiet):
+    """
+    This function waits for the queue to drain, cancelling everything on a keyboard interrupt
+
+    * queue: The SimulationQueue running the jobs
+    * quiet: True to suppress the interruption message written to stderr
+    * Returns: True if the run finished normally, or False if it was interrupted
+    """
+    try:
+        # wait in short slices so that a keyboard interrupt is delivered promptly on every platform, and so a job
+        # whose thread died without reporting back is failed rather than waited on forever
+        while not queue.wait(0.5):
+            queue.fail_stalled()
+    except KeyboardInterrupt:
+        if not quiet:
+            sys.stderr.write("Interrupted, cancelling simulations\n")
+        queue.cancel_all()
+        queue.wait()
+        return False
+    return True
+
+
+def get_result_cache(args):
+    return None if args.no_cache else ResultCache(home_file(".eplaunchlite_cache"))
+
+
+def get_preprocess_cache(args):
+    return None if args.no_cache else PreprocessCache(home_file(".eplaunchlite_preprocess"))
+
+
+def job_status_printer(args):
+    def job_status(job):
+        if not args.quiet:
+            sys.stderr.write("[%s] %s: %s\n" % (job.job_id, job.status, os.path.basename(job.input_file)))
+    return job_status
+
+
+def queue_resource_options(args):
+    """
+    This function turns the resource command line options into SimulationQueue keyword arguments
+
+    * args: The parsed command line arguments
+    * Returns: A dictionary with the limits, job_memory, and pin_cpus arguments
+    """
+    megabyte = 1024 * 1024
+    limits = None
+    if any(value is not None for value in (args.nice, args.ionice, args.memory_limit, args.cpu_time_limit)):
+        try:
+            limits = ResourceLimits(nice=args.nice,
+                                    io_class=None if args.ionice is None else IOClass.Names[args.ionice],
+                                    memory_bytes=None if args.memory_limit is None else args.memory_limit * megabyte,
+                                    cpu_seconds=args.cpu_time_limit)
+        except ValueError as e:
+            raise UsageError("Invalid resource limit: %s" % e)
+    return {
+        'limits': limits,
+        'job_memory': None if args.job_memory is None else args.job_memory * megabyte,
+        'pin_cpus': args.pin_cpus,
+    }
+
+
+def queue_post_processing_options(args):
+    """
+    This function turns the --csv command line option into SimulationQueue keyword arguments
+
+    * args: The parsed command line arguments
+    * Returns: A dictionary with the defer_post_processing and post_process_pool arguments
+    """
+    if args.csv == 'background':
+        return {'defer_post_processing': True, 'post_process_pool': PostProcessPool(args.csv_jobs)}
+    return {'defer_post_processing': args.csv == 'on-demand', 'post_process_pool': None}
+
+
+def wait_for_post_processing(queue, quiet):
+    if queue.post_process_pool is None:
+        return
+    if not quiet:
+        sys.stderr.write("Waiting for csv conversion to finish\n")
+    try:
+        while not queue.post_process_pool.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        pass  # the simulations are done, so their results are reported without the remaining csv files
+
+
+def exit_code_for(queue, completed):
+    if not completed:
+        return ExitCodes.Cancelled
+    if any(job.status != JobStatus.Succeeded for job in queue.jobs):
+        return ExitCodes.SimulationFailed
+    return ExitCodes.Success
+
+
+def command_run(args):
+    pairs = []
+    if args.idf or args.epw:
+        if not (args.idf and args.epw):
+            raise UsageError("Both an input file and a weather file are required")
+        pairs.append((args.idf, args.epw))
+    if args.manifest:
+        pairs.extend(read_manifest(args.manifest))
+    if not pairs:
+        raise UsageError("Nothing to run, give an input and weather file or a manifest")
+    for input_file, weather_file in pairs:
+        for file_path in (input_file, weather_file):
+            if not os.path.exists(file_path):
+                raise UsageError("File does not exist: %s" % file_path)
+
+    settings = load_settings(home_file(".eplaunchlite.json"))
+    run_script = locate_run_script(args, settings)
+    if run_script is None:
+        return ExitCodes.EnergyPlusNotFound
+
+    # the same input may appear many times in a manifest, so every job gets its own run directory, and every one of
+    # them is kept, since the output reports them all
+    allocator = RunDirectoryAllocator(keep_runs=settings[Keys.keep_runs], max_bytes=settings[Keys.max_run_bytes],
+                                      keep_own_runs=True)
+    queue = SimulationQueue(run_script, args.jobs, job_callback=job_status_printer(args),
+                            result_cache=get_result_cache(args), preprocess_cache=get_preprocess_cache(args),
+                            run_dir_allocator=allocator, run_mode=args.mode,
+                            **dict(queue_resource_options(args), **queue_post_processing_options(args)))
+    queue.submit_many(pairs)
+    completed = wait_for_jobs(queue, args.quiet)
+    if completed:
+        wait_for_post_processing(queue, args.quiet)
+
+    json.dump({
+        'energyplus': run_script,
+        'summary': queue.status_counts(),
+        'jobs': [job.to_dict() for job in queue.jobs],
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return exit_code_for(queue, completed)
+
+
+def command_watch(args):
+    for file_path in (args.idf, args.epw):
+        if not os.path.exists(file_path):
+            raise UsageError("File does not exist: %s" % file_path)
+    if args.debounce < 0:
+        raise UsageError("--debounce cannot be negative")
+
+    settings = load_settings(home_file(".eplaunchlite.json"))
+    run_script = locate_run_script(args, settings)
+    if run_script is None:
+        return ExitCodes.EnergyPlusNotFound
+
+    print_status = job_status_printer(args)
+
+    def job_status(job):
+        print_status(job)
+        if job.status in (JobStatus.Succeeded, JobStatus.Failed) and job.error_counts and not args.quiet:
+            sys.stderr.write("    %d Fatal, %d Severe, %d Warning\n" % (
+                job.error_counts[Severity.Fatal], job.error_counts[Severity.Severe],
+                job.error_counts[Severity.Warning]))
+
+    # a single worker, so a superseded simulation has exited before the next one starts
+    allocator = RunDirectoryAllocator(keep_runs=settings[Keys.keep_runs], max_bytes=settings[Keys.max_run_bytes])
+    queue = SimulationQueue(run_script, 1, job_callback=job_status, result_cache=get_result_cache(args),
+                            preprocess_cache=get_preprocess_cache(args), run_dir_allocator=allocator,
+                            run_mode=args.mode)
+
+    def rerun(changed):
+        if not args.quiet:
+            sys.stderr.write("Changed: %s\n" % ', '.join(os.path.basename(path) for path in changed))
+        queue.supersede(args.idf, args.epw)
+
+    watcher = FileWatcher(lambda: watched_files(args.idf, args.epw), rerun, debounce=args.debounce)
+    queue.submit(args.idf, args.epw)
+    watcher.start()
+    if not args.quiet:
+        sys.stderr.write("Watching for changes, press Ctrl+C to stop\n")
+    try:
+        # join in short slices so that a keyboard interrupt is delivered promptly on every platform
+        while watcher.is_alive():
+            watcher.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    watcher.stop()
+    queue.cancel_all()
+    queue.wait()
+    return ExitCodes.Success
+
+
+def command_sweep(args):
+    if args.energyplus and not is_executable(args.energyplus):
+        sys.stderr.write("EnergyPlus executable not found or not executable: %s\n" % args.energyplus)
+        return ExitCodes.EnergyPlusNotFound
+    settings = load_settings(home_file(".eplaunchlite.json"))
+    index = InstallationIndex(home_file(".eplaunchlite_installs.json"), settings[Keys.install_roots])
+
+    def engine_lookup(version):
+        if args.energyplus:
+            if version is not None:
+                raise UsageError("--energyplus cannot be combined with a matrix that lists versions")
+            return os.path.basename(os.path.dirname(os.path.abspath(args.energyplus))), args.energyplus
+        install = index.find_version(version) if version is not None else index.latest()
+        if install is None:
+            return None
+        return install.version_string, install.run_script
+
+    try:
+        sweep = ParametricSweep.from_matrix_file(args.matrix, engine_lookup, args.output_dir)
+    except (IOError, OSError, ValueError) as e:
+        raise UsageError("Could not set up sweep from %s: %s" % (args.matrix, e))
+    jobs = sweep.expand()
+    if not jobs:
+        raise UsageError("The sweep matrix does not match any input and weather file combinations")
+
+    queue = SimulationQueue(None, args.jobs, job_callback=job_status_printer(args),
+                            result_cache=get_result_cache(args), preprocess_cache=get_preprocess_cache(args),
+                            run_mode=args.mode, **dict(queue_resource_options(args),
+                                                       **queue_post_processing_options(args)))
+    sweep.submit_to(queue)
+    completed = wait_for_jobs(queue, args.quiet)
+    if completed:
+        wait_for_post_processing(queue, args.quiet)
+
+    sweep.write_summary_csv(os.path.join(sweep.output_dir, 'sweep_summary.csv'))
+    if not args.quiet:
+        sys.stderr.write(sweep.format_summary() + '\n')
+    json.dump({
+        'output_dir': sweep.output_dir,
+        'summary': queue.status_counts(),
+        'jobs': sweep.summary_rows(),
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return exit_code_for(queue, completed)
+
+
+def command_weather(args):
+    results = []
+    for weather_file in args.epw:
+        try:
+            stats = WeatherFile(weather_file, home_file(".eplaunchlite_weather")).statistics()
+        except (IOError, OSError) as e:
+            raise UsageError("Could not read weather file %s: %s" % (weather_file, e))
+        stats['epw'] = weather_file
+        results.append(stats)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return ExitCodes.Success
+
+
+def command_library(args):
+    if args.folder:
+        library = WeatherLibrary(None, args.folder)
+    else:
+        settings = load_settings(home_file(".eplaunchlite.json"))
+        library = WeatherLibrary(home_file(".eplaunchlite_weather_library.json"), settings[Keys.weather_folders])
+    if not library.folders:
+        raise UsageError("No weather library folders, configure weather_folders in settings or pass --folder")
+    if args.refresh:
+        library.refresh()
+    if args.near:
+        results = []
+        for distance, station in library.nearest(args.near[0], args.near[1], args.limit):
+            entry = station.to_dict()
+            entry['distance_km'] = round(distance, 1)
+            results.append(entry)
+    elif args.words:
+        results = [station.to_dict() for station in library.search(' '.join(args.words), None)
+                   if (args.country is None or station.country.lower() == args.country.lower()) and
+                   (args.state is None or station.state.lower() == args.state.lower())][:args.limit]
+    else:
+        results = [station.to_dict() for station in library.in_region(args.country, args.state, args.limit)]
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return ExitCodes.Success
+
+
+def command_results(args):
+    file_path = args.results
+    if os.path.isdir(file_path):
+        # a run directory, in which the full precision eso file is preferred over the csv made from it
+        candidates = sorted(name for name in os.listdir(file_path) if name.endswith(('out.eso', 'out.csv')))
+        candidates.sort(key=lambda name: not name.endswith('.eso'))
+        if not candidates:
+            raise UsageError("No eso or csv results in %s" % file_path)
+        file_path = os.path.join(file_path, candidates[0])
+    try:
+        results = open_results(file_path, None if args.no_cache else home_file(".eplaunchlite_results"))
+    except (IOError, OSError) as e:
+        raise UsageError("Could not read results file %s: %s" % (file_path, e))
+    if not args.variable:
+        output = [{'id': variable.report_id, 'label': variable.label} for variable in results.variables]
+    else:
+        variables = []
+        for name in args.variable:
+            matches = results.find(name, args.key, args.frequency)
+            if not matches:
+                raise UsageError("No variable named %s in %s" % (name, file_path))
+            variables.extend(matches)
+        results.load(variables)
+        output = []
+        for variable in variables:
+            series = results.series(variable)
+            output.append({
+                'label': variable.label,
+                'timestamps': [series.timestamp(i) for i in range(len(series))],
+                'values': list(series.values),
+            })
+    json.dump(output, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return ExitCodes.Success
+
+
+def command_query(args):
+    if bool(args.variable) == bool(args.tabular):
+        raise UsageError("Give exactly one of --variable or --tabular")
+    runs = RunSet(args.run_dirs, max_workers=args.jobs or 8)
+    output = []
+    if args.tabular:
+        values = runs.tabular_values(*args.tabular, report_for=args.report_for)
+        for run_dir, results, value in zip(runs.run_dirs, runs.results, values):
+            output.append({'run_dir': run_dir, 'has_sql': results is not None,
+                           'value': None if value != value else value})
+    else:
+        for run_dir, results, series in zip(runs.run_dirs, runs.results,
+                                            runs.series(args.variable, args.key, args.frequency)):
+            output.append({
+                'run_dir': run_dir,
+                'has_sql': results is not None,
+                'label': series.variable.label if series is not None else None,
+                'timestamps': [series.timestamp(i) for i in range(len(series))] if series is not None else [],
+                'values': list(series.values) if series is not None else [],
+            })
+    json.dump(output, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return ExitCodes.Success
+
+
+def add_resource_arguments(parser):
+    group = parser.add_argument_group('resource limits')
+    group.add_argument('--nice', type=int, help="niceness added to every simulation, 0 through 19")
+    group.add_argument('--ionice', choices=sorted(IOClass.Names), help="I/O scheduling class for every simulation")
+    group.add_argument('--memory-limit', type=int, metavar='MB', help="address space cap for each simulation process")
+    group.add_argument('--cpu-time-limit', type=int, metavar='SECONDS',
+                       help="CPU time cap for each simulation process")
+    group.add_argument('--job-memory', type=int, metavar='MB',
+                       help="memory a simulation needs, only starting one when that much is free; defaults to the "
+                            "memory limit")
+    group.add_argument('--pin-cpus', action='store_true', help="pin each simultaneous simulation to its own cpus")
+
+
+def add_run_mode_argument(parser):
+    parser.add_argument('--mode', choices=RunMode.All, default=RunMode.Annual,
+                        help="simulate the full run periods (annual), only the design days (design-day), or stop "
+                             "after the sizing calculations (sizing-only), for quick feedback on a model")
+
+
+def add_post_processing_arguments(parser):
+    parser.add_argument('--csv', choices=['now', 'background', 'on-demand'], default='now',
+                        help="convert output to csv as part of each run (now), in a low priority pool once each run "
+                             "is done (background), or not at all, leaving eso files only (on-demand)")
+    parser.add_argument('--csv-jobs', type=int, default=1, help="simultaneous background csv conversions")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m EPLaunchLite', description="Headless EP-Launch-Lite")
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help="run one simulation, or a batch of them from a manifest")
+    run_parser.add_argument('idf', nargs='?', help="input file to simulate")
+    run_parser.add_argument('epw', nargs='?', help="weather file to simulate with")
+    run_parser.add_argument('--manifest', help="json file listing many {\"idf\": ..., \"epw\": ...} jobs")
+    run_parser.add_argument('--jobs', '-j', type=int, default=None,
+                            help="maximum concurrent simulations, defaults to the number of cpu cores")
+    engine_group = run_parser.add_mutually_exclusive_group()
+    engine_group.add_argument('--energyplus', help="path to the EnergyPlus executable to use")
+    engine_group.add_argument('--version', help="installed EnergyPlus version to use, such as 9-0-1")
+    run_parser.add_argument('--no-cache', action='store_true', help="always re-run instead of reusing results")
+    run_parser.add_argument('--quiet', '-q', action='store_true', help="do not write job status lines to stderr")
+    add_resource_arguments(run_parser)
+    add_run_mode_argument(run_parser)
+    add_post_processing_arguments(run_parser)
+    run_parser.set_defaults(handler=command_run)
+
+    sweep_parser = subparsers.add_parser('sweep', help="run every combination of a matrix of inputs, weather files "
+                                                       "and engine versions")
+    sweep_parser.add_argument('matrix', help="json file with idf, epw and optional versions and output_dir lists")
+    sweep_parser.add_argument('--output-dir', help="folder for the sweep run directories and summary")
+    sweep_parser.add_argument('--jobs', '-j', type=int, default=None,
+                              help="maximum concurrent simulations, defaults to the number of cpu cores")
+    sweep_parser.add_argument('--energyplus', help="path to the EnergyPlus executable, if the matrix has no versions")
+    sweep_parser.add_argument('--no-cache', action='store_true', help="always re-run instead of reusing results")
+    sweep_parser.add_argument('--quiet', '-q', action='store_true', help="do not write job status lines to stderr")
+    add_resource_arguments(sweep_parser)
+    add_run_mode_argument(sweep_parser)
+    add_post_processing_arguments(sweep_parser)
+    sweep_parser.set_defaults(handler=command_sweep)
+
+    watch_parser = subparsers.add_parser('watch', help="run a simulation again every time its input or weather file "
+                                                       "is saved, until interrupted")
+    watch_parser.add_argument('idf', help="input file to simulate")
+    watch_parser.add_argument('epw', help="weather file to simulate with")
+    engine_group = watch_parser.add_mutually_exclusive_group()
+    engine_group.add_argument('--energyplus', help="path to the EnergyPlus executable to use")
+    engine_group.add_argument('--version', help="installed EnergyPlus version to use, such as 9-0-1")
+    watch_parser.add_argument('--debounce', type=float, default=0.5,
+                              help="seconds without further saves before a new simulation starts")
+    watch_parser.add_argument('--no-cache', action='store_true', help="always re-run instead of reusing results")
+    watch_parser.add_argument('--quiet', '-q', action='store_true', help="do not write job status lines to stderr")
+    add_run_mode_argument(watch_parser)
+    watch_parser.set_defaults(handler=command_watch)
+
+    weather_parser = subparsers.add_parser('weather', help="show climate statistics for weather files")
+    weather_parser.add_argument('epw', nargs='+', help="weather files to summarize")
+    weather_parser.set_defaults(handler=command_weather)
+
+    library_parser = subparsers.add_parser('library', help="search the weather library by name, region or location")
+    library_parser.add_argument('words', nargs='*', help="words that the file name or location must start with")
+    library_parser.add_argument('--near', nargs=2, type=float, metavar=('LATITUDE', 'LONGITUDE'),
+                                help="list the weather files closest to a location instead")
+    library_parser.add_argument('--country', help="only list weather files in this country, such as USA")
+    library_parser.add_argument('--state', help="only list weather files in this state or province, such as IL")
+    library_parser.add_argument('--limit', type=int, default=20, help="maximum number of results")
+    library_parser.add_argument('--folder', action='append',
+                                help="library folder to search instead of the configured weather folders")
+    library_parser.add_argument('--refresh', action='store_true', help="rescan the library folders for changes")
+    library_parser.set_defaults(handler=command_library)
+
+    results_parser = subparsers.add_parser('results', help="list or extract time series from eso or csv results")
+    results_parser.add_argument('results', help="eso or csv results file, or a run directory holding one")
+    results_parser.add_argument('--variable', '-v', action='append',
+                                help="variable or meter name to extract, may be repeated; lists variables if omitted")
+    results_parser.add_argument('--key', '-k', help="only extract the variable for this key, such as a zone name")
+    results_parser.add_argument('--frequency', help="only extract the variable at this frequency, such as Hourly")
+    results_parser.add_argument('--no-cache', action='store_true', help="do not read or write binary sidecars")
+    results_parser.set_defaults(handler=command_results)
+
+    query_parser = subparsers.add_parser('query', help="query the sql output of one or more run directories")
+    query_parser.add_argument('run_dirs', nargs='+', help="run directories holding an eplusout.sql")
+    query_parser.add_argument('--tabular', nargs=4, metavar=('REPORT', 'TABLE', 'ROW', 'COLUMN'),
+                              help="tabular report cell to read from every run")
+    query_parser.add_argument('--report-for', default='Entire Facility', help="tabular report scope")
+    query_parser.add_argument('--variable', help="variable or meter name to read from every run")
+    query_parser.add_argument('--key', help="only read the variable for this key, such as a zone name")
+    query_parser.add_argument('--frequency', help="only read the variable at this frequency, such as Hourly")
+    query_parser.add_argument('--jobs', '-j', type=int, default=None, help="maximum runs queried at the same time")
+    query_parser.set_defaults(handler=command_query)
+    return parser
+
+
+def main(argv=None):
+    """
+    This function is the command line entry point
+
+    * argv: The list of command line arguments, defaulting to sys.argv
+    * Returns: One of the ExitCodes values
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'handler', None) is None:
+        parser.print_help()
+        return ExitCodes.UsageError
+    if getattr(args, 'jobs', None) is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    try:
+        return args.handler(args)
+    except UsageError as e:
+        sys.stderr.write("%s\n" % e)
+        return ExitCodes.UsageError
@@ -1,14 +1,27 @@
 import os
+import sqlite3
 import subprocess
+import threading
 
 import gobject
 import gtk
 
-from EnergyPlusPath import EnergyPlusPath
+from EnergyPlusInstalls import InstallationIndex
 from EnergyPlusThread import EnergyPlusThread
+from ErrorFileParser import Severity
 from FileTypes import FileTypes
+from FileWatcher import FileWatcher, watched_files
+from IDFScanner import preflight_check
 from International import translate as _, Languages, set_language
+from ProgressParser import format_duration
+from RunDirectories import RunDirectoryAllocator
+from RunMode import RunMode
 from Settings import Keys
+from SQLResults import SQLResults
+from UpdateChannel import UpdateChannel
+from VersionCache import VersionCache
+from WeatherFile import WeatherFile
+from WeatherLibrary import WeatherLibrary
 
 
 __program_name__ = "EP-Launch-Lite (v2.0)"
@@ -19,9 +32,21 @@ class Window(gtk.Window):
     This class is the main window class for EP-Launch-Lite
     """
 
-    def __init__(self, settings):
+    # the milliseconds of quiet after the last keystroke before a file path or search entry is acted on
+    TypingDelay = 300
+
+    def __init__(self, settings, result_cache=None, version_cache=None, install_index=None, weather_cache_dir=None,
+                 weather_library=None, preprocess_cache=None):
         """
         This initializer function creates instance variables, sets up threading, and builds the GUI
+
+        * settings: The settings dictionary loaded by the calling manager
+        * result_cache: An optional ResultCache used to skip re-running identical simulations
+        * version_cache: An optional VersionCache shared across restarts, so EnergyPlus is only probed when it changes
+        * install_index: An optional InstallationIndex, defaulting to an unsaved index of the configured install roots
+        * weather_cache_dir: An optional folder for weather file sidecars, so climate summaries load instantly
+        * weather_library: An optional WeatherLibrary, defaulting to an unsaved index of the configured weather folders
+        * preprocess_cache: An optional PreprocessCache, so unchanged inputs are only run through ExpandObjects once
         """
 
         # initialize the parent class
@@ -32,25 +57,52 @@ class Window(gtk.Window):
 
         # initialize some class-level "constants"
         self.box_spacing = 4
+        self.max_output_view_lines = 2000
 
         # initialize instance variables to be set later
         self.input_file_path = None
         self.weather_file_path = None
         self.button_sim = None
         self.button_cancel = None
+        self.run_mode_combo = None
+        self.file_watcher = None
+        self.rerun_pending = False
         self.ep_run_folder = None
+        self.installs_searched = False
+        self.ep_version = None
         self.running_simulation_thread = None
         self.status_bar = None
         self.status_bar_context_id = None
+        self.progress_bar = None
+        self.output_view = None
         self.ep_version_label = None
         self.edit_idf_button = None
+        self.weather_summary_label = None
+        self.weather_summary_path = None
+        self.path_check_source = None
+        self.path_check_generation = 0
+        self.rerun_after_check = False
+        self.weather_cache_dir = weather_cache_dir
+        self.result_cache = result_cache
+        self.preprocess_cache = preprocess_cache
+        self.version_cache = version_cache if version_cache is not None else VersionCache()
 
         # try to load the settings very early since it includes initialization
         self.settings = settings
         set_language(self.settings[Keys.language])
+        self.install_index = install_index
+        if self.install_index is None:
+            self.install_index = InstallationIndex(roots=self.settings[Keys.install_roots])
+        self.run_dir_allocator = RunDirectoryAllocator(
+            keep_runs=self.settings[Keys.keep_runs], max_bytes=self.settings[Keys.max_run_bytes]
+        )
+        self.weather_library = weather_library
+        if self.weather_library is None:
+            self.weather_library = WeatherLibrary(folders=self.settings[Keys.weather_folders])
 
-        # prepare threading
+        # prepare threading, with every update from a worker thread batched onto the main loop at most once per frame
         gobject.threads_init()
+        self.updates = UpdateChannel(gobject.timeout_add)
 
         # connect signals for the GUI
         self.connect("destroy", self.quit)
@@ -58,14 +110,53 @@ class Window(gtk.Window):
         # build up the GUI itself
         self.build_gui()
 
-        # update the list of E+ versions
-        self.ep_run_folder = EnergyPlusPath.get_latest_eplus_version()
-        self.ep_version_label.set_text(EnergyPlusThread.get_ep_version(os.path.join(self.ep_run_folder, 'EnergyPlus')))
+        # find the installed E+ versions, which probes every executable when the saved index is missing or stale, so
+        # it never holds up the window from appearing
+        self.ep_version_label.set_text(_("Looking for EnergyPlus..."))
+        install_worker = threading.Thread(target=self.install_worker)
+        install_worker.daemon = True
+        install_worker.start()
 
         # for good measure, check the validity of the idf/epw versions once at load time
         self.check_file_paths(None)
 
+    def install_worker(self):
+        self.updates.post(self.install_handler, self.install_index.latest())
+
+    def install_handler(self, latest_install):
+        self.installs_searched = True
+        if latest_install is not None:
+            self.ep_run_folder = latest_install.path
+            self.update_ep_version()
+        else:
+            self.ep_version_label.set_text(_("EnergyPlus not found"))
+        self.check_file_paths(None)
+
+    def update_ep_version(self):
+        # only spawn EnergyPlus to ask for its version if the cached answer is missing or stale, and never block on it
+        run_script = os.path.join(self.ep_run_folder, 'EnergyPlus')
+        version = self.version_cache.get(run_script)
+        if version is not None:
+            self.version_handler(version)
+        else:
+            self.ep_version_label.set_text(_("Checking E+ Version..."))
+            self.version_cache.probe_in_background(run_script, self.callback_handler_version)
+
+    def callback_handler_version(self, version):
+        self.updates.post(self.version_handler, version)
+
+    def version_handler(self, version):
+        self.ep_version = version
+        self.ep_version_label.set_text(version if version else _("E+ Version"))
+        # now that the engine version is known the input file version can be checked against it
+        self.check_file_paths(None)
+
     def quit(self, widget=None):
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        # never leave a simulation running behind a closed launcher
+        if self.running_simulation_thread is not None and self.running_simulation_thread.is_alive():
+            self.running_simulation_thread.stop(wait=True)
         try:
             gtk.main_quit()
         except RuntimeError:
@@ -194,13 +285,30 @@ class Window(gtk.Window):
         alignment = gtk.Alignment(xalign=1.0, yalign=0.5, xscale=1.0, yscale=0.5)
         alignment.add(self.weather_file_path)
         hbox2.pack_start(alignment, True, True, self.box_spacing)
+        button_library = gtk.Button(_("Search Weather Library.."))
+        button_library.connect("clicked", self.search_weather_library)
+        alignment = gtk.Alignment(xalign=1.0, yalign=0.5, xscale=1.0, yscale=0.5)
+        alignment.add(button_library)
+        hbox2.pack_start(alignment, True, True, self.box_spacing)
         vbox.pack_start(self.framed(hbox2), True, True, 0)
 
+        # create the climate summary of the chosen weather file
+        self.weather_summary_label = gtk.Label()
+        vbox.pack_start(self.framed(self.weather_summary_label), False, True, 0)
+
         # separator
         vbox.pack_start(self.framed(gtk.HSeparator()), False)
 
-        # create the simulate/cancel button section
+        # create the run mode chooser and simulate/cancel button section
         hbox3 = gtk.HBox(False, self.box_spacing)
+        self.run_mode_combo = gtk.combo_box_new_text()
+        for mode in RunMode.All:
+            self.run_mode_combo.append_text(self.run_mode_label(mode))
+        self.run_mode_combo.set_active(RunMode.All.index(self.settings[Keys.run_mode]))
+        self.run_mode_combo.connect("changed", self.select_run_mode)
+        alignment = gtk.Alignment(xalign=0.5, yalign=0.5, xscale=0.5, yscale=0.5)
+        alignment.add(self.run_mode_combo)
+        hbox3.pack_start(alignment, True, True, self.box_spacing)
         self.button_sim = gtk.Button(_("Simulate"))
         self.button_sim.connect("clicked", self.run_simulation)
         alignment = gtk.Alignment(xalign=0.5, yalign=0.5, xscale=0.5, yscale=0.5)
@@ -212,6 +320,11 @@ class Window(gtk.Window):
         alignment.add(self.button_cancel)
         self.update_run_buttons(running=False)
         hbox3.pack_start(alignment, True, True, self.box_spacing)
+        watch_button = gtk.CheckButton(_("Re-run on save"))
+        watch_button.connect("toggled", self.toggle_watch)
+        alignment = gtk.Alignment(xalign=0.5, yalign=0.5, xscale=0.5, yscale=0.5)
+        alignment.add(watch_button)
+        hbox3.pack_start(alignment, True, True, self.box_spacing)
         # self.button_language = gtk.Button(_("Switch language"))
         # self.button_language.connect("clicked", self.switch_language)
         # alignment = gtk.Alignment(xalign=0.5, yalign=0.5, xscale=0.5, yscale=0.5)
@@ -219,6 +332,18 @@ class Window(gtk.Window):
         # hbox3.pack_start(alignment, True, True, self.box_spacing)
         vbox.pack_start(self.framed(hbox3), True, True, 0)
 
+        # create the live simulation output view, folded away until it is wanted
+        self.output_view = gtk.TextView()
+        self.output_view.set_editable(False)
+        self.output_view.set_cursor_visible(False)
+        scrolled_output = gtk.ScrolledWindow()
+        scrolled_output.set_policy(gtk.POLICY_AUTOMATIC, gtk.POLICY_AUTOMATIC)
+        scrolled_output.set_size_request(width=-1, height=200)
+        scrolled_output.add(self.output_view)
+        output_expander = gtk.Expander(_("Simulation Output"))
+        output_expander.add(scrolled_output)
+        vbox.pack_start(self.framed(output_expander), False, True, 0)
+
         # separator
         vbox.pack_start(self.framed(gtk.HSeparator()), False)
 
@@ -238,6 +363,10 @@ class Window(gtk.Window):
         aligner.add(self.status_bar)
         hbox.pack_start(self.framed(gtk.VSeparator()), False)
         hbox.pack_start(aligner)
+        self.progress_bar = gtk.ProgressBar()
+        self.progress_bar.set_size_request(width=250, height=-1)
+        hbox.pack_start(self.framed(gtk.VSeparator()), False)
+        hbox.pack_start(self.progress_bar, False, True, 0)
         vbox.pack_end(self.framed(hbox), False, True, 0)
         hbox.pack_start(self.framed(gtk.VSeparator()), False)
 
@@ -270,6 +399,18 @@ class Window(gtk.Window):
         if self.doing_restart:
             self.quit(None)
 
+    @staticmethod
+    def run_mode_label(mode):
+        labels = {
+            RunMode.Annual: _("Annual simulation"),
+            RunMode.DesignDay: _("Design days only"),
+            RunMode.SizingOnly: _("Sizing only"),
+        }
+        return labels[mode]
+
+    def select_run_mode(self, widget):
+        self.settings[Keys.run_mode] = RunMode.All[widget.get_active()]
+
     def select_input_file(self, widget, flag):
         message, file_filters = FileTypes.get_materials(flag)
         if flag == FileTypes.IDF:
@@ -298,7 +439,86 @@ class Window(gtk.Window):
             print(_("Cancelled!"))
             dialog.destroy()
 
+    def search_weather_library(self, widget):
+        dialog = gtk.Dialog(_("Search Weather Library"),
+                            self,
+                            gtk.DIALOG_MODAL | gtk.DIALOG_DESTROY_WITH_PARENT,
+                            (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL, gtk.STOCK_OPEN, gtk.RESPONSE_OK)
+                            )
+        label = gtk.Label(_("Search by name, or enter a latitude and longitude to find the nearest files:"))
+        label.show()
+        dialog.vbox.pack_start(label, False, True, 0)
+        search_entry = gtk.Entry()
+        search_entry.show()
+        dialog.vbox.pack_start(search_entry, False, True, 0)
+
+        # list the location, distance if searching by coordinates, and path of each matching weather file
+        store = gtk.ListStore(str, str, str)
+        tree = gtk.TreeView(store)
+        for column_number, title in enumerate([_("Location"), _("Distance"), _("File")]):
+            tree.append_column(gtk.TreeViewColumn(title, gtk.CellRendererText(), text=column_number))
+        tree.connect("row-activated", lambda view, path, column: dialog.response(gtk.RESPONSE_OK))
+        scrolled_results = gtk.ScrolledWindow()
+        scrolled_results.set_policy(gtk.POLICY_AUTOMATIC, gtk.POLICY_AUTOMATIC)
+        scrolled_results.add(tree)
+        scrolled_results.show_all()
+        dialog.vbox.pack_start(scrolled_results, True, True, 0)
+
+        # the library may have to be loaded or rescanned before the first query, so every query runs on a worker
+        # thread, one at a time so that a rescan is never raced, and only the newest query's results are shown
+        search = {'source': None, 'generation': 0, 'open': True}
+        search_lock = threading.Lock()
+
+        def search_worker(generation, text):
+            with search_lock:
+                if not text.strip():
+                    self.weather_library.stations()  # only loads the library, ready for the first real query
+                    results = []
+                else:
+                    try:
+                        latitude, longitude = [float(value) for value in text.replace(',', ' ').split()]
+                        results = self.weather_library.nearest(latitude, longitude, 20)
+                    except ValueError:
+                        results = [(None, station) for station in self.weather_library.search(text, 200)]
+                rows = [[station.describe(), '' if distance is None else '%.0f km' % distance, station.path]
+                        for distance, station in results]
+            self.updates.post(show_results, generation, rows)
+
+        def show_results(generation, rows):
+            if not search['open'] or generation != search['generation']:
+                return  # the dialog has closed, or the text has changed again since this query started
+            store.clear()
+            for row in rows:
+                store.append(row)
+
+        def start_search():
+            search['source'] = None
+            search['generation'] += 1
+            worker = threading.Thread(target=search_worker, args=(search['generation'], search_entry.get_text()))
+            worker.daemon = True
+            worker.start()
+            return False  # a one shot timeout
+
+        def update_results(entry):
+            # every keystroke lands here, so the query waits for the typing to pause
+            if search['source'] is not None:
+                gobject.source_remove(search['source'])
+            search['source'] = gobject.timeout_add(self.TypingDelay, start_search)
+
+        search_entry.connect("changed", update_results)
+        start_search()
+        dialog.set_size_request(width=700, height=500)
+        response = dialog.run()
+        search['open'] = False
+        if search['source'] is not None:
+            gobject.source_remove(search['source'])
+        model, selected = tree.get_selection().get_selected()
+        if response == gtk.RESPONSE_OK and selected is not None:
+            self.weather_file_path.set_text(model.get_value(selected, 2))
+        dialog.destroy()
+
     def run_simulation(self, widget):
+        self.output_view.get_buffer().set_text('')
         self.running_simulation_thread = EnergyPlusThread(
             os.path.join(self.ep_run_folder, 'EnergyPlus'),
             self.input_file_path.get_text(),
@@ -306,7 +526,12 @@ class Window(gtk.Window):
             self.message,
             self.callback_handler_success,
             self.callback_handler_failure,
-            self.callback_handler_cancelled
+            self.callback_handler_cancelled,
+            self.progress,
+            result_cache=self.result_cache,
+            run_dir_allocator=self.run_dir_allocator,
+            preprocess_cache=self.preprocess_cache,
+            run_mode=self.settings[Keys.run_mode]
         )
         self.running_simulation_thread.start()
         self.update_run_buttons(running=True)
@@ -314,24 +539,59 @@ class Window(gtk.Window):
     def update_run_buttons(self, running=False):
         self.button_sim.set_sensitive(not running)
         self.button_cancel.set_sensitive(running)
+        self.run_mode_combo.set_sensitive(not running)
+        if not running and self.progress_bar is not None:
+            self.progress_bar.set_fraction(0.0)
+            self.progress_bar.set_text('')
 
     def message(self, message):
-        gobject.idle_add(self.message_handler, message)
+        # a running simulation forwards every line of its output here, so the status bar only shows the latest
+        self.updates.post_latest('status', self.message_handler, message)
+        self.updates.post_line('output', self.output_handler, message)
 
     def message_handler(self, message):
+        # replace rather than stack messages, since running simulations forward every line of their output here
+        self.status_bar.pop(self.status_bar_context_id)
         self.status_bar.push(self.status_bar_context_id, message)
 
+    def output_handler(self, lines, skipped):
+        text_buffer = self.output_view.get_buffer()
+        if skipped:
+            lines = [_("... %d lines skipped") % skipped] + lines
+        text_buffer.insert(text_buffer.get_end_iter(), '\n'.join(lines) + '\n')
+        # keep only the tail, so a long run cannot grow the view without bound
+        excess = text_buffer.get_line_count() - self.max_output_view_lines
+        if excess > 0:
+            text_buffer.delete(text_buffer.get_start_iter(), text_buffer.get_iter_at_line(excess))
+        self.output_view.scroll_to_iter(text_buffer.get_end_iter(), 0.0)
+
+    def progress(self, progress):
+        self.updates.post_latest('progress', self.progress_handler, progress)
+
+    def progress_handler(self, progress):
+        if progress.percent is None:
+            self.progress_bar.pulse()
+        else:
+            self.progress_bar.set_fraction(progress.percent / 100.0)
+        self.progress_bar.set_text(progress.describe())
+
     def callback_handler_cancelled(self):
-        gobject.idle_add(self.cancelled_simulation)
+        self.updates.post(self.cancelled_simulation)
 
     def cancelled_simulation(self):
         self.update_run_buttons(running=False)
+        self.start_pending_rerun()
 
-    def callback_handler_failure(self, std_out, run_dir):
-        gobject.idle_add(self.failed_simulation, std_out, run_dir)
+    def callback_handler_failure(self, std_out, run_dir, metrics):
+        self.updates.post(self.failed_simulation, std_out, run_dir, metrics)
 
-    def failed_simulation(self, std_out, run_dir):
+    def failed_simulation(self, std_out, run_dir, metrics):
         self.update_run_buttons(running=False)
+        if self.file_watcher is not None:
+            # a dialog after every save would get in the way of editing, so watched runs only report in the status bar
+            self.message_handler(_("EnergyPlus Failed!") + ' ' + self.error_counts_summary())
+            self.start_pending_rerun()
+            return
         message = gtk.MessageDialog(parent=self,
                                     flags=0,
                                     type=gtk.MESSAGE_ERROR,
@@ -339,18 +599,22 @@ class Window(gtk.Window):
                                     message_format=_("EnergyPlus Failed!"))
         message.set_title(_("EnergyPlus Failed"))
         message.format_secondary_text(
-            _("Error file is the best place to start.  Would you like to open the Run Folder?"))
+            self.error_summary() + _("Error file is the best place to start.  Would you like to open the Run Folder?"))
         response = message.run()
         if response == gtk.RESPONSE_YES:
             subprocess.Popen(['open', run_dir], shell=False)
         message.destroy()
 
-    def callback_handler_success(self, std_out, run_dir):
-        gobject.idle_add(self.completed_simulation, std_out, run_dir)
+    def callback_handler_success(self, std_out, run_dir, metrics):
+        self.updates.post(self.completed_simulation, std_out, run_dir, metrics)
 
-    def completed_simulation(self, std_out, run_dir):
+    def completed_simulation(self, std_out, run_dir, metrics):
         # update the GUI buttons
         self.update_run_buttons(running=False)
+        if self.file_watcher is not None:
+            self.message_handler(_("Simulation completed") + ' ' + self.error_counts_summary())
+            self.start_pending_rerun()
+            return
         # create the dialog
         result_dialog = gtk.Dialog(_("Simulation Output"),
                                    self,
@@ -365,6 +629,30 @@ class Window(gtk.Window):
         aligner.show()
         result_dialog.vbox.pack_start(aligner, False, True, 0)
 
+        # headline results, if the input file asked for sqlite output
+        site_energy = self.site_energy(run_dir)
+        if site_energy:
+            label = gtk.Label(site_energy)
+            label.show()
+            result_dialog.vbox.pack_start(label, False, True, 0)
+
+        # how long the run took and how much memory it needed
+        metrics_summary = self.metrics_summary(metrics)
+        if metrics_summary:
+            label = gtk.Label(metrics_summary)
+            label.show()
+            result_dialog.vbox.pack_start(label, False, True, 0)
+
+        # summarize the error file, which was parsed while the simulation ran
+        error_summary = self.error_summary()
+        if error_summary:
+            label = gtk.Label(error_summary)
+            label.show()
+            aligner = gtk.Alignment(xalign=0.0, yalign=0.5, xscale=1.0, yscale=1.0)
+            aligner.add(label)
+            aligner.show()
+            result_dialog.vbox.pack_start(aligner, False, True, 0)
+
         # put the actual simulation results
         label = gtk.Label(std_out)
         scrolled_results = gtk.ScrolledWindow()
@@ -383,6 +671,79 @@ class Window(gtk.Window):
                 self.simple_error_dialog(_("Could not open run directory"))
         result_dialog.destroy()
 
+    @staticmethod
+    def site_energy(run_dir):
+        results = SQLResults.for_run_dir(run_dir)
+        if results is None:
+            return ''
+        try:
+            energy = results.tabular_value('AnnualBuildingUtilityPerformanceSummary', 'Site and Source Energy',
+                                           'Total Site Energy', 'Total Energy')
+        except (sqlite3.Error, IOError, OSError):
+            return ''
+        if energy != energy:
+            return ''
+        return _("Total site energy: %.2f GJ") % energy
+
+    @staticmethod
+    def metrics_summary(metrics):
+        if metrics is None or metrics.cpu_time is None:
+            return ''
+        return _("Run time %s, CPU time %s, peak memory %.1f MB") % (
+            format_duration(metrics.wall_time), format_duration(metrics.cpu_time),
+            metrics.peak_rss_bytes / (1024.0 * 1024.0))
+
+    def error_summary(self):
+        if self.running_simulation_thread is None or self.running_simulation_thread.error_report is None:
+            return ''
+        return self.running_simulation_thread.error_report.format_summary(max_types=10) + '\n\n'
+
+    def error_counts_summary(self):
+        if self.running_simulation_thread is None or self.running_simulation_thread.error_report is None:
+            return ''
+        counts = self.running_simulation_thread.error_report.counts
+        return _("%d Fatal, %d Severe, %d Warning") % (
+            counts[Severity.Fatal], counts[Severity.Severe], counts[Severity.Warning]
+        )
+
+    def toggle_watch(self, widget):
+        if widget.get_active():
+            self.file_watcher = FileWatcher(
+                lambda: watched_files(self.settings[Keys.last_idf], self.settings[Keys.last_epw]), self.files_changed
+            )
+            self.file_watcher.start()
+        elif self.file_watcher is not None:
+            self.file_watcher.stop()
+            self.file_watcher = None
+            self.rerun_pending = False
+
+    def files_changed(self, paths):
+        self.updates.post(self.files_changed_handler, paths)
+
+    def files_changed_handler(self, paths):
+        if self.file_watcher is None:
+            return  # stopped watching since
+        self.rerun_pending = True
+        if self.is_running():
+            # supersede the outdated run; the new one starts once the old one has been cancelled
+            self.message_handler(_("Input changed, restarting simulation"))
+            self.running_simulation_thread.stop()
+        else:
+            self.start_pending_rerun()
+
+    def is_running(self):
+        return self.running_simulation_thread is not None and self.running_simulation_thread.is_alive()
+
+    def start_pending_rerun(self):
+        if self.rerun_pending:
+            self.rerun_pending = False
+            # the save may have fixed, or introduced, a problem the pre-flight check catches, so the run starts once
+            # a fresh check has passed
+            self.rerun_after_check = True
+            if self.path_check_source is not None:
+                gobject.source_remove(self.path_check_source)
+            self.start_path_check()
+
     def cancel_simulation(self, widget):
         self.button_cancel.set_sensitive(False)
         self.running_simulation_thread.stop()
@@ -390,18 +751,66 @@ class Window(gtk.Window):
     def check_file_paths(self, widget):
         if self.weather_file_path is None or self.input_file_path is None or self.status_bar is None:
             return  # we are probably doing early initialization of the GUI
+        self.settings[Keys.last_idf] = self.input_file_path.get_text()
+        self.settings[Keys.last_epw] = self.weather_file_path.get_text()
+        # every keystroke in a path entry lands here, so the checks wait for the typing to pause
+        if self.path_check_source is not None:
+            gobject.source_remove(self.path_check_source)
+        self.path_check_source = gobject.timeout_add(self.TypingDelay, self.start_path_check)
+
+    def start_path_check(self):
+        self.path_check_source = None
+        self.path_check_generation += 1
         idf = self.input_file_path.get_text()
         epw = self.weather_file_path.get_text()
-        self.settings[Keys.last_idf] = idf
-        self.settings[Keys.last_epw] = epw
-        if os.path.exists(idf) and os.path.exists(epw):
-            self.message_handler(_("Ready for launch"))
-            self.button_sim.set_sensitive(True)
-            self.edit_idf_button.set_sensitive(True)
+        summarize = epw != self.weather_summary_path
+        self.weather_summary_path = epw
+        # the pre-flight scan and the weather statistics read files, which must not hold up the main loop
+        engine_problem = None
+        if self.ep_run_folder is None:
+            engine_problem = _("EnergyPlus not found") if self.installs_searched else _("Looking for EnergyPlus...")
+        worker = threading.Thread(target=self.path_check_worker, args=(
+            self.path_check_generation, idf, epw, engine_problem, self.ep_version, summarize))
+        worker.daemon = True
+        worker.start()
+        return False  # a one shot timeout
+
+    def path_check_worker(self, generation, idf, epw, engine_problem, ep_version, summarize):
+        summary = self.weather_summary(epw) if summarize else None
+        if engine_problem is not None:
+            message, can_run, can_edit = engine_problem, False, os.path.exists(idf)
+        elif os.path.exists(idf) and os.path.exists(epw):
+            # catch version mismatches and malformed input files before a process is spun up for them
+            problem = preflight_check(idf, ep_version)
+            message, can_run, can_edit = (problem if problem else _("Ready for launch")), problem is None, True
         else:
-            self.message_handler(_("Input and/or Weather file paths are invalid"))
-            self.button_sim.set_sensitive(False)
-            self.edit_idf_button.set_sensitive(False)
+            message, can_run, can_edit = _("Input and/or Weather file paths are invalid"), False, False
+        # checks can finish out of order, so each is delivered and the handler keeps only the newest
+        self.updates.post(self.path_check_handler, generation, epw, message, can_run, can_edit, summary)
+
+    def path_check_handler(self, generation, epw, message, can_run, can_edit, summary):
+        if summary is not None and epw == self.weather_summary_path:
+            self.weather_summary_label.set_text(summary)
+        if generation != self.path_check_generation:
+            return  # the paths have changed again since this check started
+        self.message_handler(message)
+        self.button_sim.set_sensitive(can_run)
+        self.edit_idf_button.set_sensitive(can_edit)
+        if self.rerun_after_check:
+            self.rerun_after_check = False
+            if can_run and self.file_watcher is not None and not self.is_running():
+                self.run_simulation(None)
+
+    def weather_summary(self, epw):
+        if not os.path.isfile(epw):
+            return ''
+        try:
+            stats = WeatherFile(epw, self.weather_cache_dir).statistics()
+        except (IOError, OSError, TypeError, ValueError):
+            return _("Could not read weather file")
+        return _("%s: HDD %d, CDD %d, heating design %.1f C, cooling design %.1f C") % (
+            stats['location'], stats['hdd18'], stats['cdd18'], stats['heating_99_6'], stats['cooling_0_4']
+        )
 
     def simple_error_dialog(self, message_text):
         message = gtk.MessageDialog(parent=self,
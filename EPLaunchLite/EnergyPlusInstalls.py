@@ -0,0 +1,218 @@
+import glob
+import json
+import os
+import re
+import subprocess
+import threading
+
+# the folders searched for EnergyPlus installations when no roots are configured; the home folder itself is left out,
+# since its modified time changes all the time and would invalidate the saved index on nearly every start
+DEFAULT_ROOTS = ['/Applications', '/usr/local', '/opt', '~/Applications', '~/.local']
+
+_VERSION_PATTERN = re.compile(r'(\d+)[-.](\d+)(?:[-.](\d+))?')
+
+
+def parse_version(text):
+    """
+    This function pulls a version number out of an installation folder name or an EnergyPlus version string
+
+    * text: A string such as 'EnergyPlus-8-6-0', 'EnergyPlusV9-0-1', or 'EnergyPlus, Version 9.0.1-bd2bcd8b1e'
+    * Returns: A tuple of integers such as (9, 0, 1), or None if no version is found
+    """
+    if text is None:
+        return None
+    match = _VERSION_PATTERN.search(text)
+    if match is None:
+        return None
+    return tuple(int(group) for group in match.groups('0'))
+
+
+def probe_version(run_script):
+    """
+    This function runs an EnergyPlus executable to ask for its version
+
+    * run_script: The path to the EnergyPlus executable
+    * Returns: The version string printed by the executable, such as 'EnergyPlus, Version 9.0.1-bd2bcd8b1e'
+    """
+    p = subprocess.Popen([run_script, '-v'], shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    std_out, std_err = p.communicate()
+    return std_out.decode('utf-8', 'replace').strip()
+
+
+class EnergyPlusInstall(object):
+    """
+    This class describes a single EnergyPlus installation
+    """
+
+    def __init__(self, path, version):
+        """
+        * path: The installation folder
+        * version: The version tuple, such as (9, 0, 1)
+        """
+        self.path = path
+        self.version = tuple(version)
+
+    @property
+    def run_script(self):
+        return os.path.join(self.path, 'EnergyPlus')
+
+    @property
+    def version_string(self):
+        return '-'.join(str(x) for x in self.version)
+
+    def to_dict(self):
+        return {'path': self.path, 'version': list(self.version)}
+
+    @staticmethod
+    def from_dict(data):
+        return EnergyPlusInstall(data['path'], data['version'])
+
+
+class InstallationIndex(object):
+    """
+    This class discovers the EnergyPlus installations below a set of root folders and remembers them on disk
+
+    The saved index records the modified time of every root folder, so adding or removing an installation folder
+    invalidates it and triggers a rescan.  Candidates whose folder name does not carry a version are probed by running
+    their executable, with all such probes running concurrently.
+    """
+
+    def __init__(self, index_file_name=None, roots=None):
+        """
+        * index_file_name: The json file used to persist the index, or None to keep the index in memory only
+        * roots: A list of folders to search, defaulting to DEFAULT_ROOTS; a leading '~' is expanded
+        """
+        self.index_file_name = index_file_name
+        self.roots = [os.path.expanduser(root) for root in (roots if roots is not None else DEFAULT_ROOTS)]
+        self._installs = None
+        self._root_stamps = None
+
+    def _current_root_stamps(self):
+        stamps = {}
+        for root in self.roots:
+            try:
+                stamps[root] = os.stat(root).st_mtime
+            except OSError:
+                stamps[root] = None
+        return stamps
+
+    def _load(self):
+        if self.index_file_name is None:
+            return False
+        try:
+            with open(self.index_file_name) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        if data.get('roots') != self._current_root_stamps():
+            return False
+        self._root_stamps = data['roots']
+        self._installs = [EnergyPlusInstall.from_dict(entry) for entry in data['installs']]
+        return True
+
+    def _save(self):
+        if self.index_file_name is None:
+            return
+        data = {'roots': self._root_stamps, 'installs': [install.to_dict() for install in self._installs]}
+        try:
+            with open(self.index_file_name, 'w') as f:
+                json.dump(data, f)
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def find_candidates(root):
+        """
+        This function lists the folders directly inside a root that look like EnergyPlus installations
+
+        * root: The folder to search
+        * Returns: A list of folders containing an executable named EnergyPlus
+        """
+        candidates = []
+        for folder in glob.glob(os.path.join(root, '[Ee]nergy[Pp]lus*')):
+            run_script = os.path.join(folder, 'EnergyPlus')
+            if os.path.isfile(run_script) and os.access(run_script, os.X_OK):
+                candidates.append(folder)
+        return candidates
+
+    @staticmethod
+    def probe_candidates(candidates):
+        """
+        This function determines the version of each candidate folder, running executables concurrently when the
+        folder name does not carry a version
+
+        * candidates: A list of installation folders
+        * Returns: A list of EnergyPlusInstall instances for the candidates whose version could be determined
+        """
+        versions = {}
+
+        def probe(folder):
+            try:
+                versions[folder] = parse_version(probe_version(os.path.join(folder, 'EnergyPlus')))
+            except (IOError, OSError):
+                versions[folder] = None
+
+        threads = []
+        for folder in candidates:
+            version = parse_version(os.path.basename(folder.rstrip('/')))
+            if version is not None:
+                versions[folder] = version
+            else:
+                thread = threading.Thread(target=probe, args=(folder,))
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return [EnergyPlusInstall(folder, versions[folder]) for folder in candidates if versions[folder] is not None]
+
+    def refresh(self):
+        """
+        This function rescans every root folder, ignoring any saved index, and saves the new index
+        """
+        self._root_stamps = self._current_root_stamps()
+        candidates = []
+        for root in self.roots:
+            for folder in InstallationIndex.find_candidates(root):
+                if os.path.realpath(folder) not in [os.path.realpath(x) for x in candidates]:
+                    candidates.append(folder)
+        self._installs = sorted(InstallationIndex.probe_candidates(candidates), key=lambda install: install.version)
+        self._save()
+
+    def installs(self):
+        """
+        This function lists the discovered installations, scanning only when the saved index is missing or stale
+
+        * Returns: A list of EnergyPlusInstall instances sorted from oldest to newest version
+        """
+        if self._installs is None or self._root_stamps != self._current_root_stamps():
+            if not self._load():
+                self.refresh()
+        return list(self._installs)
+
+    def latest(self):
+        """
+        This function finds the newest discovered installation
+
+        * Returns: The EnergyPlusInstall with the highest version, or None if nothing was found
+        """
+        installs = self.installs()
+        if not installs:
+            return None
+        return installs[-1]
+
+    def find_version(self, version):
+        """
+        This function finds an installation by version
+
+        * version: A version tuple or string, such as (9, 0, 1) or '9-0-1'; a shorter tuple such as (9, 0) matches any
+          patch level
+        * Returns: The newest matching EnergyPlusInstall, or None if there is no match
+        """
+        if not isinstance(version, tuple):
+            version = parse_version(version)
+            if version is None:
+                return None
+        matches = [install for install in self.installs() if install.version[:len(version)] == version]
+        if not matches:
+            return None
+        return matches[-1]
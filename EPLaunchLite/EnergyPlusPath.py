@@ -1,4 +1,4 @@
-import glob
+from EnergyPlusInstalls import InstallationIndex
 
 
 class EnergyPlusPath(object):
@@ -26,13 +26,14 @@ class EnergyPlusPath(object):
         return '/Applications/EnergyPlus-%s' % version
 
     @staticmethod
-    def get_latest_eplus_version():
-        # get all the installed versions first, sorted
-        install_folders = glob.glob('/Applications/EnergyPlus*')
-
-        # then process them into a nice list
-        ep_versions = sorted([EnergyPlusPath.get_version_number_from_path(x) for x in install_folders])
+    def get_latest_eplus_version(roots=None):
+        """
+        This function finds the newest EnergyPlus installation, comparing versions numerically rather than as strings
 
-        # set current_entry to something meaningful if needed
-        new_version = ep_versions[-1]
-        return EnergyPlusPath.get_path_from_version_number(new_version)
+        * roots: A list of folders to search, defaulting to the standard install locations on Mac and Linux
+        * Returns: The installation folder of the newest version, or None if no installation was found
+        """
+        latest = InstallationIndex(roots=roots).latest()
+        if latest is None:
+            return None
+        return latest.path
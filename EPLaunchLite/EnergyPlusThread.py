@@ -1,68 +1,372 @@
 import os
+import shutil
 import subprocess
 import threading
+import time
 
+from EnergyPlusInstalls import probe_version
+from ErrorFileParser import ErrorFileParser, ErrorFileTail
+from IDFScanner import IDFScanner
+from PreprocessCache import input_dependencies
 from International import translate as _
+from ProcessGroup import group_alive, new_group_kwargs, terminate_group
+from ProgressParser import ProgressParser
+from ResultCache import ResultCache
+from RunMetrics import RunMetrics, wait_with_metrics
+from RunMode import DesignDayFlag, RunMode, write_sizing_only_input
+from StreamReader import StreamReader
 
 
-class EnergyPlusThread(threading.Thread):
+class SimulationCommand(object):
+    """
+    This class decides the command line and run directory of a simulation, shared by the threaded and asyncio runners
+
+    The runner sets the run_script, input_file, weather_file, result_cache, preprocess_cache, limits,
+    requested_run_dir, run_dir_allocator, run_mode, and run_dir attributes these functions read.
+    """
+
+    # the flags that make EnergyPlus run EPMacro and ExpandObjects, left out when the input was already expanded
+    PreprocessFlags = ('-m', '-x')
+
+    # set by preprocess to the cached expanded input, which EnergyPlus is then given instead of the input file
+    expanded_input = None
+
+    # True to leave ReadVarsESO out of the run, converting the output to csv afterwards with PostProcessing instead
+    defer_post_processing = False
+
+    # how far the simulation goes, one of the RunMode constants
+    run_mode = RunMode.Annual
+
+    # set by prepare_run_mode to the sizing only copy of the input, which EnergyPlus is then given instead
+    mode_input = None
+
+    # a threading.Event the runner sets on a cancel, which stops the preprocessing tools if they are still running
+    preprocess_cancel = None
+
+    def choose_run_dir(self, base_file_name):
+        """
+        This function picks the run directory, storing it in the run_dir attribute
+
+        * base_file_name: The output prefix passed to EnergyPlus
+        * Returns: True if the directory came from the run directory allocator, and must be released to it afterwards
+        """
+        if self.requested_run_dir:
+            self.run_dir = self.requested_run_dir
+        elif self.run_dir_allocator is not None:
+            self.run_dir = self.run_dir_allocator.allocate(self.input_file)
+            return True
+        else:
+            self.run_dir = os.path.join(os.path.dirname(self.input_file), 'output-' + base_file_name)
+        return False
+
+    def get_command(self, base_file_name):
+        """
+        This function builds the full command that runs the simulation
+
+        * base_file_name: The output prefix passed to EnergyPlus
+        * Returns: A list of arguments, starting with the executable
+        """
+        input_file = self.input_file
+        flags = self.get_flags()
+        if self.expanded_input is not None:
+            input_file = self.expanded_input
+            flags = [flag for flag in flags if flag not in SimulationCommand.PreprocessFlags]
+        if self.run_mode == RunMode.SizingOnly:
+            if self.mode_input is not None:
+                input_file = self.mode_input
+            else:
+                flags.append(DesignDayFlag)  # the nearest thing to sizing only the unpatched input allows
+        return self.get_command_prefix() + [self.run_script] + flags + [
+            '-p',
+            base_file_name,
+            '-d',
+            self.run_dir,
+            '-w',
+            self.weather_file,
+            input_file
+        ]
+
+    def preprocess(self):
+        """
+        This function looks the expanded input up in the preprocessing cache, expanding it there on a miss, and stores
+        it in the expanded_input attribute
+
+        * Returns: True if the expanded input was already in the cache, False if it was expanded just now or EnergyPlus
+          has to expand the input itself
+        """
+        self.expanded_input = None
+        hit = False
+        if self.preprocess_cache is not None and any(flag in SimulationCommand.PreprocessFlags
+                                                     for flag in self.get_flags()):
+            self.expanded_input, hit = self.preprocess_cache.expanded_input(self.input_file, self.run_script,
+                                                                            self.limits, self.preprocess_cancel)
+        return hit
+
+    def prepare_run_mode(self):
+        """
+        This function writes the sizing only copy of the input when the run mode needs one, storing it in the
+        mode_input attribute, and must be followed by clean_up_run_mode once the simulation is over
+
+        * Returns: False if a sizing only run has to fall back to simulating the design days, because the input could
+          not be patched, otherwise True
+        """
+        self.mode_input = None
+        if self.run_mode != RunMode.SizingOnly:
+            return True
+        self.mode_input = write_sizing_only_input(self.expanded_input or self.input_file,
+                                                  os.path.dirname(os.path.abspath(self.input_file)))
+        return self.mode_input is not None
+
+    def clean_up_run_mode(self):
+        """
+        This function removes the sizing only copy of the input, if one was written
+        """
+        if self.mode_input is not None:
+            try:
+                os.remove(self.mode_input)
+            except OSError:
+                pass
+            self.mode_input = None
+
+    def get_flags(self):
+        """
+        This function lists the EnergyPlus command line flags that affect the simulation results
+
+        * Returns: A list of flags, passed to EnergyPlus ahead of the file-specific arguments
+        """
+        flags = ['-x', '-m'] if self.defer_post_processing else ['-r', '-x', '-m']
+        if self.run_mode == RunMode.DesignDay:
+            flags.append(DesignDayFlag)
+        return flags
+
+    def get_command_prefix(self):
+        """
+        This function lists the command that has to wrap EnergyPlus to apply the resource limits, if any
+
+        * Returns: A list of arguments, passed ahead of the EnergyPlus executable
+        """
+        if self.limits is None:
+            return []
+        return self.limits.command_prefix()
+
+    def get_run_period_days(self):
+        """
+        This function reads the run period length from the input file, so progress can be measured against it
+
+        * Returns: The number of days in the first run period, defaulting to a full year if it cannot be determined
+        """
+        try:
+            days = IDFScanner(self.input_file).scan(stop_when=['version', 'runperiod']).run_period_days()
+        except (IOError, OSError):
+            days = None
+        return days or 365
+
+    def get_error_file_path(self, base_file_name):
+        """
+        This function names the error file EnergyPlus writes into the run directory
+
+        * base_file_name: The output prefix passed to EnergyPlus
+        * Returns: The error file path
+        """
+        return os.path.join(self.run_dir, base_file_name + 'out.err')
+
+    def get_cache_key(self):
+        """
+        This function computes the result cache key for this simulation
+
+        * Returns: The key string, or None if there is no result cache or the inputs, or a file they read, cannot be
+          read, in which case the simulation is never cached
+        """
+        if self.result_cache is None:
+            return None
+        flags = self.get_flags()
+        if self.run_mode == RunMode.SizingOnly:
+            flags.append(RunMode.SizingOnly)  # the patched copy is not what gets hashed, so the mode is keyed instead
+        try:
+            return ResultCache.key_for(self.input_file, self.weather_file, self.run_script, flags,
+                                       dependencies=input_dependencies(self.input_file))
+        except (IOError, OSError):
+            return None
+
+    def restore_cached(self, cache_key):
+        """
+        This function copies the results of an identical earlier simulation into the run directory, if there are any
+
+        * cache_key: The result cache key from get_cache_key
+        * Returns: The standard output of the cached run for a hit, or None for a miss
+        """
+        try:
+            return self.result_cache.restore(cache_key, self.run_dir)
+        except (IOError, OSError, shutil.Error):
+            return None  # a partial copy is overwritten by the simulation that runs instead
+
+
+class EnergyPlusThread(threading.Thread, SimulationCommand):
+
+    # the seconds a cancelled simulation gets to exit on its own before its whole process group is killed
+    TerminateTimeout = 5.0
+
     def __init__(self, run_script, input_file, weather_file, msg_callback, success_callback, failure_callback,
-                 cancelled_callback):
+                 cancelled_callback, progress_callback=None, max_output_lines=1000, result_cache=None,
+                 run_dir=None, run_dir_allocator=None, limits=None, preprocess_cache=None,
+                 defer_post_processing=False, run_mode=RunMode.Annual):
         self.p = None
         self.std_out = None
         self.std_err = None
+        self.max_output_lines = max_output_lines
+        self.result_cache = result_cache
+        self.preprocess_cache = preprocess_cache
+        self.defer_post_processing = defer_post_processing
+        self.run_mode = run_mode
         self.run_script = run_script
         self.input_file = input_file
         self.weather_file = weather_file
         self.msg_callback = msg_callback
+        self.progress_callback = progress_callback
+        self.progress_parser = None
         self.success_callback = success_callback
         self.failure_callback = failure_callback
         self.cancelled_callback = cancelled_callback
         self.cancelled = False
+        self._stop_lock = threading.Lock()
+        self._terminator = None
+        self.preprocess_cancel = threading.Event()
+        self.requested_run_dir = run_dir
+        self.run_dir_allocator = run_dir_allocator
+        self.limits = limits
         self.run_dir = ''
+        self.error_report = None
+        self.metrics = None
         threading.Thread.__init__(self)
 
     def run(self):
-        self.cancelled = False
+        self.progress_parser = ProgressParser(self.get_run_period_days() if self.progress_callback else 365)
         base_file_name = os.path.splitext(os.path.basename(self.input_file))[0]
-        self.run_dir = os.path.join(os.path.dirname(self.input_file), 'output-' + base_file_name)
-        self.p = subprocess.Popen([
-            self.run_script,
-            '-r',
-            '-x',
-            '-m',
-            '-p',
-            base_file_name,
-            '-d',
-            self.run_dir,
-            '-w',
-            self.weather_file,
-            self.input_file
-        ],
-            shell=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE)
+        cache_key = self.get_cache_key()
+        allocated = self.choose_run_dir(base_file_name)
+        self.std_out = None if cache_key is None else self.restore_cached(cache_key)
+        if self.std_out is not None:
+            self.error_report = ErrorFileParser()
+            try:
+                self.error_report.parse_file(self.get_error_file_path(base_file_name))
+            except (IOError, OSError):
+                pass
+            # the cached results hold the metrics of the run that actually produced them
+            self.metrics = RunMetrics.read(self.run_dir)
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, True)
+            self.msg_callback(_("Simulation results loaded from cache"))
+            self.success_callback(self.std_out, self.run_dir, self.metrics)
+            return
+        error_file_path = self.get_error_file_path(base_file_name)
+        try:
+            # a reused run directory still holds the previous error file, which must not be tailed as if it were new
+            os.remove(error_file_path)
+        except OSError:
+            pass
+        if self.preprocess():
+            self.msg_callback(_("Reusing the expanded input file"))
+        if self.cancelled:
+            # cancelled while the input was being expanded, so EnergyPlus is never started
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, False)
+            self.msg_callback(_("Simulation cancelled"))
+            self.cancelled_callback()
+            return
+        if not self.prepare_run_mode():
+            self.msg_callback(_("Could not patch the input for a sizing only run, simulating the design days instead"))
+        # each simulation leads its own process group, so a cancel reaches every helper a wrapper script starts
+        start_time = time.time()
+        try:
+            process = subprocess.Popen(
+                self.get_command(base_file_name),
+                shell=False,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **new_group_kwargs(None if self.limits is None else self.limits.apply))
+        except OSError as e:
+            # a missing or non-executable EnergyPlus would otherwise end the thread without any callback
+            self.clean_up_run_mode()
+            if allocated:
+                self.run_dir_allocator.release(self.run_dir, False)
+            # the path is named explicitly, since only python 3 includes it in the error itself
+            self.msg_callback('%s: %s (%s)' % (_("Could not start EnergyPlus"), self.run_script, e.strerror or e))
+            self.failure_callback('', self.run_dir, None)
+            return
+        with self._stop_lock:
+            self.p = process
+            if self.cancelled:
+                # stop was called before there was a process to stop
+                self._terminator = self._start_terminator()
         self.msg_callback(_("Simulation started"))
-        self.std_out, self.std_err = self.p.communicate()
+        # parse the error file while it is written, so its summary is ready the moment the process exits
+        error_tail = ErrorFileTail(error_file_path)
+        self.error_report = error_tail.parser
+        error_tail.start()
+        # stream both pipes as the output arrives rather than holding all of it in memory until the process exits
+        reader = StreamReader(self.p.stdout, self.p.stderr, self.output_line, self.max_output_lines)
+        reader.start()
+        reader.join()
+        self.metrics = wait_with_metrics(self.p, start_time)
+        self.clean_up_run_mode()
+        error_tail.stop()
+        error_tail.join()
+        self.std_out, self.std_err = reader.std_out(), reader.std_err()
+        try:
+            self.metrics.write(self.run_dir)
+        except (IOError, OSError):
+            pass  # the run directory may never have been created if EnergyPlus failed to start
+        if allocated:
+            self.run_dir_allocator.release(self.run_dir, not self.cancelled and self.p.returncode == 0)
         if self.cancelled:
             self.msg_callback(_("Simulation cancelled"))
             self.cancelled_callback()
         else:
             if self.p.returncode == 0:
+                if cache_key is not None:
+                    try:
+                        self.result_cache.store(cache_key, self.run_dir, self.std_out)
+                    except (IOError, OSError, shutil.Error):
+                        pass  # a failure to cache the results should never turn a good run into a failed one
                 self.msg_callback(_("Simulation completed"))
-                self.success_callback(self.std_out, self.run_dir)
+                self.success_callback(self.std_out, self.run_dir, self.metrics)
             else:
                 self.msg_callback(_("Simulation failed"))
-                self.failure_callback(self.std_out, self.run_dir)
+                self.failure_callback(self.std_out, self.run_dir, self.metrics)
+
+    def output_line(self, line):
+        self.msg_callback(line)
+        if self.progress_callback:
+            progress = self.progress_parser.parse_line(line)
+            if progress is not None:
+                self.progress_callback(progress)
 
     @staticmethod
     def get_ep_version(run_script):
-        p = subprocess.Popen([run_script, '-v'], shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        std_out, std_err = p.communicate()
-        return std_out.strip()
-
-    def stop(self):
-        if self.p.poll() is None:
-            self.msg_callback(_("Attempting to cancel simulation ..."))
-            self.cancelled = True
-            self.p.kill()
+        return probe_version(run_script)
+
+    def _start_terminator(self):
+        terminator = threading.Thread(target=terminate_group, args=(self.p, EnergyPlusThread.TerminateTimeout))
+        terminator.daemon = True
+        terminator.start()
+        return terminator
+
+    def stop(self, wait=False):
+        """
+        This function cancels the simulation, asking its whole process group to terminate and killing whatever is still
+        running after TerminateTimeout seconds
+
+        * wait: True to block until every process of the simulation has exited, False to return right away
+        """
+        with self._stop_lock:
+            if not self.cancelled:
+                if self.p is not None and not group_alive(self.p):
+                    return  # already finished
+                self.msg_callback(_("Attempting to cancel simulation ..."))
+                self.cancelled = True
+                self.preprocess_cancel.set()
+                if self.p is not None:
+                    self._terminator = self._start_terminator()
+            terminator = self._terminator
+        if wait and terminator is not None:
+            terminator.join()
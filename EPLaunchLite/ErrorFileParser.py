@@ -0,0 +1,266 @@
+import re
+import threading
+
+from International import translate as _
+
+
+class Severity:
+    Warning = 'Warning'
+    Severe = 'Severe'
+    Fatal = 'Fatal'
+
+    # from least to most serious
+    All = (Warning, Severe, Fatal)
+
+
+_ENTRY = re.compile(r'^\s*\*\*\s*(Warning|Severe|Fatal)\s*\*\*\s?(.*)$')
+_CONTINUATION = re.compile(r'^\s*\*\*\s+~~~\s+\*\*\s?(.*)$')
+_FINAL = re.compile(r'^\s*\*{13}\s*EnergyPlus (Completed Successfully|Terminated)')
+_QUOTED = re.compile(r'"([^"]*)"|\'([^\']*)\'')
+_OBJECT = re.compile(
+    r'(?:Object|Surface|Zone|Node|Construction|Material|Schedule)\s*(?:Name)?\s*=\s*([^,;*\s][^,;]*)', re.IGNORECASE
+)
+_NUMBER = re.compile(r'[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+
+def message_type(message):
+    """
+    This function reduces a message to its type, so messages that differ only in object names and values group together
+
+    * message: The first line of an error file entry
+    * Returns: The message with quoted names replaced by * and numbers replaced by #
+    """
+    text = _QUOTED.sub('*', message)
+    text = _OBJECT.sub(lambda match: match.group(0).replace(match.group(1), '*'), text)
+    return ' '.join(_NUMBER.sub('#', text).split())
+
+
+def message_object(message):
+    """
+    This function finds the name of the input object a message is about
+
+    * message: The first line of an error file entry
+    * Returns: The object name, or None if the message does not name one
+    """
+    match = _QUOTED.search(message)
+    if match is not None:
+        return match.group(1) if match.group(1) is not None else match.group(2)
+    match = _OBJECT.search(message)
+    if match is not None:
+        return match.group(1).strip()
+    return None
+
+
+class ErrorEntry(object):
+    """
+    This class is one distinct error file message, with the number of times it was repeated
+    """
+
+    def __init__(self, severity, message):
+        self.severity = severity
+        self.message = message
+        self.continuations = []
+        self.count = 1
+        # only worked out for distinct entries, since repeats are merged into the first one
+        self.message_type = None
+        self.object_name = None
+
+    def key(self):
+        return self.severity, self.message, tuple(self.continuations)
+
+    def to_dict(self):
+        return {
+            'severity': self.severity,
+            'message': self.message,
+            'continuations': list(self.continuations),
+            'count': self.count,
+            'message_type': self.message_type,
+            'object': self.object_name,
+        }
+
+
+class ErrorFileParser(object):
+    """
+    This class parses an EnergyPlus error file one line at a time into severity classified, de-duplicated entries
+
+    An entry is only complete once the line after its last continuation arrives, at which point it is either merged
+    into an identical earlier entry or added as a new one.  Memory therefore grows with the number of distinct
+    messages rather than the number of lines, and the entries are indexed by message type and by object name as they
+    are added, so a summary of a file with hundreds of thousands of warnings is available as soon as the last line
+    has been read.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.counts = dict((severity, 0) for severity in Severity.All)
+        self.by_type = {}
+        self.by_object = {}
+        self.final_status = None
+        self.line_count = 0
+        self._by_key = {}
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def parse_line(self, line):
+        """
+        This function processes the next line of the error file
+
+        * line: The line, with or without its trailing newline
+        """
+        with self._lock:
+            self.line_count += 1
+            continuation = _CONTINUATION.match(line)
+            if continuation is not None:
+                if self._pending is not None:
+                    self._pending.continuations.append(continuation.group(1).rstrip())
+                return
+            self._finish_pending()
+            entry = _ENTRY.match(line)
+            if entry is not None:
+                self._pending = ErrorEntry(entry.group(1), entry.group(2).rstrip())
+                return
+            final = _FINAL.match(line)
+            if final is not None:
+                self.final_status = line.strip().strip('*').strip()
+
+    def finish(self):
+        """
+        This function completes the last entry once the whole file has been read
+        """
+        with self._lock:
+            self._finish_pending()
+
+    def _finish_pending(self):
+        entry = self._pending
+        if entry is None:
+            return
+        self._pending = None
+        self.counts[entry.severity] += 1
+        existing = self._by_key.get(entry.key())
+        if existing is not None:
+            existing.count += 1
+            return
+        self._by_key[entry.key()] = entry
+        entry.message_type = message_type(entry.message)
+        entry.object_name = message_object(entry.message)
+        self.entries.append(entry)
+        self.by_type.setdefault((entry.severity, entry.message_type), []).append(entry)
+        if entry.object_name is not None:
+            self.by_object.setdefault(entry.object_name, []).append(entry)
+
+    def parse_file(self, file_path):
+        """
+        This function parses a complete error file
+
+        * file_path: The path to the error file
+        * Returns: This parser, for chaining
+        """
+        with open(file_path, 'rb') as f:
+            for raw_line in f:
+                self.parse_line(raw_line.decode('utf-8', 'replace').rstrip('\r\n'))
+        self.finish()
+        return self
+
+    def message_types(self, severity=None):
+        """
+        This function ranks the message types by how often they occurred
+
+        * severity: Only include this severity, or None for all of them
+        * Returns: A list of (severity, message type, total count, distinct entries) tuples, most serious and most
+          frequent first
+        """
+        with self._lock:
+            groups = [(key[0], key[1], sum(entry.count for entry in entries), len(entries))
+                      for key, entries in self.by_type.items() if severity is None or key[0] == severity]
+        groups.sort(key=lambda group: (-Severity.All.index(group[0]), -group[2], group[1]))
+        return groups
+
+    def summary(self):
+        """
+        This function collects the totals, the final status line, and the ranked message types
+
+        * Returns: A dictionary suitable for json serialization
+        """
+        return {
+            'counts': dict(self.counts),
+            'distinct': len(self.entries),
+            'final_status': self.final_status,
+            'message_types': [{'severity': severity, 'message_type': text, 'count': count, 'distinct': distinct}
+                              for severity, text, count, distinct in self.message_types()],
+        }
+
+    def format_summary(self, max_types=20):
+        """
+        This function describes the error file in a few lines for display
+
+        * max_types: The number of message types listed
+        * Returns: A translated multi-line string
+        """
+        lines = [_("%d Fatal, %d Severe, %d Warning") % (
+            self.counts[Severity.Fatal], self.counts[Severity.Severe], self.counts[Severity.Warning]
+        )]
+        if self.final_status:
+            lines.append(self.final_status)
+        groups = self.message_types()
+        for severity, text, count, _distinct in groups[:max_types]:
+            lines.append('%s x%d: %s' % (severity, count, text))
+        if len(groups) > max_types:
+            lines.append(_("... and %d more message types") % (len(groups) - max_types))
+        return '\n'.join(lines)
+
+
+class ErrorFileTail(threading.Thread):
+    """
+    This class follows an error file while EnergyPlus is still writing it, feeding complete lines to a parser
+
+    The file may not exist until EnergyPlus gets going, so the thread waits for it to appear.  After stop is called
+    the rest of the file is read and the last entry is completed, so joining the thread leaves the parser holding the
+    whole file.
+    """
+
+    def __init__(self, file_path, parser=None, poll_interval=0.25):
+        """
+        * file_path: The path to the error file
+        * parser: The ErrorFileParser to feed, defaulting to a new one
+        * poll_interval: The number of seconds to wait for more output when the end of the file is reached
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.file_path = file_path
+        self.parser = parser if parser is not None else ErrorFileParser()
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        f = None
+        try:
+            while f is None:
+                try:
+                    f = open(self.file_path, 'rb')
+                except (IOError, OSError):
+                    if self._stopping.is_set():
+                        return
+                    self._stopping.wait(self.poll_interval)
+            partial = b''
+            while True:
+                # check for stop before reading, so the read after a stop always reaches the end of the file
+                stopping = self._stopping.is_set()
+                chunk = f.read(1 << 16)
+                if chunk:
+                    lines = (partial + chunk).split(b'\n')
+                    partial = lines.pop()
+                    for raw_line in lines:
+                        self.parser.parse_line(raw_line.decode('utf-8', 'replace').rstrip('\r'))
+                elif stopping:
+                    break
+                else:
+                    self._stopping.wait(self.poll_interval)
+            if partial:
+                self.parser.parse_line(partial.decode('utf-8', 'replace').rstrip('\r'))
+        finally:
+            if f is not None:
+                f.close()
+            self.parser.finish()
@@ -0,0 +1,219 @@
+"""
+This module watches the files a simulation reads, so it can be run again as soon as they are saved
+
+On Linux the folders holding the files are watched with inotify, called through ctypes so no extra package is needed,
+and the watch reacts to a file being written or renamed into place, which covers editors that save by replacing the
+file.  Everywhere else the modified time and size of each file are polled instead.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from PreprocessCache import is_macro_file, macro_dependencies
+
+# inotify event masks, from sys/inotify.h
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# the fixed part of an inotify event: watch descriptor, mask, cookie, and name length
+_EVENT = struct.Struct('iIII')
+
+
+def watched_files(input_file, weather_file):
+    """
+    This function lists the files that affect a simulation, which are the ones worth watching
+
+    * input_file: The path to the input file
+    * weather_file: The path to the weather file
+    * Returns: A list of paths, including every file a macro input includes that can currently be found
+    """
+    paths = [input_file, weather_file]
+    if is_macro_file(input_file):
+        try:
+            paths.extend(path for _name, path in macro_dependencies(input_file))
+        except (IOError, OSError):
+            pass  # a missing include shows up when EnergyPlus runs, and the watch picks it up once it is saved
+    return paths
+
+
+def _load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyBackend(object):
+    """
+    This class reports changes to a set of files from inotify events on their folders
+    """
+
+    def __init__(self, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}
+        self.paths = {}
+
+    def set_paths(self, paths):
+        """
+        This function replaces the set of watched files
+
+        * paths: A list of file paths, which do not have to exist yet as long as their folders do
+        """
+        # events carry the real folder, so the real paths are matched and mapped back to the names given
+        self.paths = dict((os.path.realpath(path), path) for path in paths)
+        for folder in set(os.path.dirname(path) for path in self.paths):
+            if folder in self.folders.values():
+                continue
+            descriptor = self.libc.inotify_add_watch(self.fd, folder.encode(sys.getfilesystemencoding() or 'utf-8'),
+                                                     _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE)
+            if descriptor >= 0:
+                self.folders[descriptor] = folder
+
+    def wait(self, timeout, stopped):
+        """
+        This function waits for any of the watched files to change
+
+        * timeout: The maximum number of seconds to wait
+        * stopped: A threading.Event that ends the wait early when set; inotify waits run the full timeout regardless
+        * Returns: A set of the watched paths that changed, empty if none did
+        """
+        readable, _writable, _errors = select.select([self.fd], [], [], timeout)
+        changed = set()
+        if not readable:
+            return changed
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError:
+            return changed
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            descriptor, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            folder = self.folders.get(descriptor)
+            if folder is None:
+                continue
+            path = os.path.join(folder, name.decode(sys.getfilesystemencoding() or 'utf-8'))
+            if path in self.paths:
+                changed.add(self.paths[path])
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend(object):
+    """
+    This class reports changes to a set of files by comparing their modified time and size between polls
+    """
+
+    def __init__(self):
+        self.snapshot = {}
+
+    @staticmethod
+    def _identity(path):
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            return None
+        return path_stat.st_mtime, path_stat.st_size
+
+    def set_paths(self, paths):
+        self.snapshot = dict((path, self._identity(path)) for path in paths)
+
+    def wait(self, timeout, stopped):
+        stopped.wait(timeout)
+        changed = set()
+        for path, identity in self.snapshot.items():
+            current = self._identity(path)
+            if current != identity:
+                self.snapshot[path] = current
+                if current is not None:
+                    changed.add(path)  # a file that is gone is only a change once it is back
+        return changed
+
+    def close(self):
+        pass
+
+
+class FileWatcher(threading.Thread):
+    """
+    This class calls back whenever a set of files changes, once a burst of saves has settled
+
+    Editors often write a file several times in quick succession, so after the first change the watcher waits until
+    the files have been quiet for the debounce interval before calling back, with every file changed in the meantime.
+    The file list is fetched again after every callback, so it can follow a different input or a new include.
+    """
+
+    def __init__(self, paths_function, callback, debounce=0.5, poll_interval=0.5, use_inotify=True):
+        """
+        * paths_function: Called with no arguments to get the list of file paths to watch
+        * callback: Called from the watcher thread with a sorted list of the changed paths
+        * debounce: The number of quiet seconds that end a burst of changes
+        * poll_interval: The number of seconds between checks for changes, and for a stop request
+        * use_inotify: False to poll even where inotify is available
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.paths_function = paths_function
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        libc = _load_inotify() if use_inotify else None
+        self.backend = None
+        if libc is not None:
+            try:
+                self.backend = InotifyBackend(libc)
+            except OSError:
+                pass  # out of inotify instances, so this watch has to poll
+        if self.backend is None:
+            self.backend = PollingBackend()
+        # the initial file list is taken now, so a change made as soon as the constructor returns is still seen
+        self.backend.set_paths(self.paths_function())
+        self._stopped = threading.Event()
+
+    def stop(self):
+        """
+        This function asks the watcher to stop, which happens within the poll interval
+        """
+        self._stopped.set()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                changed = self.backend.wait(self.poll_interval, self._stopped)
+                if not changed:
+                    continue
+                # other files in the same folders wake the wait too, so the quiet time is measured against a deadline
+                deadline = time.time() + self.debounce
+                while not self._stopped.is_set():
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    more = self.backend.wait(remaining, self._stopped)
+                    if more:
+                        changed |= more
+                        deadline = time.time() + self.debounce
+                if self._stopped.is_set():
+                    break
+                self.callback(sorted(changed))
+                self.backend.set_paths(self.paths_function())
+        finally:
+            self.backend.close()
@@ -0,0 +1,170 @@
+import re
+
+from EnergyPlusInstalls import parse_version
+from International import translate as _
+from ProgressParser import day_of_year
+
+_COMMENT = re.compile(r'!.*')
+
+
+class IDFSummary(object):
+    """
+    This class holds what a pre-flight scan learned about an input file
+    """
+
+    def __init__(self):
+        self.version = None
+        self.version_string = None
+        self.run_periods = []
+        self.simulation_control = None
+        self.object_counts = {}
+        self.complete = False
+
+    def run_period_days(self):
+        """
+        This function finds the length of the first run period found in the file
+
+        * Returns: The number of simulated days, or None if the file has no readable run period
+        """
+        if not self.run_periods:
+            return None
+        return self.run_periods[0]['days']
+
+
+class IDFScanner(object):
+    """
+    This class tokenizes an input file in chunks and pulls out the objects needed to sanity check it before launch
+
+    Comments are stripped and the text is split on the semicolons that end each object, so the file is never parsed
+    field by field except for the few object types of interest.  A scan can stop as soon as the wanted object types
+    have been seen, which makes a version check take the same few milliseconds however big the file is.
+    """
+
+    ChunkSize = 1 << 16
+    InterestingTypes = ('version', 'runperiod', 'simulationcontrol', 'schedule:file', 'schedule:file:shading')
+
+    # the position of the file name among the fields of each object type that reads an external file
+    FileNameFields = {'schedule:file': 2, 'schedule:file:shading': 0}
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def iter_objects(self):
+        """
+        This function lazily splits the input file into objects
+
+        * Returns: A generator of (lower case object type, list of field strings or None) tuples, where the fields are
+          only split out for the interesting object types
+        """
+        remainder = ''
+        with open(self.file_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.ChunkSize)
+                if not chunk:
+                    break
+                text = remainder + chunk.decode('latin-1')
+                # only process complete lines so a comment can never be split across two chunks
+                last_newline = text.rfind('\n')
+                if last_newline < 0:
+                    remainder = text
+                    continue
+                remainder = text[last_newline + 1:]
+                text = _COMMENT.sub('', text[:last_newline + 1])
+                pieces = text.split(';')
+                remainder = pieces.pop() + remainder
+                for piece in pieces:
+                    yield self._object(piece)
+        pieces = _COMMENT.sub('', remainder).split(';')
+        for piece in pieces[:-1]:
+            yield self._object(piece)
+
+    @staticmethod
+    def _object(text):
+        object_type = text.split(',', 1)[0].strip().lower()
+        if object_type in IDFScanner.InterestingTypes:
+            return object_type, [field.strip() for field in text.split(',')[1:]]
+        return object_type, None
+
+    def scan(self, stop_when=None):
+        """
+        This function scans the input file
+
+        * stop_when: A collection of lower case object types; the scan stops once one of each has been found, or None
+          to scan the whole file and count every object type
+        * Returns: An IDFSummary; object counts only cover the part of the file that was read unless it is complete
+        """
+        summary = IDFSummary()
+        remaining = set(stop_when) if stop_when is not None else None
+        for object_type, fields in self.iter_objects():
+            if not object_type:
+                continue
+            summary.object_counts[object_type] = summary.object_counts.get(object_type, 0) + 1
+            if object_type == 'version' and fields:
+                summary.version_string = fields[0]
+                summary.version = parse_version(fields[0])
+            elif object_type == 'simulationcontrol':
+                summary.simulation_control = IDFScanner._simulation_control(fields)
+            elif object_type == 'runperiod':
+                summary.run_periods.append(IDFScanner._run_period(fields, summary.version))
+            if remaining is not None:
+                remaining.discard(object_type)
+                if not remaining:
+                    return summary
+        summary.complete = True
+        return summary
+
+    def external_files(self):
+        """
+        This function lists the external files the objects in the input file read, such as Schedule:File csv files
+
+        * Returns: A list of file names as written in the input, which may be relative
+        """
+        names = []
+        for object_type, fields in self.iter_objects():
+            position = IDFScanner.FileNameFields.get(object_type)
+            if position is not None and fields is not None and position < len(fields) and fields[position]:
+                names.append(fields[position])
+        return names
+
+    @staticmethod
+    def _simulation_control(fields):
+        names = ['do_zone_sizing', 'do_system_sizing', 'do_plant_sizing', 'run_sizing_periods',
+                 'run_weather_file_periods']
+        return dict((name, field.lower() == 'yes') for name, field in zip(names, fields))
+
+    @staticmethod
+    def _run_period(fields, version):
+        # version 9.0 added a begin year field after the begin day, and an end year after the end day
+        if version is not None and version >= (9, 0):
+            positions = (1, 2, 4, 5)
+        else:
+            positions = (1, 2, 3, 4)
+        period = {'name': fields[0] if fields else '', 'days': None}
+        try:
+            begin_month, begin_day, end_month, end_day = [int(fields[i]) for i in positions]
+            period['days'] = (day_of_year(end_month, end_day) - day_of_year(begin_month, begin_day)) % 365 + 1
+        except (IndexError, ValueError):
+            pass
+        return period
+
+
+def preflight_check(input_file, engine_version):
+    """
+    This function quickly checks whether an input file can be run by an EnergyPlus version
+
+    * input_file: The path to the input file
+    * engine_version: The version string reported by EnergyPlus, or None if it is not known yet
+    * Returns: A translated problem description, or None if no problem was found
+    """
+    try:
+        summary = IDFScanner(input_file).scan(stop_when=['version'])
+    except (IOError, OSError):
+        return _("Could not read input file")
+    if summary.version is None:
+        return _("Input file has no Version object")
+    engine = parse_version(engine_version)
+    if engine is not None and engine[:2] != summary.version[:2]:
+        return _("Input file version %s does not match EnergyPlus %d.%d") % (
+            summary.version_string, engine[0], engine[1]
+        )
+    return None
@@ -12,56 +12,98 @@ def set_language(lang):
 
 
 EnglishDictionary = {
+    '%d Fatal, %d Severe, %d Warning': '%d Fatal, %d Severe, %d Warning',
+    '... and %d more message types': '... and %d more message types',
     'About...': 'About...',
     'About this program:': 'About this program:',
     'ABOUT_DIALOG': 'This program was created by NREL for the United States Department of Energy.',
+    'Attempting to cancel simulation ...': 'Attempting to cancel simulation ...',
     'Cancel': 'Cancel',
     'Cancelled!': 'Cancelled!',
     'Choose Input File..': 'Choose Input File..',
     'Choose Weather File..': 'Choose Weather File..',
+    'Checking E+ Version...': 'Checking E+ Version...',
+    'Looking for EnergyPlus...': 'Looking for EnergyPlus...',
     'Close': 'Close',
     'Could not open run directory': 'Could not open run directory',
+    'Could not read input file': 'Could not read input file',
+    'Could not read weather file': 'Could not read weather file',
     'Could not open input file, set default application by opening the file separately first.':
         'Could not open input file, set default application by opening the file separately first.',
     'Edit Input File..': 'Edit Input File..',
     'E+ Version': 'E+ Version',
     'EnergyPlus Failed': 'EnergyPlus Failed',
     'EnergyPlus Failed!': 'EnergyPlus Failed!',
+    'EnergyPlus not found': 'EnergyPlus not found',
+    '%s: HDD %d, CDD %d, heating design %.1f C, cooling design %.1f C':
+        '%s: HDD %d, CDD %d, heating design %.1f C, cooling design %.1f C',
     'EnergyPlus Simulation Output:': 'EnergyPlus Simulation Output:',
     'EPW files': 'EPW files',
     'Error file is the best place to start.  Would you like to open the Run Folder?':
         'Error file is the best place to start.  Would you like to open the Run Folder?',
     'Error performing prior action:': 'Error performing prior action:',
+    'ETA': 'ETA',
     'Exit': 'Exit',
     'File': 'File',
     'IDF files': 'IDF files',
+    'Initializing': 'Initializing',
+    'Jobs: %d running, %d pending, %d completed, %d failed': 'Jobs: %d running, %d pending, %d completed, %d failed',
     'Input and/or Weather file paths are invalid': 'Input and/or Weather file paths are invalid',
+    'Input file has no Version object': 'Input file has no Version object',
+    'Input file version %s does not match EnergyPlus %d.%d': 'Input file version %s does not match EnergyPlus %d.%d',
+    'Distance': 'Distance',
+    'Location': 'Location',
     'Message': 'Message',
     'Open Run Directory': 'Open Run Directory',
     'Ready for launch': 'Ready for launch',
+    'Total site energy: %.2f GJ': 'Total site energy: %.2f GJ',
+    'Run time %s, CPU time %s, peak memory %.1f MB': 'Run time %s, CPU time %s, peak memory %.1f MB',
     'You must restart the app to make the language change take effect.  Would you like to restart now?':
         'You must restart the app to make the language change take effect.  Would you like to restart now?',
     'Select input file': 'Select input file',
     'Select weather file': 'Select weather file',
+    'Search Weather Library': 'Search Weather Library',
+    'Search Weather Library..': 'Search Weather Library..',
+    'Search by name, or enter a latitude and longitude to find the nearest files:':
+        'Search by name, or enter a latitude and longitude to find the nearest files:',
     'Simulate': 'Simulate',
+    '... %d lines skipped': '... %d lines skipped',
+    'Re-run on save': 'Re-run on save',
+    'Input changed, restarting simulation': 'Input changed, restarting simulation',
+    'Annual simulation': 'Annual simulation',
+    'Design days only': 'Design days only',
+    'Sizing only': 'Sizing only',
+    'Could not patch the input for a sizing only run, simulating the design days instead':
+        'Could not patch the input for a sizing only run, simulating the design days instead',
     'Simulation cancelled': 'Simulation cancelled',
     'Simulation Output': 'Simulation Output',
     'Simulation completed': 'Simulation completed',
     'Simulation failed': 'Simulation failed',
+    'Could not start EnergyPlus': 'Could not start EnergyPlus',
+    'Simulation results loaded from cache': 'Simulation results loaded from cache',
+    'Reusing the expanded input file': 'Reusing the expanded input file',
     'Simulation started': 'Simulation started',
-    'Switch language': 'Switch language'
+    'Switch language': 'Switch language',
+    'Warming up (iteration %d)': 'Warming up (iteration %d)'
 }
 
 SpanishDictionary = {
+    '%d Fatal, %d Severe, %d Warning': '%d fatales, %d graves, %d advertencias',
+    '... and %d more message types': '... y %d tipos de mensaje mas',
     'About...': 'Acerca de...',
     'About this program:': 'Acerca de este programa',
     'ABOUT_DIALOG': 'Este programa fue creado por el NREL para el Departamento de Energia de los Estados Unidos.',
+    'Attempting to cancel simulation ...': 'Intentando cancelar la simulacion ...',
     'Cancel': 'Cancelar',
     'Cancelled!': 'Cancelado!',
     'Choose Input File..': 'Elija el archivo de entrada..',
     'Choose Weather File..': 'Elija Tiempo Archivo..',
+    'Checking E+ Version...': 'Comprobando la version de E+...',
+    'Looking for EnergyPlus...': 'Buscando EnergyPlus...',
     'Close': 'Cerca',
     'Could not open run directory': 'No se pudo abrir directorio de ejecucion',
+    'Could not read input file': 'No se pudo leer el archivo de entrada',
+    'Could not read weather file': 'No se pudo leer el archivo de clima',
     'Could not open input file, set default application by opening the file separately first.':
         'No se pudo abrir el archivo de entrada, ajuste aplicacion ' +
         'por defecto al abrir el archivo por separado en primer lugar.',
@@ -69,29 +111,60 @@ SpanishDictionary = {
     'E+ Version': 'E+ Version',
     'EnergyPlus Failed': 'EnergyPlus fallado',
     'EnergyPlus Failed!': 'EnergyPlus fallado!',
+    'EnergyPlus not found': 'EnergyPlus no encontrado',
+    '%s: HDD %d, CDD %d, heating design %.1f C, cooling design %.1f C':
+        '%s: GDC %d, GDR %d, diseno de calefaccion %.1f C, diseno de refrigeracion %.1f C',
     'EnergyPlus Simulation Output:': 'EnergyPlus salida de la simulacion:',
     'EPW files': 'EPW archivos',
     'Error file is the best place to start.  Would you like to open the Run Folder?':
         'Archivo de errores es el mejor lugar para empezar. Le gustaria abrir la carpeta Run?',
     'Error performing prior action:': 'Error al realizar la accion previa:',
+    'ETA': 'Tiempo restante',
     'Exit': 'Salida',
     'File': 'Archivo',
     'IDF files': 'IDF archivos',
+    'Initializing': 'Inicializando',
+    'Jobs: %d running, %d pending, %d completed, %d failed':
+        'Trabajos: %d en ejecucion, %d pendientes, %d completados, %d fallados',
     'Input and/or Weather file paths are invalid': 'Las rutas de entrada y/o archivos de tiempo no son validos',
+    'Input file has no Version object': 'El archivo de entrada no tiene objeto Version',
+    'Input file version %s does not match EnergyPlus %d.%d':
+        'La version %s del archivo de entrada no coincide con EnergyPlus %d.%d',
+    'Distance': 'Distancia',
+    'Location': 'Ubicacion',
     'Message': 'Mensaje',
     'Open Run Directory': 'Directorio de ejecucion abierta',
     'Ready for launch': 'Listo para su lanzamiento',
+    'Total site energy: %.2f GJ': 'Energia total del sitio: %.2f GJ',
+    'Run time %s, CPU time %s, peak memory %.1f MB':
+        'Tiempo de ejecucion %s, tiempo de CPU %s, memoria maxima %.1f MB',
     'You must restart the app to make the language change take effect.  Would you like to restart now?':
         'Debe reiniciar la aplicacion para que el cambio de idioma tenga efecto. Le gustaria reiniciar ahora?',
     'Select input file': 'Seleccionar archivo de entrada',
     'Select weather file': 'Seleccionar archivo de tiempo',
+    'Search Weather Library': 'Buscar en la biblioteca de clima',
+    'Search Weather Library..': 'Buscar en la biblioteca de clima..',
+    'Search by name, or enter a latitude and longitude to find the nearest files:':
+        'Busque por nombre, o ingrese una latitud y longitud para encontrar los archivos mas cercanos:',
     'Simulate': 'Simular',
+    '... %d lines skipped': '... %d lineas omitidas',
+    'Re-run on save': 'Volver a simular al guardar',
+    'Input changed, restarting simulation': 'La entrada cambio, reiniciando la simulacion',
+    'Annual simulation': 'Simulacion anual',
+    'Design days only': 'Solo dias de diseno',
+    'Sizing only': 'Solo dimensionamiento',
+    'Could not patch the input for a sizing only run, simulating the design days instead':
+        'No se pudo modificar la entrada para dimensionar solamente, simulando los dias de diseno',
     'Simulation cancelled': 'Simulacion cancelado',
     'Simulation Output': 'Salida de la simulacion',
     'Simulation completed': 'Simulacion completado',
     'Simulation failed': 'Simulacion fallo',
+    'Could not start EnergyPlus': 'No se pudo iniciar EnergyPlus',
+    'Simulation results loaded from cache': 'Resultados de la simulacion cargados del cache',
+    'Reusing the expanded input file': 'Reutilizando el archivo de entrada expandido',
     'Simulation started': 'Simulacion comenzo',
-    'Switch language': 'Cambiar de idioma'
+    'Switch language': 'Cambiar de idioma',
+    'Warming up (iteration %d)': 'Calentamiento (iteracion %d)'
 }
 
 
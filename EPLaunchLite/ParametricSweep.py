@@ -0,0 +1,226 @@
+import csv
+import glob
+import json
+import os
+
+from ResultCache import hash_file
+from SimulationQueue import JobStatus, SimulationQueue
+
+
+def expand_patterns(patterns, base_dir=None):
+    """
+    This function expands a list of file names and glob patterns into a sorted list of existing files
+
+    * patterns: A list of paths, each of which may contain glob wildcards
+    * base_dir: The folder that relative patterns are resolved against, defaulting to the current folder
+    * Returns: A list of matching file paths, in pattern order and sorted within each pattern
+    """
+    files = []
+    for pattern in patterns:
+        if base_dir is not None:
+            pattern = os.path.join(base_dir, os.path.expanduser(pattern))
+        matches = sorted(glob.glob(pattern))
+        files.extend(match for match in matches if match not in files)
+    return files
+
+
+class SweepJob(object):
+    """
+    This class is one point of a parametric sweep: an input file, a weather file, and an engine to run them with
+    """
+
+    def __init__(self, input_file, weather_file, engine_label, run_script, key):
+        self.input_file = input_file
+        self.weather_file = weather_file
+        self.engine_label = engine_label
+        self.run_script = run_script
+        self.key = key
+        self.run_dir = None
+        self.duplicates = []
+        self.queue_job = None
+
+    @property
+    def status(self):
+        if self.queue_job is None:
+            return JobStatus.Pending
+        return self.queue_job.status
+
+    def summary_row(self):
+        """
+        This function describes the outcome of this sweep point
+
+        * Returns: A dictionary with the input, weather, engine, status, run directory, and number of duplicates, where
+          the run directory is the one the results actually ended up in once the simulation has finished
+        """
+        run_dir = self.run_dir
+        if self.queue_job is not None and self.queue_job.run_dir:
+            run_dir = self.queue_job.run_dir
+        return {
+            'idf': self.input_file,
+            'epw': self.weather_file,
+            'engine': self.engine_label,
+            'status': self.status,
+            'run_dir': run_dir,
+            'duplicates': len(self.duplicates),
+        }
+
+
+class ParametricSweep(object):
+    """
+    This class expands a matrix of input files, weather files, and EnergyPlus engines into simulations and runs them
+
+    Points of the matrix whose input file contents, weather file contents, and engine are identical are simulated only
+    once, and every remaining point gets its own run directory below the sweep output folder, so they can all run
+    concurrently.
+    """
+
+    SummaryColumns = ['idf', 'epw', 'engine', 'status', 'run_dir', 'duplicates']
+
+    def __init__(self, input_files, weather_files, engines, output_dir):
+        """
+        * input_files: A list of input file paths
+        * weather_files: A list of weather file paths
+        * engines: A list of (label, run_script) tuples, such as [('9-0-1', '/usr/local/EnergyPlus-9-0-1/EnergyPlus')]
+        * output_dir: The folder below which every sweep point gets its own run directory
+        """
+        self.input_files = input_files
+        self.weather_files = weather_files
+        self.engines = engines
+        self.output_dir = output_dir
+        self.jobs = None
+
+    @staticmethod
+    def from_matrix_file(matrix_file_name, engine_lookup, output_dir=None):
+        """
+        This function builds a sweep from a json matrix file such as
+        {"idf": ["models/*.idf"], "epw": ["weather/*.epw"], "versions": ["8-9-0", "9-0-1"], "output_dir": "sweep"};
+        relative paths are resolved against the folder holding the matrix file
+
+        * matrix_file_name: The path to the matrix file
+        * engine_lookup: A function taking a version string, or None for the default engine, and returning a
+          (label, run_script) tuple, or None if no such engine is installed
+        * output_dir: The sweep output folder, overriding any output_dir in the matrix file
+        * Returns: A new ParametricSweep instance
+        """
+        with open(matrix_file_name) as f:
+            matrix = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(matrix_file_name))
+        engines = []
+        for version in matrix.get('versions') or [None]:
+            engine = engine_lookup(version)
+            if engine is None:
+                raise ValueError("No EnergyPlus installation found for version %s" % version)
+            engines.append(engine)
+        if output_dir is None:
+            output_dir = os.path.join(base_dir, matrix.get('output_dir', 'sweep-output'))
+        return ParametricSweep(
+            expand_patterns(matrix.get('idf', []), base_dir), expand_patterns(matrix.get('epw', []), base_dir),
+            engines, output_dir
+        )
+
+    @staticmethod
+    def _stem(file_path):
+        return os.path.splitext(os.path.basename(file_path))[0]
+
+    def expand(self):
+        """
+        This function expands the matrix into sweep jobs, folding equivalent points together and assigning each
+        remaining job a unique run directory
+
+        * Returns: The list of unique SweepJob instances
+        """
+        content_hashes = {}
+
+        def content_hash(file_path):
+            if file_path not in content_hashes:
+                content_hashes[file_path] = hash_file(file_path).hexdigest()
+            return content_hashes[file_path]
+
+        unique = {}
+        self.jobs = []
+        used_dirs = set()
+        for input_file in self.input_files:
+            for weather_file in self.weather_files:
+                for engine_label, run_script in self.engines:
+                    key = (content_hash(input_file), content_hash(weather_file), os.path.realpath(run_script))
+                    if key in unique:
+                        unique[key].duplicates.append((input_file, weather_file, engine_label))
+                        continue
+                    job = SweepJob(input_file, weather_file, engine_label, run_script, key)
+                    name = '%s__%s__%s' % (self._stem(input_file), self._stem(weather_file), engine_label)
+                    if name in used_dirs:
+                        name = '%s-%d' % (name, len(self.jobs) + 1)
+                    used_dirs.add(name)
+                    job.run_dir = os.path.join(self.output_dir, name)
+                    unique[key] = job
+                    self.jobs.append(job)
+        return self.jobs
+
+    def run(self, max_workers=None, job_callback=None, result_cache=None, preprocess_cache=None,
+            post_process_pool=None):
+        """
+        This function runs every unique sweep job concurrently and waits for them all to finish
+
+        * max_workers: The maximum number of concurrent simulations, defaulting to the number of cpu cores
+        * job_callback: Called with (queue_job) each time a simulation changes status
+        * result_cache: An optional ResultCache shared by the simulations
+        * preprocess_cache: An optional PreprocessCache shared by the simulations
+        * post_process_pool: An optional PostProcessPool to convert the output to csv once each simulation is done,
+          which this function does not wait for
+        * Returns: The SimulationQueue that ran the jobs
+        """
+        if self.jobs is None:
+            self.expand()
+        queue = SimulationQueue(None, max_workers, job_callback=job_callback, result_cache=result_cache,
+                                preprocess_cache=preprocess_cache, post_process_pool=post_process_pool)
+        self.submit_to(queue)
+        queue.wait()
+        return queue
+
+    def submit_to(self, queue):
+        """
+        This function submits every unique sweep job to an existing queue without waiting for them
+
+        * queue: The SimulationQueue to submit the jobs to
+        """
+        if self.jobs is None:
+            self.expand()
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        for job in self.jobs:
+            job.queue_job = queue.submit(job.input_file, job.weather_file, job.run_script, job.run_dir)
+
+    def summary_rows(self):
+        """
+        This function builds the aggregate results table of the sweep
+
+        * Returns: A list of dictionaries, one per unique job, with the keys in SummaryColumns
+        """
+        return [job.summary_row() for job in self.jobs or []]
+
+    def write_summary_csv(self, csv_file_name):
+        """
+        This function writes the aggregate results table to a csv file
+
+        * csv_file_name: The path of the csv file to write
+        """
+        with open(csv_file_name, 'w') as f:
+            writer = csv.DictWriter(f, ParametricSweep.SummaryColumns)
+            writer.writeheader()
+            for row in self.summary_rows():
+                writer.writerow(row)
+
+    def format_summary(self):
+        """
+        This function formats the aggregate results table as aligned plain text
+
+        * Returns: The table as a single string
+        """
+        columns = ['idf', 'epw', 'engine', 'status']
+        rows = [[os.path.basename(row['idf']), os.path.basename(row['epw']), row['engine'], row['status']]
+                for row in self.summary_rows()]
+        widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+        lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths)).rstrip()]
+        for row in rows:
+            lines.append('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+        return '\n'.join(lines)
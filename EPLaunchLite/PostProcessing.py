@@ -0,0 +1,202 @@
+"""
+This module converts simulation output to csv with ReadVarsESO after a run, instead of as part of it
+
+Passing -r makes EnergyPlus run ReadVarsESO before it exits, so a batch slot stays busy with single threaded post
+processing whose csv files are often never looked at.  A run can instead leave out -r and have its conversion tracked
+by a PostProcessTask, which is either run on demand or handed to a PostProcessPool of low priority workers.
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+from ProcessGroup import new_group_kwargs
+from ResourceLimits import IOClass, ResourceLimits
+
+
+class PostProcessStatus:
+    Deferred = 'deferred'
+    Queued = 'queued'
+    Running = 'running'
+    Done = 'done'
+    Failed = 'failed'
+
+    # the statuses that a task can never leave once reached
+    Finished = (Done, Failed)
+
+
+def read_vars_path(run_script):
+    """
+    This function finds the ReadVarsESO executable installed with EnergyPlus
+
+    * run_script: The path to the EnergyPlus executable
+    * Returns: The path to ReadVarsESO, which may not exist
+    """
+    return os.path.join(os.path.dirname(os.path.realpath(run_script)), 'PostProcess', 'ReadVarsESO')
+
+
+class PostProcessTask(object):
+    """
+    This class tracks the csv conversion of a single run directory
+
+    The conversion happens at most once, however many threads ask for it, so a caller that needs the csv files right
+    away can simply call run, even while a pool is about to get to the task.
+    """
+
+    def __init__(self, run_script, run_dir, base_file_name, limits=None):
+        """
+        * run_script: The EnergyPlus executable that produced the output, next to which ReadVarsESO is installed
+        * run_dir: The simulation output folder
+        * base_file_name: The output prefix the simulation was run with
+        * limits: An optional ResourceLimits for the ReadVarsESO process
+        """
+        self.run_script = run_script
+        self.run_dir = run_dir
+        self.base_file_name = base_file_name
+        self.limits = limits
+        self.status = PostProcessStatus.Deferred
+        self.error = None
+        self.csv_files = []
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def conversions(self):
+        """
+        This function lists the conversions ReadVarsESO makes for the run, following the EnergyPlus file names
+
+        * Returns: A list of (source, csv, instructions) file name tuples, for the eso and mtr files
+        """
+        prefix = self.base_file_name
+        return [
+            (prefix + 'out.eso', prefix + 'out.csv', prefix + 'out.rvi'),
+            (prefix + 'out.mtr', prefix + 'outMeter.csv', prefix + 'out.mvi'),
+        ]
+
+    def run(self):
+        """
+        This function converts the output now, or waits for a conversion already in progress on another thread
+
+        * Returns: True if the conversion succeeded
+        """
+        with self._lock:
+            if self.status not in PostProcessStatus.Finished:
+                self.status = PostProcessStatus.Running
+                try:
+                    self.csv_files = self._convert()
+                    self.status = PostProcessStatus.Done
+                except (IOError, OSError) as e:
+                    self.error = str(e)
+                    self.status = PostProcessStatus.Failed
+                self._finished.set()
+            return self.status == PostProcessStatus.Done
+
+    def _convert(self):
+        tool = read_vars_path(self.run_script)
+        if not os.path.isfile(tool):
+            raise IOError("ReadVarsESO not found at %s" % tool)
+        command = [] if self.limits is None else self.limits.command_prefix()
+        csv_files = []
+        with open(os.devnull, 'w') as devnull:
+            for source, csv, instructions in self.conversions():
+                if not os.path.isfile(os.path.join(self.run_dir, source)):
+                    continue
+                # the same two line instructions EnergyPlus writes when it runs ReadVarsESO itself
+                with open(os.path.join(self.run_dir, instructions), 'w') as f:
+                    f.write('%s\n%s\n' % (source, csv))
+                code = subprocess.call(command + [tool, instructions, 'unlimited'], cwd=self.run_dir, stdout=devnull,
+                                       stderr=devnull,
+                                       **new_group_kwargs(None if self.limits is None else self.limits.apply))
+                if code != 0 or not os.path.isfile(os.path.join(self.run_dir, csv)):
+                    raise IOError("ReadVarsESO could not convert %s" % source)
+                csv_files.append(os.path.join(self.run_dir, csv))
+        return csv_files
+
+    def wait(self, timeout=None):
+        """
+        This function blocks until the conversion has finished, without starting it
+
+        * timeout: The maximum number of seconds to wait, or None to wait indefinitely
+        * Returns: True if the conversion finished, or False if the timeout expired first
+        """
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        """
+        This function returns a plain dictionary of the task state, suitable for json serialization
+
+        * Returns: A dictionary with the status, the csv files written, and any error
+        """
+        return {'status': self.status, 'csv_files': self.csv_files, 'error': self.error}
+
+
+class PostProcessPool(object):
+    """
+    This class converts run output in the background, on a few worker threads that run ReadVarsESO at low priority
+    """
+
+    # idle I/O and a raised niceness, so post processing never slows down the simulations still running
+    DefaultLimits = ResourceLimits(nice=10, io_class=IOClass.Idle)
+
+    def __init__(self, max_workers=1, limits=DefaultLimits):
+        """
+        * max_workers: The number of conversions run at the same time
+        * limits: The ResourceLimits for every ReadVarsESO process, or None to run them at normal priority
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.limits = limits
+        self._tasks = []
+        self._outstanding = 0
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        for _ in range(max_workers):
+            worker = threading.Thread(target=self._work_loop)
+            worker.daemon = True
+            worker.start()
+
+    def submit(self, task):
+        """
+        This function queues a task for conversion
+
+        * task: The PostProcessTask to convert; its limits are replaced by the pool's
+        * Returns: The task
+        """
+        with self._lock:
+            if task.status != PostProcessStatus.Deferred:
+                return task  # already converted, or being converted, on demand
+            task.limits = self.limits
+            task.status = PostProcessStatus.Queued
+            self._tasks.append(task)
+            self._outstanding += 1
+            self._work.notify()
+        return task
+
+    def _work_loop(self):
+        while True:
+            with self._lock:
+                while not self._tasks:
+                    self._work.wait()
+                task = self._tasks.pop(0)
+            task.run()
+            with self._lock:
+                self._outstanding -= 1
+                if self._outstanding == 0:
+                    self._idle.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        This function blocks until every submitted task has finished
+
+        * timeout: The maximum number of seconds to wait, or None to wait indefinitely
+        * Returns: True if all tasks finished, or False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._outstanding:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            return True
@@ -0,0 +1,303 @@
+"""
+This module caches the input files EPMacro and ExpandObjects produce, so unchanged inputs are only expanded once
+
+EnergyPlus runs EPMacro on macro (imf) files and ExpandObjects on every input before it simulates, which takes a
+noticeable share of a short design day run on a template heavy model.  Here the two tools are run once per distinct
+input, in a scratch folder, and the expanded result is kept; later runs hand EnergyPlus the expanded file directly and
+leave out the -m and -x flags.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from IDFScanner import IDFScanner
+from ProcessGroup import new_group_kwargs, terminate_group
+from ResultCache import hash_file
+
+# the files ExpandObjects writes when the input needs the Slab or Basement ground heat transfer preprocessors, which
+# only EnergyPlus itself knows how to run, so such inputs are never cached
+_GROUND_HEAT_TRANSFER_FILES = ('GHTIn.idf', 'BasementGHTIn.idf')
+
+# EnergyPlus looks for schedule files relative to the input file, so an input using them has to stay where it is
+_RELATIVE_FILE_OBJECTS = ('schedule:file',)
+
+# returned by the preprocessing when an input can never be cached, as opposed to failing this time
+_UNCACHEABLE = object()
+
+
+def is_macro_file(input_file):
+    return os.path.splitext(input_file)[1].lower() == '.imf'
+
+
+def macro_dependencies(input_file):
+    """
+    This function finds every file a macro file pulls in through ##include, following includes within includes
+
+    Relative include names are resolved against the folder of the input file, after any ##fileprefix.
+
+    * input_file: The path to the macro file
+    * Returns: A list of (name, path) tuples in the order they are included, where name is the name as written
+    * Raises: IOError or OSError if the input or any included file cannot be read
+    """
+    base_dir = os.path.dirname(os.path.abspath(input_file))
+    found = []
+    seen = set()
+    pending = [input_file]
+    while pending:
+        prefix = ''
+        with open(pending.pop(0)) as f:
+            for line in f:
+                words = line.strip().split(None, 1)
+                if len(words) < 2:
+                    continue
+                directive = words[0].lower()
+                if directive == '##fileprefix':
+                    prefix = words[1].strip()
+                elif directive == '##include':
+                    name = prefix + words[1].strip()
+                    path = os.path.normpath(os.path.join(base_dir, name))
+                    if path not in seen:
+                        if not os.path.isfile(path):
+                            raise IOError("Included file not found: %s" % name)
+                        seen.add(path)
+                        found.append((name, path))
+                        pending.append(path)
+    return found
+
+
+def input_dependencies(input_file):
+    """
+    This function finds every file besides the weather file that the results of an input depend on, which are the
+    files a macro file includes and the external files its objects read, such as Schedule:File csv files
+
+    Relative schedule file names are resolved against the folder of the input file.
+
+    * input_file: The path to the input file
+    * Returns: A list of (name, path) tuples, where name is the name as written
+    * Raises: IOError or OSError if the input or any of the files it depends on cannot be found or read
+    """
+    base_dir = os.path.dirname(os.path.abspath(input_file))
+    found = macro_dependencies(input_file) if is_macro_file(input_file) else []
+    for scanned in [input_file] + [path for _name, path in found]:
+        for name in IDFScanner(scanned).external_files():
+            path = os.path.normpath(os.path.join(base_dir, name))
+            if not os.path.isfile(path):
+                raise IOError("External file not found: %s" % name)
+            found.append((name, path))
+    return found
+
+
+class PreprocessCache(object):
+    """
+    This class stores expanded input files keyed by a hash of the input, its includes, and the preprocessing tools
+
+    Inputs that need the ground heat transfer preprocessors, read schedule files, or include files from outside their
+    folder are left for EnergyPlus to preprocess, and that decision is remembered so they are only examined once.
+    """
+
+    def __init__(self, cache_dir, max_entries=100):
+        """
+        * cache_dir: The folder holding the expanded input files, made absolute so later changes of the working
+          folder cannot move where entries are written
+        * max_entries: The maximum number of expanded inputs kept, the least recently used being removed first
+        * Raises: ValueError if no folder is given
+        """
+        if not cache_dir:
+            raise ValueError("The preprocessing cache needs a folder")
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tool_paths(run_script, input_file):
+        """
+        This function lists the preprocessing tools and data files an input needs, which sit next to EnergyPlus
+
+        * run_script: The path to the EnergyPlus executable
+        * input_file: The path to the input file
+        * Returns: A list of paths, which may not all exist
+        """
+        install_dir = os.path.dirname(os.path.realpath(run_script))
+        names = ['ExpandObjects', 'Energy+.idd']
+        if is_macro_file(input_file):
+            names.insert(0, 'EPMacro')
+        return [os.path.join(install_dir, name) for name in names]
+
+    @staticmethod
+    def key_for(input_file, run_script):
+        """
+        This function computes the cache key for preprocessing an input
+
+        * input_file: The path to the input file
+        * run_script: The path to the EnergyPlus executable, whose neighbouring tools are identified by their resolved
+          path, size and modified time
+        * Returns: A hex digest string
+        * Raises: IOError or OSError if the input, an included file, or a tool cannot be read
+        """
+        digest = hashlib.sha256()
+        hash_file(input_file, digest)
+        dependencies = macro_dependencies(input_file) if is_macro_file(input_file) else []
+        for name, path in dependencies:
+            digest.update(b'\0' + name.encode('utf-8') + b'\0')
+            hash_file(path, digest)
+        tools = []
+        for tool in PreprocessCache.tool_paths(run_script, input_file):
+            tool_stat = os.stat(tool)
+            tools.append([tool, tool_stat.st_size, int(tool_stat.st_mtime)])
+        digest.update(json.dumps(tools).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.idf')
+
+    def _skip_path(self, key):
+        return os.path.join(self.cache_dir, key + '.skip')
+
+    def lookup(self, key):
+        """
+        This function checks the cache for an input that was already expanded
+
+        * key: The cache key from key_for
+        * Returns: The path to the expanded input file, or None for a miss
+        """
+        entry_path = self._entry_path(key)
+        if not os.path.isfile(entry_path):
+            return None
+        try:
+            os.utime(entry_path, None)  # the modified time doubles as the last used time for eviction
+        except OSError:
+            pass
+        return entry_path
+
+    def expanded_input(self, input_file, run_script, limits=None, cancel=None):
+        """
+        This function gets the expanded version of an input file, running the preprocessing tools on a miss
+
+        * input_file: The path to the input file
+        * run_script: The path to the EnergyPlus executable
+        * limits: An optional ResourceLimits for the preprocessing tools, the same as the simulation gets
+        * cancel: An optional threading.Event that, once set, terminates the preprocessing tools and gives up
+        * Returns: A (path, hit) tuple, where path is the expanded input file, or None if the input cannot be
+          preprocessed here and EnergyPlus has to preprocess it itself, and hit is True only when the path was already
+          in the cache
+        """
+        try:
+            key = PreprocessCache.key_for(input_file, run_script)
+        except (IOError, OSError):
+            return None, False
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached, True
+        entry_path = self._entry_path(key)
+        if os.path.exists(self._skip_path(key)):
+            return None, False
+        work_dir = tempfile.mkdtemp()
+        try:
+            expanded = self._preprocess(input_file, run_script, work_dir, limits, cancel)
+            if expanded is None:
+                return None, False
+            with self._lock:
+                if not os.path.isdir(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                if expanded is _UNCACHEABLE:
+                    open(self._skip_path(key), 'w').close()
+                    self._evict()
+                    return None, False
+                # each writer has its own temporary file inside the cache folder, and the rename makes the entry appear
+                # whole
+                handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+                os.close(handle)
+                try:
+                    shutil.copyfile(expanded, temp_path)
+                    os.rename(temp_path, entry_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                self._evict()
+            return entry_path, False
+        except (IOError, OSError, shutil.Error):
+            return None, False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _run_tool(tool, work_dir, limits, cancel):
+        # the tools get their own process group and the simulation's limits, so a cancel reaches them the same way
+        command = ([] if limits is None else limits.command_prefix()) + [tool]
+        with open(os.devnull, 'w') as devnull:
+            process = subprocess.Popen(command, cwd=work_dir, stdout=devnull, stderr=devnull,
+                                       **new_group_kwargs(None if limits is None else limits.apply))
+        if cancel is None:
+            return process.wait()
+        while process.poll() is None:
+            if cancel.wait(0.05):
+                terminate_group(process, reap=True)  # nothing else waits for the tools
+                return None
+        return process.returncode
+
+    @staticmethod
+    def _preprocess(input_file, run_script, work_dir, limits=None, cancel=None):
+        tools = PreprocessCache.tool_paths(run_script, input_file)
+        idd_path = tools[-1]
+        if is_macro_file(input_file):
+            # EPMacro reads in.imf from its working folder, where relative includes are looked for as well
+            shutil.copyfile(input_file, os.path.join(work_dir, 'in.imf'))
+            for name, path in macro_dependencies(input_file):
+                if not os.path.isabs(name):
+                    if name.startswith('..'):
+                        return _UNCACHEABLE  # cannot be recreated inside the scratch folder
+                    target = os.path.join(work_dir, name)
+                    if not os.path.isdir(os.path.dirname(target)):
+                        os.makedirs(os.path.dirname(target))
+                    shutil.copyfile(path, target)
+            if PreprocessCache._run_tool(tools[0], work_dir, limits, cancel) is None:
+                return None
+            macro_output = os.path.join(work_dir, 'out.idf')
+            if not os.path.isfile(macro_output):
+                return None
+            os.rename(macro_output, os.path.join(work_dir, 'in.idf'))
+        else:
+            shutil.copyfile(input_file, os.path.join(work_dir, 'in.idf'))
+        shutil.copyfile(idd_path, os.path.join(work_dir, 'Energy+.idd'))
+        if PreprocessCache._run_tool(tools[-2], work_dir, limits, cancel) != 0:
+            return None
+        if any(os.path.exists(os.path.join(work_dir, name)) for name in _GROUND_HEAT_TRANSFER_FILES):
+            return _UNCACHEABLE
+        # ExpandObjects only writes expanded.idf when the input had something to expand
+        expanded = os.path.join(work_dir, 'expanded.idf')
+        if not os.path.isfile(expanded):
+            expanded = os.path.join(work_dir, 'in.idf')
+        with open(expanded) as f:
+            text = f.read().lower()
+        if any(name in text for name in _RELATIVE_FILE_OBJECTS):
+            return _UNCACHEABLE
+        return expanded
+
+    def _evict(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith('.idf') or file_name.endswith('.skip'):
+                path = os.path.join(self.cache_dir, file_name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort()
+        for _mtime, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        This function removes every cached expanded input
+        """
+        with self._lock:
+            if os.path.isdir(self.cache_dir):
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,152 @@
+"""
+This module starts child processes in a process group of their own and reclaims the whole group when cancelling
+
+EnergyPlus is often launched through a wrapper script that in turn runs ExpandObjects, EPMacro, EnergyPlus and
+ReadVarsESO, so killing only the process that was started leaves the real work running.  On POSIX systems every
+simulation is the leader of a new session, and therefore of a new process group, which signals can be sent to as a
+whole.  On Windows the process is started in a new process group and the tree is ended with taskkill.
+"""
+
+import errno
+import os
+import signal
+import subprocess
+import time
+
+IS_WINDOWS = os.name == 'nt'
+
+# where /proc is available the members of a group can be listed, and exited members told apart from running ones
+HAS_PROC = os.path.isdir('/proc/self')
+
+
+def new_group_kwargs(setup=None):
+    """
+    This function gives the extra subprocess.Popen arguments that start a child in a process group of its own
+
+    * setup: An optional function called in the child just before exec on POSIX systems, such as to apply limits
+    * Returns: A dictionary of keyword arguments
+    """
+    if IS_WINDOWS:
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    if setup is None:
+        # os.setsid rather than start_new_session, which python 2 does not have
+        return {'preexec_fn': os.setsid}
+
+    def preexec():
+        os.setsid()
+        setup()
+    return {'preexec_fn': preexec}
+
+
+def signal_group(process, signal_number):
+    """
+    This function sends a signal to every process in the group led by a child
+
+    * process: The subprocess.Popen instance started with new_group_kwargs
+    * signal_number: The signal to send, such as signal.SIGTERM
+    * Returns: True if the signal was delivered, or False if the group no longer exists
+    """
+    try:
+        os.killpg(process.pid, signal_number)
+        return True
+    except OSError as e:
+        if e.errno == errno.ESRCH:
+            return False
+        raise
+
+
+def group_alive(process, reap=False):
+    """
+    This function checks whether any process in the group led by a child is still running
+
+    The leader is only reaped here when asked, so whoever waits for it can still collect its resource usage.  Without
+    /proc an exited but unreaped leader still counts as a member of its group, so the group only reads as gone once the
+    leader has been reaped, by that waiter or here.
+
+    * process: The subprocess.Popen instance started with new_group_kwargs
+    * reap: True when nothing else waits for the leader, so it is reaped here once it exits
+    * Returns: True if the leader or any other member of the group has not exited yet
+    """
+    if IS_WINDOWS:
+        return process.poll() is None
+    if reap:
+        process.poll()
+    if HAS_PROC:
+        return bool(live_group_members(process.pid))
+    return signal_group(process, 0)
+
+
+def live_group_members(group_id):
+    """
+    This function lists the running processes of a group from /proc, where it is available
+
+    Orphaned members that have exited stay in the group as zombies until their new parent reaps them, which some
+    container init processes never do, so they are left out rather than waited for.
+
+    * group_id: The process group id, which is the pid of the group leader
+    * Returns: A list of pids
+    """
+    members = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % name) as f:
+                stat = f.read()
+        except (IOError, OSError):
+            continue  # exited since the listing
+        # the command name is in parentheses and may itself hold spaces or parentheses
+        fields = stat[stat.rfind(')') + 2:].split()
+        if len(fields) > 2 and fields[0] != 'Z' and int(fields[2]) == group_id:
+            members.append(int(name))
+    return members
+
+
+def wait_for_group(process, timeout, poll_interval=0.05, reap=False):
+    """
+    This function waits for every process in a group to exit
+
+    * process: The subprocess.Popen instance started with new_group_kwargs
+    * timeout: The maximum number of seconds to wait
+    * poll_interval: The number of seconds between checks
+    * reap: True when nothing else waits for the leader, as for group_alive
+    * Returns: True if the whole group has exited, or False if the timeout expired first
+    """
+    deadline = time.time() + timeout
+    while group_alive(process, reap):
+        if time.time() >= deadline:
+            return False
+        time.sleep(poll_interval)
+    return True
+
+
+def terminate_group(process, timeout=5.0, reap=False):
+    """
+    This function ends every process in the group led by a child, gracefully if possible
+
+    The group is first asked to terminate, so EnergyPlus and its helpers can flush and close their files.  Whatever is
+    still running once the timeout expires is killed, and the function only returns once the whole group is gone.
+
+    * process: The subprocess.Popen instance started with new_group_kwargs
+    * timeout: The number of seconds the group gets to exit after the terminate request before it is killed
+    * reap: True when nothing else waits for the leader, as for group_alive; otherwise another thread has to be
+      waiting for it, or without /proc the group never reads as gone
+    * Returns: True if the group had to be killed, or False if it exited on the terminate request
+    """
+    if IS_WINDOWS:
+        # taskkill is the only stock way to reach the grandchildren of a process on Windows
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(['taskkill', '/T', '/F', '/PID', str(process.pid)], stdout=devnull, stderr=devnull)
+        process.wait()
+        return True
+    if not signal_group(process, signal.SIGTERM):
+        return False
+    if wait_for_group(process, timeout, reap=reap):
+        return False
+    # a killed process cannot refuse to exit, so this only waits for the kernel to tear the group down, resending the
+    # kill in case a member forked between the signal and its delivery
+    for _ in range(5):
+        signal_group(process, signal.SIGKILL)
+        if wait_for_group(process, 1.0, reap=reap):
+            break
+    return True
@@ -0,0 +1,151 @@
+import re
+import time
+
+from International import translate as _
+
+# cumulative day counts at the start of each month of a non-leap year
+_MONTH_START_DAYS = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
+
+
+def day_of_year(month, day):
+    """
+    This function converts a month and day into a zero-based day of a non-leap year
+
+    * month: The month number, 1 through 12
+    * day: The day of the month, starting at 1
+    * Returns: The number of days since January 1st
+    """
+    return _MONTH_START_DAYS[month - 1] + day - 1
+
+
+def format_duration(seconds):
+    """
+    This function formats a number of seconds compactly for display, such as '45s', '12m 05s', or '3h 02m'
+
+    * seconds: The duration to format
+    * Returns: The formatted duration string
+    """
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return '%ds' % seconds
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return '%dm %02ds' % (minutes, seconds)
+    hours, minutes = divmod(minutes, 60)
+    return '%dh %02dm' % (hours, minutes)
+
+
+class SimulationProgress(object):
+    """
+    This class is a snapshot of how far a running simulation has progressed
+    """
+
+    def __init__(self, environment=None, percent=None, eta_seconds=None, warmup_iteration=None,
+                 days_per_second=None):
+        """
+        * environment: The name of the environment currently being simulated, if known
+        * percent: The percentage, 0 to 100, of the current environment that is complete, or None if indeterminate
+        * eta_seconds: The estimated number of wall clock seconds until the environment completes, if known
+        * warmup_iteration: The warmup iteration in progress, or None if not warming up
+        * days_per_second: The measured simulation speed in simulated days per wall clock second, if known
+        """
+        self.environment = environment
+        self.percent = percent
+        self.eta_seconds = eta_seconds
+        self.warmup_iteration = warmup_iteration
+        self.days_per_second = days_per_second
+
+    def describe(self):
+        """
+        This function builds a short, translated, human readable description of the progress
+
+        * Returns: A string such as 'RUN PERIOD 1: 42% (ETA 3m 10s)'
+        """
+        if self.warmup_iteration is not None:
+            text = _("Warming up (iteration %d)") % self.warmup_iteration
+        elif self.percent is not None:
+            text = '%d%%' % self.percent
+        elif self.environment is None:
+            text = _("Initializing")
+        else:
+            text = ''
+        if self.environment:
+            text = '%s: %s' % (self.environment, text) if text else self.environment
+        if self.eta_seconds is not None:
+            text += ' (%s %s)' % (_("ETA"), format_duration(self.eta_seconds))
+        return text
+
+
+class ProgressParser(object):
+    """
+    This class turns the environment, day, and warmup markers that EnergyPlus prints on stdout into progress snapshots
+
+    EnergyPlus reports the date each time it starts or continues an environment, so the percent complete of a run
+    period is the number of days elapsed since the environment started out of the run period length.  Design day and
+    sizing environments only last a single day and never report a continuing date, so an environment stays
+    indeterminate until its first continuing date arrives.
+    """
+
+    STARTING = re.compile(r'Starting Simulation at (\d+)/(\d+)(?:/\d+)? for (.*)')
+    CONTINUING = re.compile(r'Continuing Simulation at (\d+)/(\d+)(?:/\d+)? for (.*)')
+    WARMUP = re.compile(r'Warming up(?: \{(\d+)\})?')
+    NEW_ENVIRONMENT = 'Initializing New Environment Parameters'
+    COMPLETED = 'EnergyPlus Completed Successfully'
+
+    def __init__(self, run_period_days=365, clock=time.time):
+        """
+        * run_period_days: The length of the weather file run period in days, used as the denominator for percent
+        * clock: A function returning the current time in seconds, replaceable for testing
+        """
+        self.run_period_days = run_period_days
+        self.clock = clock
+        self.progress = SimulationProgress()
+        self._start_day = None
+        self._start_time = None
+
+    def parse_line(self, line):
+        """
+        This function processes a single line of EnergyPlus standard output
+
+        * line: The line of output, with or without a trailing newline
+        * Returns: A new SimulationProgress if the line changed the progress, otherwise None
+        """
+        line = line.strip()
+        match = ProgressParser.STARTING.match(line)
+        if match:
+            month, day, environment = int(match.group(1)), int(match.group(2)), match.group(3).strip()
+            self._start_day = day_of_year(month, day)
+            self._start_time = self.clock()
+            return self._update(SimulationProgress(environment))
+        match = ProgressParser.CONTINUING.match(line)
+        if match:
+            if self._start_day is None:
+                return None
+            elapsed_days = (day_of_year(int(match.group(1)), int(match.group(2))) - self._start_day) % 365
+            elapsed_seconds = self.clock() - self._start_time
+            percent = min(100.0, 100.0 * elapsed_days / self.run_period_days)
+            days_per_second = None
+            eta_seconds = None
+            if elapsed_days > 0 and elapsed_seconds > 0:
+                days_per_second = elapsed_days / elapsed_seconds
+                eta_seconds = max(0.0, (self.run_period_days - elapsed_days) / days_per_second)
+            return self._update(SimulationProgress(
+                match.group(3).strip(), percent, eta_seconds, days_per_second=days_per_second
+            ))
+        match = ProgressParser.WARMUP.match(line)
+        if match:
+            if match.group(1) is not None:
+                iteration = int(match.group(1))
+            else:
+                iteration = (self.progress.warmup_iteration or 0) + 1
+            return self._update(SimulationProgress(self.progress.environment, warmup_iteration=iteration))
+        if line.startswith(ProgressParser.NEW_ENVIRONMENT):
+            self._start_day = None
+            return self._update(SimulationProgress())
+        if line.startswith(ProgressParser.COMPLETED):
+            return self._update(SimulationProgress(self.progress.environment, 100.0, 0.0))
+        return None
+
+    def _update(self, progress):
+        self.progress = progress
+        return progress
@@ -0,0 +1,184 @@
+"""
+This module describes the operating system limits a simulation runs under, and measures the memory it has to work in
+
+The limits are applied inside the child process between fork and exec, so they hold for EnergyPlus and are inherited
+by every helper it starts.  CPU pinning, niceness and the rlimit caps are POSIX features, and the I/O priority is set
+with the ionice utility from util-linux, so on other platforms the limits that cannot be honoured are left alone.
+"""
+
+import multiprocessing
+import os
+
+try:
+    import resource
+except ImportError:
+    resource = None  # windows
+
+from ProcessGroup import live_group_members
+
+
+class IOClass:
+    RealTime = 1
+    BestEffort = 2
+    Idle = 3
+
+    # the command line names, which are also the names ionice itself accepts
+    Names = {'realtime': RealTime, 'best-effort': BestEffort, 'idle': Idle}
+
+
+def find_executable(name):
+    """
+    This function looks an executable up on the PATH
+
+    * name: The executable name, such as 'ionice'
+    * Returns: The full path to the executable, or None if it is not on the PATH
+    """
+    for folder in os.environ.get('PATH', '').split(os.pathsep):
+        candidate = os.path.join(folder, name)
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def allowed_cpus():
+    """
+    This function lists the CPUs this process may run on, which simulations can be pinned to
+
+    * Returns: A sorted list of CPU numbers
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    try:
+        return list(range(multiprocessing.cpu_count()))
+    except NotImplementedError:
+        return [0]
+
+
+def available_memory():
+    """
+    This function measures how much memory new processes can use without the machine starting to swap
+
+    * Returns: The number of bytes, or None if it cannot be determined on this platform
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def process_group_rss(group_id):
+    """
+    This function adds up the resident memory of every running process in a process group
+
+    * group_id: The process group id, which is the pid of the group leader
+    * Returns: The number of bytes, or None if it cannot be determined on this platform
+    """
+    if not os.path.isdir('/proc/self'):
+        return None
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    for pid in live_group_members(group_id):
+        try:
+            with open('/proc/%d/statm' % pid) as f:
+                total += int(f.read().split()[1]) * page_size
+        except (IOError, OSError, ValueError, IndexError):
+            pass  # exited since the listing
+    return total
+
+
+def lower_limit(kind, soft, hard):
+    """
+    This function lowers an rlimit of the current process, never trying to raise it above its existing hard limit
+
+    * kind: The resource, such as resource.RLIMIT_AS
+    * soft: The new soft limit
+    * hard: The new hard limit
+    """
+    current_hard = resource.getrlimit(kind)[1]
+    if current_hard != resource.RLIM_INFINITY:
+        hard = min(hard, current_hard)
+    resource.setrlimit(kind, (min(soft, hard), hard))
+
+
+class ResourceLimits(object):
+    """
+    This class holds the CPU, priority, and memory limits for a simulation process and everything it starts
+    """
+
+    def __init__(self, cpus=None, nice=None, io_class=None, io_level=None, memory_bytes=None, cpu_seconds=None):
+        """
+        * cpus: An optional list of CPU numbers the simulation is pinned to
+        * nice: An optional niceness added to the simulation's scheduling priority, 0 through 19
+        * io_class: An optional IOClass value for the simulation's disk access
+        * io_level: An optional priority within the realtime or best-effort I/O class, 0 (highest) through 7
+        * memory_bytes: An optional cap on the address space of each process, enforced with RLIMIT_AS
+        * cpu_seconds: An optional cap on the CPU time of each process, enforced with RLIMIT_CPU
+        """
+        if cpus is not None and len(cpus) == 0:
+            raise ValueError("cpus must list at least one CPU")
+        if nice is not None and not 0 <= nice <= 19:
+            raise ValueError("nice must be between 0 and 19")
+        if io_class is not None and io_class not in (IOClass.RealTime, IOClass.BestEffort, IOClass.Idle):
+            raise ValueError("io_class must be an IOClass value")
+        if io_level is not None and not 0 <= io_level <= 7:
+            raise ValueError("io_level must be between 0 and 7")
+        if memory_bytes is not None and memory_bytes <= 0:
+            raise ValueError("memory_bytes must be positive")
+        if cpu_seconds is not None and cpu_seconds <= 0:
+            raise ValueError("cpu_seconds must be positive")
+        self.cpus = None if cpus is None else sorted(cpus)
+        self.nice = nice
+        self.io_class = io_class
+        self.io_level = io_level
+        self.memory_bytes = memory_bytes
+        self.cpu_seconds = cpu_seconds
+
+    def with_cpus(self, cpus):
+        """
+        This function copies these limits, pinned to a different set of CPUs
+
+        * cpus: The list of CPU numbers for the copy
+        * Returns: A new ResourceLimits instance
+        """
+        return ResourceLimits(cpus, self.nice, self.io_class, self.io_level, self.memory_bytes, self.cpu_seconds)
+
+    def command_prefix(self):
+        """
+        This function gives the command that has to wrap the simulation to apply the I/O priority
+
+        ionice replaces itself with the command it runs, so the simulation keeps the pid and process group it was
+        started with.
+
+        * Returns: A list of arguments to put ahead of the EnergyPlus command, empty if none are needed or ionice is
+          not installed
+        """
+        if self.io_class is None:
+            return []
+        ionice = find_executable('ionice')
+        if ionice is None:
+            return []
+        prefix = [ionice, '-c', str(self.io_class)]
+        if self.io_level is not None and self.io_class != IOClass.Idle:
+            prefix += ['-n', str(self.io_level)]
+        return prefix
+
+    def apply(self):
+        """
+        This function applies the limits to the current process, and is meant to run in a child just before exec
+        """
+        if self.cpus is not None and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, self.cpus)
+        if self.nice:
+            os.nice(self.nice)
+        if resource is None:
+            return
+        if self.memory_bytes is not None:
+            lower_limit(resource.RLIMIT_AS, self.memory_bytes, self.memory_bytes)
+        if self.cpu_seconds is not None:
+            # the soft limit sends SIGXCPU, and the hard limit a few seconds later is the SIGKILL fallback
+            seconds = int(self.cpu_seconds)
+            lower_limit(resource.RLIMIT_CPU, seconds, seconds + 5)
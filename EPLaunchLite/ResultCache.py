@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+def hash_file(file_path, digest=None, chunk_size=1 << 20):
+    """
+    This function hashes the contents of a file without reading it into memory all at once
+
+    * file_path: The path to the file to hash
+    * digest: An existing hashlib object to update, or None to create a new sha256 digest
+    * chunk_size: The number of bytes read at a time
+    * Returns: The updated hashlib object
+    """
+    if digest is None:
+        digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest
+
+
+def folder_size(folder):
+    """
+    This function adds up the size of every file below a folder
+
+    * folder: The folder to measure
+    * Returns: The total size in bytes
+    """
+    total = 0
+    for root, _dirs, files in os.walk(folder):
+        for file_name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return total
+
+
+def copy_folder(source, target):
+    """
+    This function copies every file below a folder into another folder, which may already exist
+
+    * source: The folder to copy
+    * target: The folder to copy into, created if needed; files already there with the same names are replaced
+    """
+    for root, _dirs, files in os.walk(source):
+        target_root = os.path.normpath(os.path.join(target, os.path.relpath(root, source)))
+        if not os.path.isdir(target_root):
+            os.makedirs(target_root)
+        for file_name in files:
+            shutil.copy2(os.path.join(root, file_name), os.path.join(target_root, file_name))
+
+
+class ResultCache(object):
+    """
+    This class stores completed simulation run directories keyed by a hash of everything that determines their results
+
+    The key covers the input file contents, the contents of every file the input reads, the weather file contents, the
+    identity of the EnergyPlus executable, and the command line flags, so an identical re-simulation can return the
+    stored results instead of running again.  A hit is copied out into the run directory of the new simulation, so
+    nothing done with its results can change the cached copy.
+    Entries are evicted least recently used first once either the entry count or the total size limit is exceeded.
+    """
+
+    IndexFileName = 'index.json'
+
+    def __init__(self, cache_dir, max_entries=50, max_bytes=5 * 1024 ** 3):
+        """
+        * cache_dir: The folder holding the cached run directories and the cache index
+        * max_entries: The maximum number of cached runs
+        * max_bytes: The maximum total size of all cached run directories
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    @staticmethod
+    def key_for(input_file, weather_file, run_script, flags, engine_version=None, dependencies=()):
+        """
+        This function computes the cache key for a simulation
+
+        * input_file: The path to the input file
+        * weather_file: The path to the weather file
+        * run_script: The path to the EnergyPlus executable, identified by its resolved path, size and modified time
+        * flags: The list of command line flags that affect results
+        * engine_version: An optional version string, added to the executable identity when known
+        * dependencies: A list of (name, path) tuples for the other files the input reads, such as the files a macro
+          input includes and Schedule:File csv files, hashed along with the name the input refers to them by
+        * Returns: A hex digest string
+        """
+        digest = hashlib.sha256()
+        hash_file(input_file, digest)
+        for name, path in dependencies:
+            digest.update(b'\0' + name.encode('utf-8') + b'\0')
+            hash_file(path, digest)
+        digest.update(b'\0')
+        hash_file(weather_file, digest)
+        engine = os.path.realpath(run_script)
+        engine_stat = os.stat(engine)
+        identity = [engine, engine_stat.st_size, int(engine_stat.st_mtime), engine_version, list(flags)]
+        digest.update(json.dumps(identity).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, ResultCache.IndexFileName)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        # write to a temporary file and rename over the index so a crash can never leave a truncated index behind
+        temp_path = self._index_path() + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.rename(temp_path, self._index_path())
+
+    def lookup(self, key):
+        """
+        This function checks the cache for a previous identical simulation
+
+        * key: The cache key from key_for
+        * Returns: A (run_dir, std_out) tuple for a hit, or None for a miss
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            run_dir = self._entry_path(key)
+            if not os.path.isdir(run_dir):
+                del self._index[key]
+                self._save_index()
+                return None
+            entry['last_used'] = time.time()
+            self._save_index()
+            return run_dir, entry['std_out']
+
+    def restore(self, key, run_dir):
+        """
+        This function copies the results of a previous identical simulation into a run directory
+
+        The files are copied rather than linked, since SQLite and other tools may later write to the results in place.
+
+        * key: The cache key from key_for
+        * run_dir: The run directory to copy the cached results into, created if needed
+        * Returns: The standard output of the cached run for a hit, or None for a miss
+        * Raises: IOError, OSError or shutil.Error if the cached results cannot be copied
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            entry_path = self._entry_path(key)
+            if not os.path.isdir(entry_path):
+                del self._index[key]
+                self._save_index()
+                return None
+            # the lock keeps the entry from being evicted while it is copied
+            copy_folder(entry_path, run_dir)
+            entry['last_used'] = time.time()
+            self._save_index()
+            return entry['std_out']
+
+    def store(self, key, run_dir, std_out):
+        """
+        This function copies a completed run directory into the cache and evicts old entries if needed
+
+        * key: The cache key from key_for
+        * run_dir: The run directory to copy
+        * std_out: The standard output of the run
+        * Returns: The path to the cached copy of the run directory
+        """
+        with self._lock:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            entry_path = self._entry_path(key)
+            temp_path = entry_path + '.tmp'
+            shutil.rmtree(temp_path, ignore_errors=True)
+            shutil.copytree(run_dir, temp_path)
+            shutil.rmtree(entry_path, ignore_errors=True)
+            os.rename(temp_path, entry_path)
+            self._index[key] = {'std_out': std_out, 'size': folder_size(entry_path), 'last_used': time.time()}
+            self._evict()
+            self._save_index()
+            return entry_path
+
+    def _evict(self):
+        by_age = sorted(self._index.items(), key=lambda item: item[1]['last_used'])
+        total_bytes = sum(entry['size'] for _key, entry in by_age)
+        while by_age and (len(by_age) > self.max_entries or total_bytes > self.max_bytes):
+            key, entry = by_age.pop(0)
+            total_bytes -= entry['size']
+            del self._index[key]
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def clear(self):
+        """
+        This function removes every cached run
+        """
+        with self._lock:
+            for key in list(self._index):
+                shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            self._index = {}
+            if os.path.isdir(self.cache_dir):
+                self._save_index()
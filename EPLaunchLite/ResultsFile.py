@@ -0,0 +1,410 @@
+import array
+import hashlib
+import os
+import re
+
+from ColumnFile import read_columns, write_columns
+
+
+class Frequency:
+    EachCall = 'Each Call'
+    TimeStep = 'TimeStep'
+    Hourly = 'Hourly'
+    Daily = 'Daily'
+    Monthly = 'Monthly'
+    RunPeriod = 'RunPeriod'
+    Annual = 'Annual'
+
+    # the ESO record id of the timestamp record that precedes the values of each reporting frequency
+    TimestampRecords = {EachCall: '2', TimeStep: '2', Hourly: '2', Daily: '3', Monthly: '4', RunPeriod: '5',
+                        Annual: '6'}
+
+
+# the decoded fields of every timestamp, in order
+TIMESTAMP_FIELDS = ['environment', 'day_of_simulation', 'month', 'day', 'hour', 'minute']
+
+_CSV_TIMESTAMP = re.compile(r'^\s*(\d+)/(\d+)\s+(\d+):(\d+)')
+_CSV_HEADER = re.compile(r'^(?:(.*?):)?(.+?)\s*\[(.*?)\]\s*\((.+)\)\s*$')
+
+
+class ResultVariable(object):
+    """
+    This class describes one reported output variable or meter
+    """
+
+    def __init__(self, report_id, key, name, units, frequency):
+        """
+        * report_id: The identifier of the variable within its results file, as a string
+        * key: The key value, such as a zone name or 'Environment', or an empty string for meters
+        * name: The variable or meter name
+        * units: The units, without brackets
+        * frequency: The reporting frequency, one of the Frequency values
+        """
+        self.report_id = report_id
+        self.key = key
+        self.name = name
+        self.units = units
+        self.frequency = frequency
+
+    @property
+    def label(self):
+        prefix = '%s:' % self.key if self.key else ''
+        return '%s%s [%s](%s)' % (prefix, self.name, self.units, self.frequency)
+
+    @property
+    def timestamp_record(self):
+        return Frequency.TimestampRecords.get(self.frequency, '2')
+
+
+class TimeSeries(object):
+    """
+    This class holds the values of one variable together with the decoded timestamps they were reported at
+    """
+
+    def __init__(self, variable, values, indexes, timestamps, environments):
+        """
+        * variable: The ResultVariable the values belong to
+        * values: A sequence of floats
+        * indexes: A sequence with the position in the timestamp columns of each value
+        * timestamps: A dictionary of timestamp field name to a column shared by every variable of this frequency
+        * environments: The list of environment names the environment column indexes into
+        """
+        self.variable = variable
+        self.values = values
+        self.indexes = indexes
+        self.timestamps = timestamps
+        self.environments = environments
+
+    def __len__(self):
+        return len(self.values)
+
+    def timestamp(self, position):
+        """
+        This function decodes the timestamp of one value
+
+        * position: The position of the value in the series
+        * Returns: An (environment name, month, day, hour, minute) tuple, with zeros for fields the frequency lacks
+        """
+        index = int(self.indexes[position])
+        environment = int(self.timestamps['environment'][index])
+        name = self.environments[environment] if 0 <= environment < len(self.environments) else ''
+        return (name,) + tuple(int(self.timestamps[field][index]) for field in ('month', 'day', 'hour', 'minute'))
+
+    def in_environment(self, environment_name):
+        """
+        This function selects the values reported during one environment, such as a run period
+
+        * environment_name: The environment name, compared without regard to case
+        * Returns: A list of floats
+        """
+        wanted = [i for i, name in enumerate(self.environments) if name.lower() == environment_name.lower()]
+        environment_column = self.timestamps['environment']
+        return [value for value, index in zip(self.values, self.indexes)
+                if int(environment_column[int(index)]) in wanted]
+
+
+class ResultsFile(object):
+    """
+    This class is the common base of the columnar readers for EnergyPlus time series output
+
+    The variable dictionary is read when the file is opened, but values are only read for the variables asked for, in
+    a single streaming pass that keeps one array of doubles per variable plus the timestamp columns, which are decoded
+    once and shared by every variable.  Columns read from a file are written to binary sidecar files in the cache
+    folder, one per variable, so reopening the same results later memory-maps just the wanted columns instead of
+    reading the text file again.  Sidecars are only trusted while the results file size and modified time still match.
+    """
+
+    def __init__(self, file_path, cache_dir=None):
+        """
+        * file_path: The path to the results file
+        * cache_dir: The folder for binary sidecar files, or None to always read the text file
+        """
+        self.file_path = file_path
+        self.cache_dir = cache_dir
+        self.variables = []
+        self.environments = []
+        self._timestamps = None
+        self._columns = {}
+        self._read_dictionary()
+        self._by_id = dict((variable.report_id, variable) for variable in self.variables)
+
+    def _read_dictionary(self):
+        raise NotImplementedError
+
+    def _stream(self, wanted, decode_timestamps):
+        """
+        This function reads the values of the wanted variables in one pass over the file
+
+        * wanted: A set of report ids
+        * decode_timestamps: True to decode the timestamp records too, False if they are already loaded
+        * Returns: A (timestamp tables or None, environment names, {report id: (indexes, values)}) tuple, where the
+          timestamp tables map a timestamp record id to a dictionary of TIMESTAMP_FIELDS columns
+        """
+        raise NotImplementedError
+
+    def _source_signature(self):
+        file_stat = os.stat(self.file_path)
+        return [file_stat.st_size, file_stat.st_mtime]
+
+    def sidecar_folder(self):
+        """
+        This function names the folder holding the sidecar files of this results file
+
+        * Returns: The folder path, or None if there is no cache folder
+        """
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, hashlib.sha1(os.path.realpath(self.file_path).encode('utf-8')).hexdigest())
+
+    def _read_sidecar(self, name):
+        folder = self.sidecar_folder()
+        if folder is None:
+            return None
+        stored = read_columns(os.path.join(folder, name + '.columns'))
+        if stored is None or stored[0] is None or stored[0].get('source') != self._source_signature():
+            return None
+        return stored
+
+    def _write_sidecar(self, name, columns, meta=None):
+        folder = self.sidecar_folder()
+        if folder is None:
+            return
+        meta = dict(meta or {}, source=self._source_signature())
+        try:
+            write_columns(os.path.join(folder, name + '.columns'), columns, meta)
+        except (IOError, OSError):
+            pass  # the sidecar is only an accelerator, so an unwritable cache folder just means reading next time
+
+    def _load_timestamps_sidecar(self):
+        stored = self._read_sidecar('timestamps')
+        if stored is None:
+            return False
+        meta, columns = stored
+        tables = {}
+        for column_name, column in columns.items():
+            record, field = column_name.split('.', 1)
+            tables.setdefault(record, {})[field] = column
+        self._timestamps = tables
+        self.environments = meta['environments']
+        return True
+
+    def find(self, name, key=None, frequency=None):
+        """
+        This function finds variables by name
+
+        * name: The variable or meter name, compared without regard to case
+        * key: An optional key value, such as a zone name, compared without regard to case
+        * frequency: An optional reporting frequency, one of the Frequency values
+        * Returns: A list of matching ResultVariable instances
+        """
+        return [variable for variable in self.variables
+                if variable.name.lower() == name.lower() and
+                (key is None or variable.key.lower() == key.lower()) and
+                (frequency is None or variable.frequency == frequency)]
+
+    def load(self, variables):
+        """
+        This function makes sure the values of some variables are in memory, reading sidecars where possible and
+        the results file at most once for the rest
+
+        * variables: A list of ResultVariable instances or report ids
+        """
+        report_ids = [variable.report_id if isinstance(variable, ResultVariable) else str(variable)
+                      for variable in variables]
+        for report_id in report_ids:
+            if report_id not in self._by_id:
+                raise KeyError("No variable with report id %s in %s" % (report_id, self.file_path))
+        if self._timestamps is None:
+            self._load_timestamps_sidecar()
+        wanted = set()
+        for report_id in report_ids:
+            if report_id in self._columns:
+                continue
+            stored = self._read_sidecar('variable-' + report_id) if self._timestamps is not None else None
+            if stored is not None:
+                self._columns[report_id] = (stored[1]['indexes'], stored[1]['values'])
+            else:
+                wanted.add(report_id)
+        if not wanted and self._timestamps is not None:
+            return
+        decode_timestamps = self._timestamps is None
+        tables, environments, columns = self._stream(wanted, decode_timestamps)
+        if decode_timestamps:
+            self._timestamps = tables
+            self.environments = environments
+            flat = {}
+            for record, fields in tables.items():
+                for field, column in fields.items():
+                    flat['%s.%s' % (record, field)] = column
+            self._write_sidecar('timestamps', flat, {'environments': environments})
+        for report_id, (indexes, values) in columns.items():
+            self._columns[report_id] = (indexes, values)
+            self._write_sidecar('variable-' + report_id, {'indexes': indexes, 'values': values})
+
+    def series(self, variable):
+        """
+        This function gets the time series of one variable, loading it if needed
+
+        * variable: A ResultVariable instance or report id
+        * Returns: A TimeSeries
+        """
+        if not isinstance(variable, ResultVariable):
+            variable = self._by_id[str(variable)]
+        self.load([variable])
+        indexes, values = self._columns[variable.report_id]
+        timestamps = self._timestamps.get(variable.timestamp_record)
+        if timestamps is None:
+            timestamps = dict((field, array.array('d')) for field in TIMESTAMP_FIELDS)
+        return TimeSeries(variable, values, indexes, timestamps, self.environments)
+
+
+def _new_table():
+    return dict((field, array.array('d')) for field in TIMESTAMP_FIELDS)
+
+
+class ESOFile(ResultsFile):
+    """
+    This class reads the EnergyPlus standard output file, eplusout.eso
+    """
+
+    # the positions of the month, day, hour and end minute fields after the record id of each timestamp record
+    TimestampLayouts = {'2': (1, 2, 4, 6), '3': (1, 2, None, None), '4': (1, None, None, None),
+                        '5': (None, None, None, None), '6': (None, None, None, None)}
+
+    def _read_dictionary(self):
+        self._data_offset = None
+        with open(self.file_path, 'rb') as f:
+            f.readline()  # the program version line
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                text = line.decode('latin-1').strip()
+                if text.startswith('End of Data Dictionary'):
+                    self._data_offset = f.tell()
+                    break
+                definition, _bang, frequency = text.partition('!')
+                fields = definition.split(',')
+                if len(fields) < 3 or fields[0] in ESOFile.TimestampLayouts or fields[0] == '1':
+                    continue
+                frequency = frequency.split('[')[0].strip()
+                if len(fields) == 3:
+                    key, described = '', fields[2]  # meters have no key
+                else:
+                    key, described = fields[2].strip(), ','.join(fields[3:])
+                name, _bracket, units = described.partition('[')
+                self.variables.append(ResultVariable(fields[0], key, name.strip(), units.rstrip('] ').strip(),
+                                                     frequency))
+
+    def _stream(self, wanted, decode_timestamps):
+        wanted_bytes = dict((report_id.encode('ascii'), report_id) for report_id in wanted)
+        record_of = dict((report_id.encode('ascii'), self._by_id[report_id].timestamp_record.encode('ascii'))
+                         for report_id in wanted)
+        timestamp_records = dict((record.encode('ascii'), record) for record in ESOFile.TimestampLayouts)
+        tables = dict((record, _new_table()) for record in ESOFile.TimestampLayouts) if decode_timestamps else None
+        counts = dict((record, 0) for record in timestamp_records)
+        columns = dict((report_id, (array.array('d'), array.array('d'))) for report_id in wanted)
+        environments = []
+        with open(self.file_path, 'rb') as f:
+            if self._data_offset is not None:
+                f.seek(self._data_offset)
+            for line in f:
+                head, _comma, rest = line.partition(b',')
+                report_id = wanted_bytes.get(head)
+                if report_id is not None:
+                    indexes, values = columns[report_id]
+                    indexes.append(counts[record_of[head]] - 1)
+                    values.append(float(rest.split(b',', 1)[0]))
+                elif head in timestamp_records:
+                    counts[head] += 1
+                    if decode_timestamps:
+                        self._decode_timestamp(tables[timestamp_records[head]], timestamp_records[head], rest,
+                                               len(environments) - 1)
+                elif head == b'1':
+                    environments.append(rest.split(b',', 1)[0].decode('latin-1').strip())
+                elif line.startswith(b'End of Data'):
+                    break
+        return tables, environments, columns
+
+    @staticmethod
+    def _decode_timestamp(table, record, rest, environment):
+        fields = rest.split(b',')
+        table['environment'].append(environment)
+        table['day_of_simulation'].append(float(fields[0]) if record != '6' else 0)
+        for name, position in zip(('month', 'day', 'hour', 'minute'), ESOFile.TimestampLayouts[record]):
+            value = 0.0
+            if position is not None:
+                try:
+                    value = float(fields[position])
+                except (IndexError, ValueError):
+                    pass
+            table[name].append(value)
+
+
+class CSVResultsFile(ResultsFile):
+    """
+    This class reads the comma separated time series written by ReadVarsESO, such as eplusout.csv
+
+    Every row shares a single timestamp table, since the file has one Date/Time column for all frequencies.
+    """
+
+    TimestampRecord = '2'
+
+    def _read_dictionary(self):
+        with open(self.file_path, 'rb') as f:
+            header = f.readline().decode('latin-1').rstrip('\r\n').split(',')
+        for position, column in enumerate(header[1:], 1):
+            match = _CSV_HEADER.match(column.strip())
+            if match is None:
+                continue
+            key, name, units, frequency = match.groups()
+            self.variables.append(ResultVariable(str(position), (key or '').strip(), name.strip(), units,
+                                                 frequency.strip()))
+
+    def _stream(self, wanted, decode_timestamps):
+        positions = dict((report_id, int(report_id)) for report_id in wanted)
+        table = _new_table() if decode_timestamps else None
+        columns = dict((report_id, (array.array('d'), array.array('d'))) for report_id in wanted)
+        row_count = 0
+        with open(self.file_path, 'rb') as f:
+            f.readline()
+            for line in f:
+                fields = line.rstrip(b'\r\n').split(b',')
+                if decode_timestamps:
+                    match = _CSV_TIMESTAMP.match(fields[0].decode('latin-1'))
+                    month, day, hour, minute = [float(value) for value in match.groups()] if match else (0, 0, 0, 0)
+                    for name, value in zip(TIMESTAMP_FIELDS, (0, 0, month, day, hour, minute)):
+                        table[name].append(value)
+                for report_id, position in positions.items():
+                    try:
+                        value = float(fields[position])
+                    except (IndexError, ValueError):
+                        continue  # empty cells are rows where a less frequent variable was not reported
+                    indexes, values = columns[report_id]
+                    indexes.append(row_count)
+                    values.append(value)
+                row_count += 1
+        tables = {CSVResultsFile.TimestampRecord: table} if decode_timestamps else None
+        return tables, [''], columns
+
+    def series(self, variable):
+        # every variable indexes into the one table of csv rows, whatever its frequency
+        if not isinstance(variable, ResultVariable):
+            variable = self._by_id[str(variable)]
+        self.load([variable])
+        indexes, values = self._columns[variable.report_id]
+        return TimeSeries(variable, values, indexes, self._timestamps[CSVResultsFile.TimestampRecord],
+                          self.environments)
+
+
+def open_results(file_path, cache_dir=None):
+    """
+    This function opens an EnergyPlus time series results file with the reader that matches its extension
+
+    * file_path: The path to an ESO or CSV results file
+    * cache_dir: The folder for binary sidecar files, or None to always read the text file
+    * Returns: An ESOFile or CSVResultsFile
+    """
+    if file_path.lower().endswith('.csv'):
+        return CSVResultsFile(file_path, cache_dir)
+    return ESOFile(file_path, cache_dir)
@@ -0,0 +1,227 @@
+import errno
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from ProcessGroup import IS_WINDOWS
+from ResultCache import folder_size
+
+
+def new_job_id():
+    """
+    This function creates a run identifier that sorts by start time and is unique across launcher instances
+
+    * Returns: A string such as '20161018-142503-3fa2b7c1'
+    """
+    return '%s-%s' % (time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8])
+
+
+class RunDirectoryAllocator(object):
+    """
+    This class hands out a fresh, never shared run directory for every simulation
+
+    Each run of an input file gets its own folder below the input's run root, which is the familiar
+    `<input folder>/output-<input name>` folder unless a common root is given.  Folders are created atomically, so two
+    threads or two launcher instances can never be given the same one.  A `latest` symbolic link in the run root points
+    at the most recent successful run, and old runs are pruned in the background to stay within the retention limits.
+    A run in progress holds a marker file naming the process that runs it, so no allocator in any launcher instance
+    prunes it while that process is alive.
+    """
+
+    LatestLinkName = 'latest'
+
+    # the marker file that is inside a run directory for as long as its simulation is running
+    ActiveMarkerName = '.eplaunchlite-active'
+
+    def __init__(self, root=None, keep_runs=10, max_bytes=None, keep_own_runs=False):
+        """
+        * root: A common folder for all run roots, or None to keep each run root next to its input file
+        * keep_runs: The number of runs kept per run root, or None to keep every run
+        * max_bytes: The maximum total size of the runs in a run root, or None for no size limit
+        * keep_own_runs: True to never prune the runs this allocator handed out, such as for a batch that reports
+          every run directory once it is done; they still count toward the limits for older runs
+        """
+        self.root = root
+        self.keep_runs = keep_runs
+        self.max_bytes = max_bytes
+        self.keep_own_runs = keep_own_runs
+        self._active = set()
+        self._allocated = set()
+        self._lock = threading.Lock()
+
+    def run_root(self, input_file):
+        """
+        This function finds the folder that holds every run of an input file
+
+        * input_file: The path to the input file
+        * Returns: The run root folder path
+        """
+        base_file_name = os.path.splitext(os.path.basename(input_file))[0]
+        if self.root is None:
+            return os.path.join(os.path.dirname(os.path.abspath(input_file)), 'output-' + base_file_name)
+        return os.path.join(self.root, base_file_name)
+
+    def allocate(self, input_file, job_id=None):
+        """
+        This function creates a new, empty run directory for a simulation of an input file
+
+        * input_file: The path to the input file
+        * job_id: The name for the run directory, defaulting to a new unique time-stamped identifier
+        * Returns: The path to the newly created run directory
+        """
+        run_root = self.run_root(input_file)
+        try:
+            os.makedirs(run_root)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        while True:
+            run_dir = os.path.join(run_root, job_id or new_job_id())
+            try:
+                # mkdir either creates the folder or fails, so no other allocator can ever be handed the same one
+                os.mkdir(run_dir)
+                break
+            except OSError as e:
+                if e.errno != errno.EEXIST or job_id is not None:
+                    raise
+        try:
+            with open(os.path.join(run_dir, RunDirectoryAllocator.ActiveMarkerName), 'w') as f:
+                f.write(str(os.getpid()))
+        except (IOError, OSError):
+            pass  # the run is still protected from this allocator's own pruning
+        with self._lock:
+            self._active.add(run_dir)
+            if self.keep_own_runs:
+                self._allocated.add(run_dir)
+        return run_dir
+
+    def _finish(self, run_dir):
+        with self._lock:
+            self._active.discard(run_dir)
+        try:
+            os.remove(os.path.join(run_dir, RunDirectoryAllocator.ActiveMarkerName))
+        except OSError:
+            pass
+
+    @staticmethod
+    def is_running_elsewhere(run_dir):
+        """
+        This function checks the marker file of a run directory for a simulation that is still running
+
+        * run_dir: The run directory
+        * Returns: True if the marker is there and the process it names may still be alive
+        """
+        try:
+            with open(os.path.join(run_dir, RunDirectoryAllocator.ActiveMarkerName)) as f:
+                pid = int(f.read().strip())
+        except (IOError, OSError):
+            return False
+        except ValueError:
+            return True  # written but not filled in yet
+        if IS_WINDOWS:
+            return True  # os.kill cannot probe a process there, so a marker left behind by a crash is kept
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            return e.errno != errno.ESRCH
+        return True
+
+    def release(self, run_dir, succeeded=True):
+        """
+        This function marks a run directory as finished, points the latest link at it if the run succeeded, and starts
+        a background prune of its run root
+
+        * run_dir: A run directory returned by allocate
+        * succeeded: True if the simulation in this run directory completed successfully
+        * Returns: The pruning thread
+        """
+        self._finish(run_dir)
+        run_root = os.path.dirname(run_dir)
+        if succeeded:
+            self.update_latest(run_root, run_dir)
+        return self.prune_in_background(run_root)
+
+    def update_latest(self, run_root, run_dir):
+        """
+        This function atomically points the latest link of a run root at a run directory
+
+        * run_root: The run root folder
+        * run_dir: The run directory inside the run root to link to
+        """
+        if not hasattr(os, 'symlink'):
+            return
+        link_path = os.path.join(run_root, RunDirectoryAllocator.LatestLinkName)
+        temp_link_path = '%s.%s' % (link_path, uuid.uuid4().hex[:8])
+        try:
+            # link relatively so the run root can be moved, then rename over the old link, which replaces it atomically
+            os.symlink(os.path.basename(run_dir), temp_link_path)
+            os.rename(temp_link_path, link_path)
+        except OSError:
+            pass
+
+    def runs(self, run_root):
+        """
+        This function lists the run directories in a run root
+
+        * run_root: The run root folder
+        * Returns: A list of run directory paths, newest first
+        """
+        try:
+            names = os.listdir(run_root)
+        except OSError:
+            return []
+        stamped = []
+        for name in names:
+            path = os.path.join(run_root, name)
+            if os.path.islink(path) or not os.path.isdir(path):
+                continue
+            try:
+                stamped.append((os.path.getmtime(path), path))
+            except OSError:
+                pass  # removed by a concurrent prune since it was listed
+        return [path for _stamp, path in sorted(stamped, reverse=True)]
+
+    def prune(self, run_root):
+        """
+        This function deletes the oldest finished runs in a run root that fall outside the retention limits; runs that
+        are still active in any launcher, runs kept for this allocator, and the run the latest link points at count
+        toward the limits but are never deleted
+
+        * run_root: The run root folder
+        * Returns: The list of deleted run directories
+        """
+        latest = os.path.realpath(os.path.join(run_root, RunDirectoryAllocator.LatestLinkName))
+        with self._lock:
+            active = self._active | self._allocated
+        kept_count = 0
+        kept_bytes = 0
+        deleted = []
+        for run_dir in self.runs(run_root):
+            size = folder_size(run_dir) if self.max_bytes is not None else 0
+            if run_dir in active or os.path.realpath(run_dir) == latest or self.is_running_elsewhere(run_dir):
+                kept_count += 1
+                kept_bytes += size
+                continue
+            over_count = self.keep_runs is not None and kept_count >= self.keep_runs
+            over_bytes = self.max_bytes is not None and kept_count > 0 and kept_bytes + size > self.max_bytes
+            if over_count or over_bytes:
+                shutil.rmtree(run_dir, ignore_errors=True)
+                deleted.append(run_dir)
+            else:
+                kept_count += 1
+                kept_bytes += size
+        return deleted
+
+    def prune_in_background(self, run_root):
+        """
+        This function prunes a run root on a daemon thread
+
+        * run_root: The run root folder
+        * Returns: The started thread
+        """
+        thread = threading.Thread(target=self.prune, args=(run_root,))
+        thread.daemon = True
+        thread.start()
+        return thread
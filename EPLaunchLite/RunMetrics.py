@@ -0,0 +1,144 @@
+import errno
+import json
+import os
+import sys
+import time
+
+
+class RunMetrics(object):
+    """
+    This class holds the resources a single simulation used, for sizing batch slots and comparing releases
+
+    The CPU, memory, and block I/O figures come from wait4, so they cover the simulation process together with every
+    helper process it started and waited for, such as ExpandObjects and ReadVarsESO.  They are None on platforms
+    without wait4.
+    """
+
+    FileName = 'run_metrics.json'
+
+    # ru_maxrss is reported in kilobytes everywhere but macOS, where it is already in bytes
+    _MaxRSSScale = 1 if sys.platform == 'darwin' else 1024
+
+    def __init__(self, wall_time, return_code, user_time=None, system_time=None, peak_rss_bytes=None,
+                 blocks_read=None, blocks_written=None):
+        """
+        * wall_time: The wall clock seconds from starting the process until it exited
+        * return_code: The process return code, negative for the signal number that ended it
+        * user_time: The CPU seconds spent in user mode
+        * system_time: The CPU seconds spent in the kernel
+        * peak_rss_bytes: The largest resident set size of any single process in the tree
+        * blocks_read: The number of block input operations, which are 512 byte blocks on Linux
+        * blocks_written: The number of block output operations
+        """
+        self.wall_time = wall_time
+        self.return_code = return_code
+        self.user_time = user_time
+        self.system_time = system_time
+        self.peak_rss_bytes = peak_rss_bytes
+        self.blocks_read = blocks_read
+        self.blocks_written = blocks_written
+
+    @property
+    def cpu_time(self):
+        """
+        This property is the total user and system CPU seconds, or None if they were not measured
+        """
+        if self.user_time is None or self.system_time is None:
+            return None
+        return self.user_time + self.system_time
+
+    @staticmethod
+    def from_rusage(wall_time, return_code, usage):
+        """
+        This function builds the metrics of a run from the resource usage returned by os.wait4
+
+        * wall_time: The wall clock seconds the run took
+        * return_code: The process return code
+        * usage: The resource.struct_rusage of the process and its waited-for descendants
+        * Returns: A RunMetrics instance
+        """
+        return RunMetrics(wall_time, return_code, usage.ru_utime, usage.ru_stime,
+                          usage.ru_maxrss * RunMetrics._MaxRSSScale, usage.ru_inblock, usage.ru_oublock)
+
+    def to_dict(self):
+        """
+        This function returns a plain dictionary of the metrics, suitable for json serialization
+
+        * Returns: A dictionary of the measured values
+        """
+        return {
+            'wall_time': self.wall_time,
+            'return_code': self.return_code,
+            'user_time': self.user_time,
+            'system_time': self.system_time,
+            'cpu_time': self.cpu_time,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'blocks_read': self.blocks_read,
+            'blocks_written': self.blocks_written,
+        }
+
+    def write(self, run_dir):
+        """
+        This function saves the metrics as run_metrics.json in the run directory
+
+        * run_dir: The simulation output folder
+        """
+        with open(os.path.join(run_dir, RunMetrics.FileName), 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def read(run_dir):
+        """
+        This function loads the metrics saved in a run directory
+
+        * run_dir: The simulation output folder
+        * Returns: A RunMetrics instance, or None if the folder has no readable metrics file
+        """
+        try:
+            with open(os.path.join(run_dir, RunMetrics.FileName)) as f:
+                values = json.load(f)
+            return RunMetrics(values['wall_time'], values['return_code'], values.get('user_time'),
+                              values.get('system_time'), values.get('peak_rss_bytes'), values.get('blocks_read'),
+                              values.get('blocks_written'))
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def return_code_from_status(status):
+    """
+    This function converts a raw wait status into the return code subprocess would report
+
+    * status: The status returned by os.waitpid or os.wait4
+    * Returns: The exit code, or the negated signal number if the process was killed by a signal
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait_with_metrics(process, start_time):
+    """
+    This function waits for a child process to exit and measures what it used
+
+    The process is reaped here with os.wait4 rather than by subprocess, because the resource usage is only available
+    to whoever reaps it, so nothing else may poll or wait on the process while this runs.
+
+    * process: The subprocess.Popen instance to wait for; its returncode is set once it exits
+    * start_time: The time.time() at which the process was started
+    * Returns: A RunMetrics instance
+    """
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return RunMetrics(time.time() - start_time, process.returncode)
+    while True:
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+            break
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            # the process was reaped elsewhere after all, so only its return code and wall time are known
+            process.wait()
+            return RunMetrics(time.time() - start_time, process.returncode)
+    process.returncode = return_code_from_status(status)
+    return RunMetrics.from_rusage(time.time() - start_time, process.returncode, usage)
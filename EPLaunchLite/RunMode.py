@@ -0,0 +1,119 @@
+"""
+This module lets a simulation stop after sizing or the design days, for fast feedback while a model is being built
+
+A design day run passes EnergyPlus its -D flag.  EnergyPlus has no flag for a sizing only run, so instead the input is
+copied with its SimulationControl object patched to skip both the sizing period and weather file simulations.  The
+copy is written next to the input, so relative includes and schedule files are still found, and removed afterwards.
+"""
+
+import os
+import re
+import tempfile
+
+
+class RunMode:
+    Annual = 'annual'
+    DesignDay = 'design-day'
+    SizingOnly = 'sizing-only'
+
+    All = (Annual, DesignDay, SizingOnly)
+
+
+# the flag that makes EnergyPlus simulate the design days only
+DesignDayFlag = '-D'
+
+# the zero-based positions of the SimulationControl fields a sizing only run switches off: the sizing period and
+# weather file run period simulations, and the HVAC sizing simulation added in version 8.3
+_SIMULATION_FIELDS = (3, 4, 5)
+
+# the sizing objects whose presence turns on each sizing calculation when the input has no SimulationControl
+_SIZING_OBJECTS = (('sizing:zone', 'Do Zone Sizing Calculation'),
+                   ('sizing:system', 'Do System Sizing Calculation'),
+                   ('sizing:plant', 'Do Plant Sizing Calculation'))
+
+# comments, and the macro directive lines of imf files, which are not part of any object
+_NOT_OBJECT_TEXT = re.compile(r'!.*|^[ \t]*##.*', re.MULTILINE)
+
+
+def _mask(text):
+    # blanks out everything that is not object text, keeping every position the same, so the masked text can be
+    # searched for the commas and semicolons that delimit fields and the matches used to edit the original
+    return _NOT_OBJECT_TEXT.sub(lambda match: ' ' * len(match.group(0)), text)
+
+
+def _objects(masked):
+    start = 0
+    for end in [match.start() for match in re.finditer(';', masked)]:
+        yield start, end
+        start = end + 1
+
+
+def _field_spans(masked, start, end):
+    # the spans of the field values of the object between start and end, trimmed of surrounding whitespace
+    delimiters = [match.start() for match in re.finditer(',', masked[start:end])]
+    bounds = [start + position for position in delimiters] + [end]
+    spans = []
+    for field_start, field_end in zip(bounds, bounds[1:]):
+        value = masked[field_start + 1:field_end]
+        stripped_start = field_start + 1 + len(value) - len(value.lstrip())
+        spans.append((stripped_start, max(stripped_start, field_end - (len(value) - len(value.rstrip())))))
+    return spans
+
+
+def sizing_only_text(text, is_macro=False):
+    """
+    This function patches the text of an input file so that it only runs the sizing calculations
+
+    * text: The contents of the input file
+    * is_macro: True for a macro (imf) file, whose SimulationControl object may be pulled in by an include, in which
+      case the text cannot be patched
+    * Returns: The patched text, or None if it cannot be patched
+    """
+    masked = _mask(text)
+    object_types = {}
+    for start, end in _objects(masked):
+        object_type = masked[start:end].split(',', 1)[0].strip().lower()
+        object_types.setdefault(object_type, (start, end))
+    if 'simulationcontrol' not in object_types:
+        if is_macro:
+            return None
+        fields = ['Yes' if name in object_types else 'No' for name, _comment in _SIZING_OBJECTS] + ['No', 'No']
+        comments = [comment for _name, comment in _SIZING_OBJECTS] + [
+            'Run Simulation for Sizing Periods', 'Run Simulation for Weather File Run Periods']
+        lines = ['    %s%s  !- %s' % (field, ';' if i == len(fields) - 1 else ',', comment)
+                 for i, (field, comment) in enumerate(zip(fields, comments))]
+        return text.rstrip() + '\n\nSimulationControl,\n' + '\n'.join(lines) + '\n'
+    start, end = object_types['simulationcontrol']
+    spans = _field_spans(masked, start, end)
+    # fields left off the end take their defaults, which run both simulations, so they are written out as well
+    missing = max(0, _SIMULATION_FIELDS[1] + 1 - len(spans))
+    text = text[:end] + ', No' * missing + text[end:]
+    for position in reversed(_SIMULATION_FIELDS):
+        if position < len(spans):
+            field_start, field_end = spans[position]
+            text = text[:field_start] + 'No' + text[field_end:]
+    return text
+
+
+def write_sizing_only_input(input_file, folder):
+    """
+    This function writes a sizing only copy of an input file
+
+    * input_file: The path to the input file to copy
+    * folder: The folder to write the copy into, which should be the folder of the original input
+    * Returns: The path to the copy, which the caller removes once the run is over, or None if the input cannot be
+      patched or the copy cannot be written
+    """
+    extension = os.path.splitext(input_file)[1]
+    try:
+        with open(input_file, 'rb') as f:
+            text = f.read().decode('latin-1')
+        patched = sizing_only_text(text, extension.lower() == '.imf')
+        if patched is None:
+            return None
+        handle, path = tempfile.mkstemp(prefix='.sizing-', suffix=extension, dir=folder)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(patched.encode('latin-1'))
+    except (IOError, OSError):
+        return None
+    return path
@@ -0,0 +1,397 @@
+import array
+import glob
+import os
+import sqlite3
+import threading
+
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+from ResultsFile import ResultVariable, TimeSeries
+
+
+def find_sql_file(run_dir):
+    """
+    This function finds the SQLite output of a run directory
+
+    * run_dir: The run directory
+    * Returns: The path to the sql file, or None if the run did not write one
+    """
+    candidates = sorted(glob.glob(os.path.join(run_dir, '*out.sql')))
+    if not candidates:
+        return None
+    return candidates[0]
+
+
+class ConnectionPool(object):
+    """
+    This class hands out reusable read-only connections to SQLite output files
+
+    Opening a connection and preparing statements is a large part of the cost of a small query, so connections are
+    kept open once released and reused by the next query against the same file, from any thread.  Each connection
+    keeps its own cache of prepared statements, which is what makes repeating the same queries cheap.
+    """
+
+    def __init__(self, max_idle_per_file=4, cached_statements=64):
+        """
+        * max_idle_per_file: The number of released connections kept open for each file
+        * cached_statements: The number of prepared statements each connection keeps
+        """
+        self.max_idle_per_file = max_idle_per_file
+        self.cached_statements = cached_statements
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, database_path):
+        # read-only, so a query can never modify results or take a write lock that would block the simulation; the
+        # path is escaped, since a # or ? in a folder name would otherwise end the path part of the uri
+        uri = 'file:%s?mode=ro' % pathname2url(os.path.abspath(database_path))
+        try:
+            return sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=self.cached_statements)
+        except TypeError:
+            # python before 3.4 has no uri support, so the connection refuses writes through a pragma instead
+            connection = sqlite3.connect(database_path, check_same_thread=False,
+                                         cached_statements=self.cached_statements)
+            connection.execute("PRAGMA query_only = ON")
+            return connection
+
+    def acquire(self, database_path):
+        """
+        This function takes an idle connection to a file, opening a new one if there is none
+
+        * database_path: The path to the sql file
+        * Returns: A sqlite3 connection, to be handed back with release
+        """
+        key = os.path.realpath(database_path)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        if not os.path.isfile(key):
+            raise IOError("No such sql file: %s" % database_path)
+        return self._connect(key)
+
+    def release(self, database_path, connection):
+        """
+        This function hands a connection back so it can be reused
+
+        * database_path: The path the connection was acquired for
+        * connection: The connection returned by acquire
+        """
+        key = os.path.realpath(database_path)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_file:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close_all(self, database_path=None):
+        """
+        This function closes idle connections, for instance before a run directory is deleted
+
+        * database_path: Only close the connections to this file, or None to close every idle connection
+        """
+        with self._lock:
+            if database_path is None:
+                keys = list(self._idle)
+            else:
+                keys = [os.path.realpath(database_path)]
+            connections = []
+            for key in keys:
+                connections.extend(self._idle.pop(key, []))
+        for connection in connections:
+            connection.close()
+
+
+# shared by every SQLResults that is not given a pool of its own
+DEFAULT_POOL = ConnectionPool()
+
+
+class Queries:
+    """
+    The statements run against the EnergyPlus SQLite schema, kept as constants so every connection prepares each of
+    them once and then reuses it from its statement cache
+    """
+    Variables = (
+        "SELECT ReportDataDictionaryIndex, KeyValue, Name, Units, ReportingFrequency "
+        "FROM ReportDataDictionary ORDER BY ReportDataDictionaryIndex"
+    )
+    Environments = (
+        "SELECT EnvironmentPeriodIndex, EnvironmentName FROM EnvironmentPeriods ORDER BY EnvironmentPeriodIndex"
+    )
+    Series = (
+        "SELECT t.EnvironmentPeriodIndex, t.SimulationDays, t.Month, t.Day, t.Hour, t.Minute, d.Value "
+        "FROM ReportData d JOIN Time t ON t.TimeIndex = d.TimeIndex "
+        "WHERE d.ReportDataDictionaryIndex = ? ORDER BY d.TimeIndex"
+    )
+    Tabular = (
+        "SELECT RowName, ColumnName, Units, Value FROM TabularDataWithStrings "
+        "WHERE ReportName = ? AND ReportForString = ? AND TableName = ?"
+    )
+    TabularValue = (
+        "SELECT Value FROM TabularDataWithStrings "
+        "WHERE ReportName = ? AND ReportForString = ? AND TableName = ? AND RowName = ? AND ColumnName = ?"
+    )
+    # the stock schema has no index that covers looking up the values of one variable
+    ReportDataIndex = (
+        "CREATE INDEX IF NOT EXISTS EPLaunchLiteReportDataByVariable "
+        "ON ReportData (ReportDataDictionaryIndex, TimeIndex)"
+    )
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class SQLResults(object):
+    """
+    This class queries the SQLite output of one simulation
+
+    Queries run on pooled read-only connections and return their results as columns: arrays of doubles for values,
+    and TimeSeries instances for reported variables, the same as the text results readers.  The index that makes
+    looking up one variable fast is created the first time a time series is asked for, on a separate short-lived
+    writable connection, and is simply skipped if the file cannot be written.
+    """
+
+    _indexed = set()
+    _indexed_lock = threading.Lock()
+
+    def __init__(self, database_path, pool=None):
+        """
+        * database_path: The path to the sql file, usually eplusout.sql in a run directory
+        * pool: The ConnectionPool to use, defaulting to one shared by the whole process
+        """
+        self.database_path = database_path
+        self.pool = pool if pool is not None else DEFAULT_POOL
+        self._variables = None
+        self._environments = None
+
+    @staticmethod
+    def for_run_dir(run_dir, pool=None):
+        """
+        This function opens the SQLite output of a run directory
+
+        * run_dir: The run directory
+        * pool: The ConnectionPool to use, defaulting to one shared by the whole process
+        * Returns: A SQLResults instance, or None if the run did not write an sql file
+        """
+        database_path = find_sql_file(run_dir)
+        if database_path is None:
+            return None
+        return SQLResults(database_path, pool)
+
+    def _fetch(self, query, parameters=()):
+        connection = self.pool.acquire(self.database_path)
+        try:
+            return connection.execute(query, parameters).fetchall()
+        finally:
+            self.pool.release(self.database_path, connection)
+
+    def ensure_indexes(self):
+        """
+        This function creates the indexes the time series queries rely on, once per file
+
+        * Returns: True if the indexes exist, or False if they could not be created
+        """
+        key = os.path.realpath(self.database_path)
+        try:
+            # a rerun replaces the file, and with it the indexes, so remember the file itself and not just its path
+            key = (key, os.stat(key).st_ino)
+        except OSError:
+            return False
+        with SQLResults._indexed_lock:
+            if key in SQLResults._indexed:
+                return True
+            try:
+                connection = sqlite3.connect(key[0])
+                try:
+                    connection.execute(Queries.ReportDataIndex)
+                    connection.commit()
+                finally:
+                    connection.close()
+            except sqlite3.Error:
+                return False
+            SQLResults._indexed.add(key)
+            return True
+
+    def variables(self):
+        """
+        This function lists the reported variables and meters
+
+        * Returns: A list of ResultVariable instances
+        """
+        if self._variables is None:
+            self._variables = [ResultVariable(str(row[0]), row[1] or '', row[2], row[3], row[4])
+                               for row in self._fetch(Queries.Variables)]
+        return list(self._variables)
+
+    def environments(self):
+        """
+        This function lists the simulated environments
+
+        * Returns: A dictionary of environment period index to environment name
+        """
+        if self._environments is None:
+            self._environments = dict(self._fetch(Queries.Environments))
+        return dict(self._environments)
+
+    def find(self, name, key=None, frequency=None):
+        """
+        This function finds variables by name
+
+        * name: The variable or meter name, compared without regard to case
+        * key: An optional key value, such as a zone name, compared without regard to case
+        * frequency: An optional reporting frequency, such as 'Hourly'
+        * Returns: A list of matching ResultVariable instances
+        """
+        return [variable for variable in self.variables()
+                if variable.name.lower() == name.lower() and
+                (key is None or variable.key.lower() == key.lower()) and
+                (frequency is None or variable.frequency.lower() == frequency.lower())]
+
+    def series(self, variable):
+        """
+        This function gets the time series of one variable
+
+        * variable: A ResultVariable from this file, or its report id
+        * Returns: A TimeSeries
+        """
+        if not isinstance(variable, ResultVariable):
+            variable = dict((v.report_id, v) for v in self.variables())[str(variable)]
+        self.ensure_indexes()
+        rows = self._fetch(Queries.Series, (int(variable.report_id),))
+        environment_indexes = sorted(self.environments())
+        names = [self.environments()[index] for index in environment_indexes]
+        position = dict((index, i) for i, index in enumerate(environment_indexes))
+        columns = list(zip(*rows)) if rows else [()] * 7
+        timestamps = {
+            'environment': array.array('d', [position.get(index, -1) for index in columns[0]]),
+            'day_of_simulation': array.array('d', [value or 0 for value in columns[1]]),
+        }
+        for field, column in zip(('month', 'day', 'hour', 'minute'), columns[2:6]):
+            timestamps[field] = array.array('d', [value or 0 for value in column])
+        values = array.array('d', [_to_float(value) for value in columns[6]])
+        return TimeSeries(variable, values, array.array('d', range(len(values))), timestamps, names)
+
+    def tabular(self, report_name, table_name, report_for='Entire Facility'):
+        """
+        This function reads one table of a tabular report
+
+        * report_name: The report name, such as 'AnnualBuildingUtilityPerformanceSummary'
+        * table_name: The table name, such as 'Site and Source Energy'
+        * report_for: The report scope, such as 'Entire Facility' or a zone name
+        * Returns: A dictionary with 'rows' and 'columns' name lists, a 'units' list per column, and 'values', a list
+          per row of strings, in the order rows and columns first appear
+        """
+        rows = []
+        columns = []
+        units = {}
+        cells = {}
+        for row_name, column_name, unit, value in self._fetch(Queries.Tabular, (report_name, report_for, table_name)):
+            if row_name not in cells:
+                rows.append(row_name)
+                cells[row_name] = {}
+            if column_name not in units:
+                columns.append(column_name)
+                units[column_name] = unit
+            cells[row_name][column_name] = value.strip() if value else ''
+        return {
+            'rows': rows,
+            'columns': columns,
+            'units': [units[column] for column in columns],
+            'values': [[cells[row].get(column, '') for column in columns] for row in rows],
+        }
+
+    def tabular_value(self, report_name, table_name, row_name, column_name, report_for='Entire Facility'):
+        """
+        This function reads one numeric cell of a tabular report
+
+        * report_name: The report name
+        * table_name: The table name
+        * row_name: The row name, such as 'Total Site Energy'
+        * column_name: The column name, such as 'Total Energy'
+        * report_for: The report scope
+        * Returns: The value as a float, or nan if the cell is missing or not numeric
+        """
+        rows = self._fetch(Queries.TabularValue, (report_name, report_for, table_name, row_name, column_name))
+        return _to_float(rows[0][0]) if rows else float('nan')
+
+
+class RunSet(object):
+    """
+    This class runs the same query against the SQLite output of many run directories at once
+
+    The sqlite library releases the interpreter lock while it works, so the per-run queries run on a thread each and
+    results come back aligned with the list of run directories, ready to be compared or plotted side by side.
+    """
+
+    def __init__(self, run_dirs, pool=None, max_workers=8):
+        """
+        * run_dirs: A list of run directories
+        * pool: The ConnectionPool to use, defaulting to one shared by the whole process
+        * max_workers: The maximum number of runs queried at the same time
+        """
+        self.run_dirs = list(run_dirs)
+        self.pool = pool
+        self.max_workers = max_workers
+        self.results = [SQLResults.for_run_dir(run_dir, pool) for run_dir in self.run_dirs]
+
+    def map(self, function):
+        """
+        This function calls a function with the SQLResults of every run, in parallel
+
+        * function: Called with (SQLResults) for each run that has an sql file
+        * Returns: A list with the return value for each run directory, or None for runs without an sql file or
+          where the function raised a sqlite or file error
+        """
+        outputs = [None] * len(self.results)
+        pending = [i for i, results in enumerate(self.results) if results is not None]
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    i = pending.pop(0)
+                try:
+                    outputs[i] = function(self.results[i])
+                except (sqlite3.Error, IOError, OSError, KeyError):
+                    outputs[i] = None
+
+        threads = [threading.Thread(target=work) for _ in range(min(self.max_workers, len(pending)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outputs
+
+    def tabular_values(self, report_name, table_name, row_name, column_name, report_for='Entire Facility'):
+        """
+        This function reads the same tabular report cell from every run
+
+        * Returns: An array of doubles aligned with run_dirs, with nan for runs that do not have the value
+        """
+        values = self.map(lambda results: results.tabular_value(report_name, table_name, row_name, column_name,
+                                                                 report_for))
+        return array.array('d', [float('nan') if value is None else value for value in values])
+
+    def series(self, name, key=None, frequency=None):
+        """
+        This function reads the same variable from every run
+
+        * name: The variable or meter name
+        * key: An optional key value
+        * frequency: An optional reporting frequency
+        * Returns: A list of TimeSeries aligned with run_dirs, with None for runs that do not report the variable
+        """
+        def one_series(results):
+            matches = results.find(name, key, frequency)
+            return results.series(matches[0]) if matches else None
+        return self.map(one_series)
@@ -1,7 +1,9 @@
 import json
 import os
 
+from EnergyPlusInstalls import DEFAULT_ROOTS
 from International import Languages
+from RunMode import RunMode
 
 
 class Keys:
@@ -10,6 +12,11 @@ class Keys:
     last_idf = 'last_idf'
     last_epw = 'last_epw'
     language = 'language'
+    install_roots = 'install_roots'
+    keep_runs = 'keep_runs'
+    max_run_bytes = 'max_run_bytes'
+    weather_folders = 'weather_folders'
+    run_mode = 'run_mode'
 
 
 def load_settings(settings_file_name):
@@ -27,6 +34,17 @@ def load_settings(settings_file_name):
         settings[Keys.last_epw] = '/path/to/epw'
     if Keys.language not in settings:
         settings[Keys.language] = Languages.English
+    if Keys.install_roots not in settings or settings[Keys.install_roots] == DEFAULT_ROOTS + ['~']:
+        # the second case is the earlier default, which also searched the home folder itself
+        settings[Keys.install_roots] = list(DEFAULT_ROOTS)
+    if Keys.keep_runs not in settings:
+        settings[Keys.keep_runs] = 10
+    if Keys.max_run_bytes not in settings:
+        settings[Keys.max_run_bytes] = None
+    if Keys.weather_folders not in settings:
+        settings[Keys.weather_folders] = []
+    if settings.get(Keys.run_mode) not in RunMode.All:
+        settings[Keys.run_mode] = RunMode.Annual
     return settings
 
 
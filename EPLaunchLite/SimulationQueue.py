@@ -0,0 +1,377 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from EnergyPlusThread import EnergyPlusThread
+from International import translate as _
+from PostProcessing import PostProcessTask
+from ResourceLimits import ResourceLimits, allowed_cpus, available_memory, process_group_rss
+from RunMode import RunMode
+
+
+class JobStatus:
+    Pending = 'pending'
+    Running = 'running'
+    Succeeded = 'succeeded'
+    Failed = 'failed'
+    Cancelled = 'cancelled'
+
+    # the statuses that a job can never leave once reached
+    Finished = (Succeeded, Failed, Cancelled)
+
+
+class SimulationJob(object):
+    """
+    This class holds the inputs, state, and results of a single queued simulation
+    """
+
+    def __init__(self, job_id, input_file, weather_file, run_script, run_dir=None, limits=None):
+        self.job_id = job_id
+        self.input_file = input_file
+        self.weather_file = weather_file
+        self.run_script = run_script
+        self.status = JobStatus.Pending
+        self.std_out = None
+        self.run_dir = run_dir
+        self.limits = limits
+        self.slot = None
+        self.progress = None
+        self.error_counts = None
+        self.metrics = None
+        self.post_processing = None
+        self.thread = None
+
+    def to_dict(self):
+        """
+        This function returns a plain dictionary of the job state, suitable for json serialization
+
+        * Returns: A dictionary with the job id, files, status, run directory, error file counts, resource usage, csv
+          conversion state, and standard output
+        """
+        return {
+            'job_id': self.job_id,
+            'input_file': self.input_file,
+            'weather_file': self.weather_file,
+            'run_script': self.run_script,
+            'status': self.status,
+            'run_dir': self.run_dir,
+            'errors': self.error_counts,
+            'metrics': None if self.metrics is None else self.metrics.to_dict(),
+            'post_processing': None if self.post_processing is None else self.post_processing.to_dict(),
+            'std_out': self.std_out,
+        }
+
+
+class SimulationQueue(object):
+    """
+    This class runs many EnergyPlus simulations, dispatching queued jobs to a bounded number of EnergyPlusThreads
+
+    Jobs are started in submission order as soon as a worker slot is free and, if the expected memory of a job is
+    given, enough memory is free for it too.  All of the callbacks are called from worker threads, so GUI consumers
+    must marshal them back onto their own main loop.
+    """
+
+    def __init__(self, run_script, max_workers=None, msg_callback=None, job_callback=None, finished_callback=None,
+                 progress_callback=None, result_cache=None, run_dir_allocator=None, limits=None, job_memory=None,
+                 pin_cpus=False, preprocess_cache=None, defer_post_processing=False, post_process_pool=None,
+                 run_mode=RunMode.Annual):
+        """
+        * run_script: The EnergyPlus executable used for jobs that do not name their own
+        * max_workers: The maximum number of simultaneous simulations, defaults to the number of cpu cores
+        * msg_callback: Called with (job, message) for each status message from a running job
+        * job_callback: Called with (job) each time a job changes status
+        * finished_callback: Called with no arguments once every submitted job has finished
+        * progress_callback: Called with (job, progress) each time a running job reports a new SimulationProgress
+        * result_cache: An optional ResultCache shared by every job, so identical jobs are only simulated once
+        * run_dir_allocator: An optional RunDirectoryAllocator giving every job without an explicit run directory a
+          unique one, which is needed whenever the same input file may be simulated more than once at a time
+        * limits: An optional ResourceLimits applied to every job that is not submitted with limits of its own
+        * job_memory: The number of bytes a job is expected to need at its peak, defaulting to the memory cap of the
+          limits; when given, a job only starts once that much memory is free, beyond what the running jobs have yet
+          to claim, though a job is always started when nothing else is running
+        * pin_cpus: True to pin each worker slot to its own share of the CPUs this process may run on
+        * preprocess_cache: An optional PreprocessCache shared by every job, so each distinct input is only run
+          through EPMacro and ExpandObjects once
+        * defer_post_processing: True to count a job as done as soon as EnergyPlus exits, leaving the csv conversion
+          to the PostProcessTask in the job's post_processing attribute, which can be run on demand
+        * post_process_pool: An optional PostProcessPool that converts the output of every deferred job in the
+          background; giving a pool implies defer_post_processing
+        * run_mode: One of the RunMode constants, to stop every job after the design days or the sizing calculations
+        """
+        if max_workers is None:
+            max_workers = SimulationQueue.default_worker_count()
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.run_script = run_script
+        self.max_workers = max_workers
+        self.msg_callback = msg_callback
+        self.job_callback = job_callback
+        self.finished_callback = finished_callback
+        self.progress_callback = progress_callback
+        self.result_cache = result_cache
+        self.preprocess_cache = preprocess_cache
+        self.defer_post_processing = defer_post_processing or post_process_pool is not None
+        self.post_process_pool = post_process_pool
+        self.run_mode = run_mode
+        self.run_dir_allocator = run_dir_allocator
+        self.limits = limits
+        if job_memory is None and limits is not None:
+            job_memory = limits.memory_bytes
+        self.job_memory = job_memory
+        self.slot_cpus = SimulationQueue.partition_cpus(allowed_cpus(), max_workers) if pin_cpus else None
+        self._free_slots = list(range(max_workers))
+        self.jobs = []
+        self._pending = []
+        self._running = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    @staticmethod
+    def default_worker_count():
+        try:
+            return multiprocessing.cpu_count()
+        except NotImplementedError:
+            return 1
+
+    @staticmethod
+    def partition_cpus(cpus, slot_count):
+        """
+        This function shares CPUs out between worker slots, so simultaneous simulations do not compete for a core
+
+        * cpus: The list of CPU numbers available
+        * slot_count: The number of worker slots
+        * Returns: A list holding the list of CPU numbers for each slot; slots share CPUs only if there are more slots
+          than CPUs
+        """
+        if slot_count > len(cpus):
+            return [[cpus[slot % len(cpus)]] for slot in range(slot_count)]
+        return [cpus[slot::slot_count] for slot in range(slot_count)]
+
+    def submit(self, input_file, weather_file, run_script=None, run_dir=None, limits=None):
+        """
+        This function adds a single simulation to the queue and starts it if a worker slot is free
+
+        * input_file: The path to the input file to simulate
+        * weather_file: The path to the weather file to use for this simulation
+        * run_script: The EnergyPlus executable for this job, defaulting to the queue's executable
+        * run_dir: The folder for this job's output, defaulting to an output folder next to the input file
+        * limits: The ResourceLimits for this job, defaulting to the queue's limits
+        * Returns: The SimulationJob instance tracking this simulation
+        """
+        with self._lock:
+            job = SimulationJob(len(self.jobs) + 1, input_file, weather_file, run_script or self.run_script, run_dir,
+                                limits or self.limits)
+            self.jobs.append(job)
+            self._pending.append(job)
+        self._dispatch()
+        return job
+
+    def submit_many(self, file_pairs):
+        """
+        This function adds many simulations to the queue at once
+
+        * file_pairs: An iterable of (input_file, weather_file) tuples
+        * Returns: A list of SimulationJob instances, in the same order as the file pairs
+        """
+        return [self.submit(input_file, weather_file) for input_file, weather_file in file_pairs]
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            while self._pending and len(self._running) < self.max_workers and self._memory_available():
+                job = self._pending.pop(0)
+                job.status = JobStatus.Running
+                job.slot = self._free_slots.pop(0)
+                job.thread = EnergyPlusThread(
+                    job.run_script,
+                    job.input_file,
+                    job.weather_file,
+                    lambda message, j=job: self._job_message(j, message),
+                    lambda std_out, run_dir, metrics, j=job: self._job_done(j, JobStatus.Succeeded, std_out, run_dir,
+                                                                             metrics),
+                    lambda std_out, run_dir, metrics, j=job: self._job_done(j, JobStatus.Failed, std_out, run_dir,
+                                                                             metrics),
+                    lambda j=job: self._job_done(j, JobStatus.Cancelled, None, None, j.thread.metrics),
+                    lambda progress, j=job: self._job_progress(j, progress),
+                    result_cache=self.result_cache,
+                    run_dir=job.run_dir,
+                    run_dir_allocator=self.run_dir_allocator,
+                    limits=self._job_limits(job),
+                    preprocess_cache=self.preprocess_cache,
+                    defer_post_processing=self.defer_post_processing,
+                    run_mode=self.run_mode
+                )
+                self._running.append(job)
+                started.append(job)
+        for job in started:
+            self._notify(job)
+            job.thread.start()
+
+    def _job_limits(self, job):
+        if self.slot_cpus is None:
+            return job.limits
+        cpus = self.slot_cpus[job.slot]
+        return ResourceLimits(cpus) if job.limits is None else job.limits.with_cpus(cpus)
+
+    def _memory_available(self):
+        # called with the lock held, for the job at the head of the pending list
+        if self.job_memory is None or not self._running:
+            return True
+        free = available_memory()
+        if free is None:
+            return True
+        # a job that started recently has not grown to its full size yet, so the memory it will still claim is held
+        # back for it, otherwise a burst of starts would all see the same free memory
+        claimed = 0
+        for job in self._running:
+            rss = None
+            if job.thread is not None and job.thread.p is not None:
+                rss = process_group_rss(job.thread.p.pid)
+            claimed += self.job_memory if rss is None else max(0, self.job_memory - rss)
+        return free - claimed >= self.job_memory
+
+    def _job_message(self, job, message):
+        if self.msg_callback:
+            self.msg_callback(job, message)
+
+    def _job_progress(self, job, progress):
+        job.progress = progress
+        if self.progress_callback:
+            self.progress_callback(job, progress)
+
+    def _job_done(self, job, status, std_out, run_dir, metrics):
+        with self._lock:
+            job.status = status
+            job.std_out = std_out
+            job.metrics = metrics
+            job.run_dir = run_dir or job.thread.run_dir
+            if job.thread.error_report is not None:
+                job.error_counts = dict(job.thread.error_report.counts)
+            if self.defer_post_processing and status == JobStatus.Succeeded:
+                base_file_name = os.path.splitext(os.path.basename(job.input_file))[0]
+                job.post_processing = PostProcessTask(job.run_script, job.run_dir, base_file_name)
+                if self.post_process_pool is not None:
+                    self.post_process_pool.submit(job.post_processing)
+            self._running.remove(job)
+            self._free_slots.append(job.slot)
+            all_done = not self._pending and not self._running
+            if all_done:
+                self._idle.notify_all()
+        self._notify(job)
+        if all_done:
+            if self.finished_callback:
+                self.finished_callback()
+        else:
+            self._dispatch()
+
+    def _notify(self, job):
+        if self.job_callback:
+            self.job_callback(job)
+
+    def cancel_all(self):
+        """
+        This function drops every job that has not started yet and stops every running simulation
+        """
+        self._cancel(lambda job: True)
+
+    def cancel_input(self, input_file):
+        """
+        This function drops or stops every unfinished job that simulates an input file, whatever its weather file
+
+        * input_file: The path to the input file
+        * Returns: The list of jobs cancelled, where running jobs may take a moment to reach the cancelled status
+        """
+        target = os.path.abspath(input_file)
+        return self._cancel(lambda job: os.path.abspath(job.input_file) == target)
+
+    def supersede(self, input_file, weather_file, run_script=None, run_dir=None, limits=None):
+        """
+        This function replaces every unfinished job for an input file with a new one, so a simulation of an outdated
+        input stops using the cpu as soon as the input changes; with a single worker, the new job only starts once the
+        old one has exited
+
+        * input_file: The path to the input file to simulate
+        * weather_file: The path to the weather file to simulate with
+        * run_script: The EnergyPlus executable for this job, defaulting to the queue's
+        * run_dir: The output folder for this job, defaulting to an output folder next to the input file
+        * limits: The ResourceLimits for this job, defaulting to the queue's
+        * Returns: The new SimulationJob
+        """
+        self.cancel_input(input_file)
+        return self.submit(input_file, weather_file, run_script, run_dir, limits)
+
+    def _cancel(self, select):
+        with self._lock:
+            dropped = [job for job in self._pending if select(job)]
+            self._pending = [job for job in self._pending if not select(job)]
+            running = [job for job in self._running if select(job)]
+            for job in dropped:
+                job.status = JobStatus.Cancelled
+            all_done = not self._running and not self._pending and len(dropped) > 0
+            if all_done:
+                self._idle.notify_all()
+        for job in dropped:
+            self._notify(job)
+        for job in running:
+            # a thread that has not created its process yet will stop it as soon as it does
+            job.thread.stop()
+        if all_done and self.finished_callback:
+            self.finished_callback()
+        return dropped + running
+
+    def wait(self, timeout=None):
+        """
+        This function blocks until every submitted job has finished
+
+        * timeout: The maximum number of seconds to wait, or None to wait indefinitely
+        * Returns: True if all jobs finished, or False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            return True
+
+    def fail_stalled(self):
+        """
+        This function fails every running job whose simulation thread has exited without reporting a result, which
+        would otherwise keep the queue from ever draining
+
+        * Returns: The list of jobs failed
+        """
+        with self._lock:
+            # a thread that has not been started yet has no ident, and is only about to run rather than stalled
+            stalled = [job for job in self._running if job.thread.ident is not None and not job.thread.is_alive()]
+        for job in stalled:
+            self._job_done(job, JobStatus.Failed, None, None, None)
+        return stalled
+
+    def status_counts(self):
+        """
+        This function summarizes the overall queue state
+
+        * Returns: A dictionary mapping each job status to the number of jobs currently in that status
+        """
+        counts = dict((status, 0) for status in
+                      (JobStatus.Pending, JobStatus.Running, JobStatus.Succeeded, JobStatus.Failed,
+                       JobStatus.Cancelled))
+        with self._lock:
+            for job in self.jobs:
+                counts[job.status] += 1
+        return counts
+
+    def status_message(self):
+        """
+        This function builds a short, translated, human readable summary of the queue state
+
+        * Returns: A string such as 'Jobs: 3 running, 10 pending, 2 completed, 1 failed'
+        """
+        counts = self.status_counts()
+        return _("Jobs: %d running, %d pending, %d completed, %d failed") % (
+            counts[JobStatus.Running], counts[JobStatus.Pending], counts[JobStatus.Succeeded],
+            counts[JobStatus.Failed] + counts[JobStatus.Cancelled]
+        )
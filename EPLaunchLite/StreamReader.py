@@ -0,0 +1,75 @@
+import collections
+import threading
+
+
+class StreamReader(object):
+    """
+    This class drains the stdout and stderr pipes of a child process line by line as the output arrives
+
+    Each pipe gets its own daemon thread, so a chatty stream can never fill its pipe buffer and deadlock the child while
+    the other stream is being waited on.  Only the last `max_lines` lines of each stream are kept in memory.
+    """
+
+    def __init__(self, std_out_pipe, std_err_pipe, line_callback=None, max_lines=1000):
+        """
+        * std_out_pipe: The binary stdout pipe of the child process
+        * std_err_pipe: The binary stderr pipe of the child process, or None if stderr is not captured
+        * line_callback: Called with (line) for every decoded stdout and stderr line, without the trailing newline
+        * max_lines: The number of trailing lines retained for each stream
+        """
+        self.line_callback = line_callback
+        self.std_out_tail = collections.deque(maxlen=max_lines)
+        self.std_err_tail = collections.deque(maxlen=max_lines)
+        self.line_count = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        for pipe, tail in ((std_out_pipe, self.std_out_tail), (std_err_pipe, self.std_err_tail)):
+            if pipe is None:
+                continue
+            thread = threading.Thread(target=self._pump, args=(pipe, tail))
+            thread.daemon = True
+            self._threads.append(thread)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def _pump(self, pipe, tail):
+        try:
+            for raw_line in iter(pipe.readline, b''):
+                line = raw_line.decode('utf-8', 'replace').rstrip('\r\n')
+                with self._lock:
+                    tail.append(line)
+                    self.line_count += 1
+                if self.line_callback:
+                    self.line_callback(line)
+        finally:
+            pipe.close()
+
+    def join(self, timeout=None):
+        """
+        This function waits for both pipes to reach end-of-file, which happens once the child and any grandchildren
+        holding the pipes have exited
+
+        * timeout: The maximum number of seconds to wait for each stream, or None to wait indefinitely
+        """
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def std_out(self):
+        """
+        This function returns the retained tail of stdout
+
+        * Returns: The retained stdout lines joined into a single string
+        """
+        with self._lock:
+            return '\n'.join(self.std_out_tail)
+
+    def std_err(self):
+        """
+        This function returns the retained tail of stderr
+
+        * Returns: The retained stderr lines joined into a single string
+        """
+        with self._lock:
+            return '\n'.join(self.std_err_tail)
@@ -0,0 +1,124 @@
+"""
+This module carries updates from worker threads to a GUI main loop in batches, at most once per frame
+
+Calling gobject.idle_add for every line a simulation prints queues one main loop callback per line, and a few busy
+simulations are enough to keep the main loop from ever getting to redraw the window.  An UpdateChannel instead
+gathers everything posted between two frames and delivers it in one go: status updates only keep their latest value,
+output lines are handed over as a chunk, and other calls are made in the order they were posted.
+"""
+
+import collections
+import threading
+import traceback
+
+
+class UpdateChannel(object):
+    """
+    This class batches updates from any number of threads for delivery on the main loop
+
+    Posting never blocks on the main loop.  The first post after a delivery schedules the next one, a frame later, so
+    an idle channel costs nothing and a busy one is delivered at the frame rate.  Within a delivery, updates run in the
+    order of their last post, so a completion posted after a status update is still handled after it.
+    """
+
+    def __init__(self, schedule, frame_rate=20, max_output_lines=1000):
+        """
+        * schedule: Called with (milliseconds, function) to have the main loop call function once after a delay, and
+          to keep calling it for as long as it returns True, which is exactly what gobject.timeout_add does
+        * frame_rate: The maximum number of deliveries per second
+        * max_output_lines: The number of lines kept for each output between two deliveries, the oldest being
+          skipped when a stalled main loop falls further behind than that
+        """
+        self.schedule = schedule
+        self.interval_ms = max(1, int(1000 / frame_rate))
+        self.max_output_lines = max_output_lines
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._scheduled = False
+        self._calls = []
+        self._latest = {}
+        self._lines = {}
+
+    def _next_sequence(self):
+        self._sequence += 1
+        return self._sequence
+
+    def _wake(self):
+        # called holding the lock; a delivery is only scheduled if none is pending already
+        if not self._scheduled:
+            self._scheduled = True
+            return True
+        return False
+
+    def post(self, function, *args):
+        """
+        This function queues a call that is always made, in order with the other calls
+
+        * function: Called on the main loop with args
+        """
+        with self._lock:
+            self._calls.append((self._next_sequence(), function, args))
+            wake = self._wake()
+        if wake:
+            self.schedule(self.interval_ms, self.deliver)
+
+    def post_latest(self, key, function, *args):
+        """
+        This function queues a call that replaces any call posted under the same key that has not been made yet
+
+        * key: Identifies what the call updates, such as a status bar or the progress of one job
+        * function: Called on the main loop with args
+        """
+        with self._lock:
+            self._latest[key] = (self._next_sequence(), function, args)
+            wake = self._wake()
+        if wake:
+            self.schedule(self.interval_ms, self.deliver)
+
+    def post_line(self, key, function, line):
+        """
+        This function queues a line of output, which is delivered together with the other lines posted for the key
+
+        * key: Identifies the output, such as the output of one job
+        * function: Called on the main loop with (lines, skipped), the list of lines and the number of lines before
+          them that were dropped to stay within max_output_lines
+        * line: The line of output
+        """
+        with self._lock:
+            entry = self._lines.get(key)
+            if entry is None:
+                entry = self._lines[key] = [0, function, collections.deque(maxlen=self.max_output_lines), 0]
+            if len(entry[2]) == self.max_output_lines:
+                entry[3] += 1
+            entry[0] = self._next_sequence()
+            entry[1] = function
+            entry[2].append(line)
+            wake = self._wake()
+        if wake:
+            self.schedule(self.interval_ms, self.deliver)
+
+    def deliver(self):
+        """
+        This function makes every call posted since the last delivery, and must be called on the main loop
+
+        A call that raises has its traceback printed to stderr, and the rest of the batch is still delivered, since the
+        later calls may be the completions a window is waiting for.
+
+        * Returns: False, so a timeout that called it is not repeated
+        """
+        with self._lock:
+            batch = list(self._calls)
+            batch.extend(self._latest.values())
+            batch.extend((sequence, function, (list(lines), skipped))
+                         for sequence, function, lines, skipped in self._lines.values())
+            self._calls = []
+            self._latest = {}
+            self._lines = {}
+            self._scheduled = False
+        batch.sort(key=lambda update: update[0])
+        for _sequence, function, args in batch:
+            try:
+                function(*args)
+            except Exception:
+                traceback.print_exc()
+        return False
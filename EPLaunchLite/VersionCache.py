@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+
+from EnergyPlusThread import EnergyPlusThread
+
+
+class VersionCache(object):
+    """
+    This class remembers the version string reported by each EnergyPlus executable
+
+    Entries are keyed by the resolved executable path and are only trusted while the executable size and modified time
+    still match, so probing the version with a child process only happens when an installation actually changes.
+    """
+
+    def __init__(self, cache_file_name=None):
+        """
+        * cache_file_name: The json file used to persist the cache, or None to keep the cache in memory only
+        """
+        self.cache_file_name = cache_file_name
+        self._lock = threading.Lock()
+        self._versions = {}
+        if cache_file_name is not None:
+            try:
+                with open(cache_file_name) as f:
+                    self._versions = json.load(f)
+            except (IOError, OSError, ValueError):
+                pass
+
+    @staticmethod
+    def binary_signature(run_script):
+        """
+        This function describes the executable file so that a reinstall or upgrade invalidates its cache entry
+
+        * run_script: The path to the EnergyPlus executable
+        * Returns: A (resolved path, signature) tuple, where the signature is None if the file does not exist
+        """
+        path = os.path.realpath(run_script)
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return path, None
+        return path, [file_stat.st_size, file_stat.st_mtime]
+
+    def get(self, run_script):
+        """
+        This function looks up the version of an executable without running it
+
+        * run_script: The path to the EnergyPlus executable
+        * Returns: The cached version string, or None if it is unknown or stale
+        """
+        path, signature = VersionCache.binary_signature(run_script)
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._versions.get(path)
+        if entry is None or entry['signature'] != signature:
+            return None
+        return entry['version']
+
+    def probe(self, run_script):
+        """
+        This function runs the executable to get its version, then stores and persists the result
+
+        * run_script: The path to the EnergyPlus executable
+        * Returns: The version string reported by the executable
+        """
+        path, signature = VersionCache.binary_signature(run_script)
+        version = EnergyPlusThread.get_ep_version(run_script)
+        with self._lock:
+            self._versions[path] = {'signature': signature, 'version': version}
+            self._save()
+        return version
+
+    def probe_in_background(self, run_script, callback):
+        """
+        This function probes the executable version on a daemon thread
+
+        * run_script: The path to the EnergyPlus executable
+        * callback: Called with (version) from the background thread once the probe completes, or with None if the
+          executable could not be run
+        * Returns: The started thread
+        """
+        def probe_worker():
+            try:
+                version = self.probe(run_script)
+            except (IOError, OSError):
+                version = None
+            callback(version)
+
+        thread = threading.Thread(target=probe_worker)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _save(self):
+        if self.cache_file_name is None:
+            return
+        try:
+            with open(self.cache_file_name, 'w') as f:
+                json.dump(self._versions, f)
+        except (IOError, OSError):
+            pass
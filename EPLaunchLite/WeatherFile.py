@@ -0,0 +1,278 @@
+import array
+import hashlib
+import os
+
+from ColumnFile import read_columns, write_columns
+from ProgressParser import day_of_year
+
+
+class EPWColumns:
+    """
+    The hourly data fields kept as columns, by name and position in each EPW data record
+    """
+    month = 1
+    day = 2
+    hour = 3
+    dry_bulb = 6
+    dew_point = 7
+    relative_humidity = 8
+    atmospheric_pressure = 9
+    global_horizontal_radiation = 13
+    direct_normal_radiation = 14
+    diffuse_horizontal_radiation = 15
+    wind_direction = 20
+    wind_speed = 21
+
+    @staticmethod
+    def all():
+        return sorted(
+            [(name, position) for name, position in vars(EPWColumns).items() if isinstance(position, int)],
+            key=lambda item: item[1]
+        )
+
+
+class EPWLocation(object):
+    """
+    This class holds the site description from the LOCATION header record of a weather file
+    """
+
+    def __init__(self, fields):
+        fields = list(fields) + [''] * (9 - len(fields))
+        self.city = fields[0]
+        self.state = fields[1]
+        self.country = fields[2]
+        self.source = fields[3]
+        self.wmo = fields[4]
+        self.latitude = _to_float(fields[5])
+        self.longitude = _to_float(fields[6])
+        self.time_zone = _to_float(fields[7])
+        self.elevation = _to_float(fields[8])
+
+    def describe(self):
+        return ', '.join(part for part in (self.city, self.state, self.country) if part and part != '-')
+
+
+def _to_float(text):
+    try:
+        return float(text)
+    except ValueError:
+        return float('nan')
+
+
+def _recorded(values, missing):
+    # leaves out NaN, which marks a field that could not be read, and anything at or above the column's missing marker
+    return [value for value in values if value == value and (missing is None or value < missing)]
+
+
+def _percentile(sorted_values, percent):
+    # nearest rank on an already sorted column, which is how the climatic design conditions are tabulated
+    if not sorted_values:
+        return None
+    rank = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class WeatherFile(object):
+    """
+    This class reads an EPW weather file, loading the header eagerly and the hourly records lazily as columns
+
+    Each column is a flat array of doubles, so summaries are computed with builtin reductions over whole columns
+    rather than record by record.  The first time a file's records are parsed the columns are written to a binary
+    sidecar file in the cache folder; later loads memory-map the sidecar and view the columns in place, which takes a
+    few milliseconds instead of re-parsing the 8760 text records.  The sidecar is only trusted while the weather file
+    size and modified time still match.
+    """
+
+    HeaderRecordCount = 8
+    # EnergyPlus treats these dry bulb values as missing
+    MissingDryBulb = 99.9
+    # the columns with a missing marker; the other columns have no marker that cannot also be a real reading
+    MissingMarkers = {'dry_bulb': MissingDryBulb, 'dew_point': MissingDryBulb}
+
+    def __init__(self, file_path, cache_dir=None):
+        """
+        * file_path: The path to the EPW file
+        * cache_dir: The folder for binary sidecar files, or None to always parse the text records
+        """
+        self.file_path = file_path
+        self.cache_dir = cache_dir
+        self.headers = {}
+        self.location = None
+        self._data_offset = None
+        self._columns = None
+        self._read_header()
+
+    def _read_header(self):
+        with open(self.file_path, 'rb') as f:
+            for _ in range(WeatherFile.HeaderRecordCount):
+                line = f.readline()
+                if not line:
+                    break
+                fields = [field.strip() for field in line.decode('latin-1').split(',')]
+                self.headers[fields[0].upper()] = fields[1:]
+            self._data_offset = f.tell()
+        self.location = EPWLocation(self.headers.get('LOCATION', []))
+
+    def _source_signature(self):
+        file_stat = os.stat(self.file_path)
+        return [file_stat.st_size, file_stat.st_mtime]
+
+    def sidecar_path(self):
+        """
+        This function names the sidecar file for this weather file
+
+        * Returns: The sidecar file path, or None if there is no cache folder
+        """
+        if self.cache_dir is None:
+            return None
+        name = hashlib.sha1(os.path.realpath(self.file_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.columns')
+
+    @property
+    def columns(self):
+        """
+        The hourly data as a dictionary of column name to a sequence of floats, loaded on first access
+        """
+        if self._columns is None:
+            self._columns = self._load_sidecar()
+            if self._columns is None:
+                self._columns = self._parse_records()
+                self._write_sidecar()
+        return self._columns
+
+    def column(self, name):
+        """
+        This function gets one hourly column
+
+        * name: A column name from EPWColumns, such as 'dry_bulb'
+        * Returns: A sequence of floats with one value per record
+        """
+        return self.columns[name]
+
+    def _parse_records(self):
+        fields = EPWColumns.all()
+        columns = dict((name, array.array('d')) for name, _position in fields)
+        last_position = fields[-1][1]
+        with open(self.file_path, 'rb') as f:
+            f.seek(self._data_offset)
+            for line in f:
+                values = line.split(b',')
+                if len(values) <= last_position:
+                    continue
+                for name, position in fields:
+                    try:
+                        columns[name].append(float(values[position]))
+                    except ValueError:
+                        columns[name].append(float('nan'))
+        return columns
+
+    def _write_sidecar(self):
+        sidecar_path = self.sidecar_path()
+        if sidecar_path is None:
+            return
+        try:
+            write_columns(sidecar_path, self._columns, {'source': self._source_signature()})
+        except (IOError, OSError):
+            pass  # the sidecar is only an accelerator, so an unwritable cache folder just means parsing next time
+
+    def _load_sidecar(self):
+        sidecar_path = self.sidecar_path()
+        if sidecar_path is None:
+            return None
+        stored = read_columns(sidecar_path)
+        if stored is None or stored[0] is None or stored[0].get('source') != self._source_signature():
+            return None
+        return stored[1]
+
+    def daily_means(self, name='dry_bulb'):
+        """
+        This function averages a column over each day of the file, leaving out missing hours
+
+        * name: The column name
+        * Returns: A list of daily means, in file order, with None for days that have no valid hours
+        """
+        values = self.column(name)
+        missing = WeatherFile.MissingMarkers.get(name)
+        means = []
+        for day in range(len(values) // 24):
+            recorded = _recorded(values[day * 24:day * 24 + 24], missing)
+            means.append(sum(recorded) / len(recorded) if recorded else None)
+        return means
+
+    def monthly_means(self, name='dry_bulb'):
+        """
+        This function averages a column over each calendar month, leaving out missing hours
+
+        * name: The column name
+        * Returns: A list of twelve means, with None for months that are not in the file or have no valid hours
+        """
+        values = self.column(name)
+        months = self.column('month')
+        missing = WeatherFile.MissingMarkers.get(name)
+        totals = [0.0] * 12
+        counts = [0] * 12
+        for month, value in zip(months, values):
+            index = int(month) - 1
+            if 0 <= index < 12 and _recorded([value], missing):
+                totals[index] += value
+                counts[index] += 1
+        return [totals[i] / counts[i] if counts[i] else None for i in range(12)]
+
+    def degree_days(self, heating_base=18.0, cooling_base=18.0):
+        """
+        This function adds up heating and cooling degree days from the daily mean dry bulb temperature, skipping days
+        without a valid hour
+
+        * heating_base: The heating base temperature in degrees C
+        * cooling_base: The cooling base temperature in degrees C
+        * Returns: A (heating degree days, cooling degree days) tuple
+        """
+        daily = [mean for mean in self.daily_means('dry_bulb') if mean is not None]
+        heating = sum(heating_base - mean for mean in daily if mean < heating_base)
+        cooling = sum(mean - cooling_base for mean in daily if mean > cooling_base)
+        return heating, cooling
+
+    def design_temperatures(self):
+        """
+        This function estimates the annual design dry bulb temperatures from the hourly records
+
+        * Returns: A dictionary with the 99.6% heating and 0.4% cooling dry bulb temperatures in degrees C
+        """
+        values = sorted(_recorded(self.column('dry_bulb'), WeatherFile.MissingDryBulb))
+        return {'heating_99_6': _percentile(values, 0.4), 'cooling_0_4': _percentile(values, 99.6)}
+
+    def data_period_days(self):
+        """
+        This function finds how many days the hourly records span
+
+        * Returns: The number of days
+        """
+        months = self.column('month')
+        days = self.column('day')
+        if not months:
+            return 0
+        first = day_of_year(int(months[0]), int(days[0]))
+        last = day_of_year(int(months[-1]), int(days[-1]))
+        return (last - first) % 365 + 1
+
+    def statistics(self):
+        """
+        This function collects the climate summary shown for a weather file
+
+        * Returns: A dictionary of location, degree day, design temperature and monthly mean statistics
+        """
+        heating, cooling = self.degree_days()
+        design = self.design_temperatures()
+        return {
+            'location': self.location.describe(),
+            'latitude': self.location.latitude,
+            'longitude': self.location.longitude,
+            'elevation': self.location.elevation,
+            'hours': len(self.column('dry_bulb')),
+            'hdd18': round(heating, 1),
+            'cdd18': round(cooling, 1),
+            'heating_99_6': design['heating_99_6'],
+            'cooling_0_4': design['cooling_0_4'],
+            'monthly_mean_dry_bulb': [None if mean is None else round(mean, 2)
+                                      for mean in self.monthly_means('dry_bulb')],
+        }
@@ -0,0 +1,285 @@
+import bisect
+import json
+import math
+import os
+import re
+
+from WeatherFile import EPWLocation
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+# the mean radius of the earth, for great circle distances
+EARTH_RADIUS_KM = 6371.0
+
+
+def great_circle_km(latitude_1, longitude_1, latitude_2, longitude_2):
+    """
+    This function computes the distance between two points on the earth
+
+    * latitude_1, longitude_1: The first point in degrees
+    * latitude_2, longitude_2: The second point in degrees
+    * Returns: The great circle distance in kilometers
+    """
+    phi_1 = math.radians(latitude_1)
+    phi_2 = math.radians(latitude_2)
+    d_phi = phi_2 - phi_1
+    d_lambda = math.radians(longitude_2 - longitude_1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi_1) * math.cos(phi_2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class WeatherStation(object):
+    """
+    This class describes one weather file in the library by the metadata in its LOCATION header
+    """
+
+    # the order of the values in each compact row of the saved index
+    Fields = ['path', 'city', 'state', 'country', 'source', 'wmo', 'latitude', 'longitude', 'time_zone', 'elevation',
+              'size', 'mtime']
+
+    def __init__(self, path, city, state, country, source, wmo, latitude, longitude, time_zone, elevation, size,
+                 mtime):
+        self.path = path
+        self.city = city
+        self.state = state
+        self.country = country
+        self.source = source
+        self.wmo = wmo
+        self.latitude = latitude
+        self.longitude = longitude
+        self.time_zone = time_zone
+        self.elevation = elevation
+        self.size = size
+        self.mtime = mtime
+
+    @staticmethod
+    def from_file(path, file_stat):
+        with open(path, 'rb') as f:
+            fields = [field.strip() for field in f.readline().decode('latin-1').split(',')]
+        if fields[0].upper() != 'LOCATION':
+            return None
+        location = EPWLocation(fields[1:])
+        # json has no nan, so unreadable numbers are kept as None
+        numbers = [None if value != value else value
+                   for value in (location.latitude, location.longitude, location.time_zone, location.elevation)]
+        return WeatherStation(path, location.city, location.state, location.country, location.source, location.wmo,
+                              *(numbers + [file_stat.st_size, file_stat.st_mtime]))
+
+    def to_row(self):
+        return [getattr(self, field) for field in WeatherStation.Fields]
+
+    @staticmethod
+    def from_row(row):
+        return WeatherStation(*row)
+
+    def to_dict(self):
+        return dict(zip(WeatherStation.Fields, self.to_row()))
+
+    def words(self):
+        """
+        This function lists the lower case words a name search matches against
+
+        * Returns: A set of words from the file name, city, state, country and WMO number
+        """
+        text = ' '.join([os.path.splitext(os.path.basename(self.path))[0], self.city, self.state, self.country,
+                         self.wmo])
+        return set(_WORD.findall(text.lower()))
+
+    def describe(self):
+        return ', '.join(part for part in (self.city, self.state, self.country) if part and part != '-')
+
+
+class WeatherLibrary(object):
+    """
+    This class indexes the header metadata of every weather file below a set of library folders
+
+    The index is saved to disk as one compact row per file together with the modified time of every library folder.
+    A refresh walks the folders but only reopens files whose size or modified time changed, so keeping a library of
+    thousands of files current costs little more than listing it.  Once loaded, word, region and latitude lookup
+    tables make name, region and nearest location queries a matter of a few bisections and set operations.
+    """
+
+    IndexVersion = 1
+
+    def __init__(self, index_file_name=None, folders=None):
+        """
+        * index_file_name: The json file used to persist the index, or None to keep the index in memory only
+        * folders: A list of library folders searched recursively for EPW files; a leading '~' is expanded
+        """
+        self.index_file_name = index_file_name
+        self.folders = [os.path.expanduser(folder) for folder in (folders or [])]
+        self._stations = None
+        self._folder_stamps = None
+        self._words = None
+        self._word_list = None
+        self._by_latitude = None
+
+    def _current_folder_stamps(self):
+        stamps = {}
+        for folder in self.folders:
+            for root, _dirs, _files in os.walk(folder):
+                try:
+                    stamps[root] = os.stat(root).st_mtime
+                except OSError:
+                    pass
+        return stamps
+
+    def _load(self):
+        if self.index_file_name is None:
+            return False
+        try:
+            with open(self.index_file_name) as f:
+                data = json.load(f)
+            if data.get('version') != WeatherLibrary.IndexVersion or data.get('fields') != WeatherStation.Fields:
+                return False
+            self._stations = [WeatherStation.from_row(row) for row in data['stations']]
+            self._folder_stamps = data['folders']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return False
+        self._build_lookups()
+        return True
+
+    def _save(self):
+        if self.index_file_name is None:
+            return
+        data = {
+            'version': WeatherLibrary.IndexVersion,
+            'fields': WeatherStation.Fields,
+            'folders': self._folder_stamps,
+            'stations': [station.to_row() for station in self._stations],
+        }
+        temp_path = self.index_file_name + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.rename(temp_path, self.index_file_name)
+        except (IOError, OSError):
+            pass
+
+    def refresh(self):
+        """
+        This function rescans the library folders, rereading only new or changed weather files, and saves the index
+        """
+        if self._stations is None:
+            self._load()
+        known = dict((station.path, station) for station in self._stations or [])
+        stations = []
+        seen = set()
+        for folder in self.folders:
+            for root, dirs, files in os.walk(folder):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if not file_name.lower().endswith('.epw'):
+                        continue
+                    path = os.path.join(root, file_name)
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                    try:
+                        file_stat = os.stat(path)
+                        station = known.get(path)
+                        if station is None or [station.size, station.mtime] != [file_stat.st_size,
+                                                                                 file_stat.st_mtime]:
+                            station = WeatherStation.from_file(path, file_stat)
+                    except (IOError, OSError):
+                        continue
+                    if station is not None:
+                        stations.append(station)
+        self._stations = stations
+        self._folder_stamps = self._current_folder_stamps()
+        self._build_lookups()
+        self._save()
+
+    def _build_lookups(self):
+        self._words = {}
+        for index, station in enumerate(self._stations):
+            for word in station.words():
+                self._words.setdefault(word, set()).add(index)
+        self._word_list = sorted(self._words)
+        located = [(station.latitude, index) for index, station in enumerate(self._stations)
+                   if station.latitude is not None and station.longitude is not None]
+        self._by_latitude = sorted(located)
+
+    def stations(self):
+        """
+        This function lists every indexed weather file, loading the saved index or rescanning when it is stale
+
+        * Returns: A list of WeatherStation instances
+        """
+        if self._stations is None:
+            if not self._load() or self._folder_stamps != self._current_folder_stamps():
+                self.refresh()
+        return list(self._stations)
+
+    def _matching_word(self, prefix):
+        matches = set()
+        position = bisect.bisect_left(self._word_list, prefix)
+        while position < len(self._word_list) and self._word_list[position].startswith(prefix):
+            matches |= self._words[self._word_list[position]]
+            position += 1
+        return matches
+
+    def search(self, text, limit=50):
+        """
+        This function finds weather files by name
+
+        * text: One or more words; every word must start a word of the file name, city, state, country or WMO number
+        * limit: The maximum number of results, or None for all of them
+        * Returns: A list of matching WeatherStation instances, sorted by description
+        """
+        self.stations()
+        words = _WORD.findall(text.lower())
+        if not words:
+            return []
+        indexes = None
+        for word in words:
+            matches = self._matching_word(word)
+            indexes = matches if indexes is None else indexes & matches
+            if not indexes:
+                return []
+        found = sorted((self._stations[index] for index in indexes), key=lambda station: station.describe())
+        return found if limit is None else found[:limit]
+
+    def in_region(self, country=None, state=None, limit=None):
+        """
+        This function finds weather files by region
+
+        * country: A country code or name such as 'USA', or None for any country
+        * state: A state or province code such as 'IL', or None for any state
+        * limit: The maximum number of results, or None for all of them
+        * Returns: A list of matching WeatherStation instances, sorted by description
+        """
+        found = [station for station in self.stations()
+                 if (country is None or station.country.lower() == country.lower()) and
+                 (state is None or station.state.lower() == state.lower())]
+        found.sort(key=lambda station: station.describe())
+        return found if limit is None else found[:limit]
+
+    def nearest(self, latitude, longitude, count=5):
+        """
+        This function finds the weather files closest to a location
+
+        * latitude: The latitude in degrees
+        * longitude: The longitude in degrees
+        * count: The number of results
+        * Returns: A list of (distance in km, WeatherStation) tuples, closest first
+        """
+        self.stations()
+        if not self._by_latitude:
+            return []
+        km_per_degree = math.pi * EARTH_RADIUS_KM / 180.0
+        # every station outside a latitude band is at least as far away as the band is wide, so widen the band
+        # until it holds enough stations that are closer than its edge
+        band = 1.0
+        while True:
+            low = bisect.bisect_left(self._by_latitude, (latitude - band,))
+            high = bisect.bisect_right(self._by_latitude, (latitude + band, len(self._stations)))
+            distances = []
+            for _latitude, index in self._by_latitude[low:high]:
+                station = self._stations[index]
+                distances.append((great_circle_km(latitude, longitude, station.latitude, station.longitude), index))
+            distances.sort()
+            close_enough = [entry for entry in distances if entry[0] <= band * km_per_degree]
+            if len(close_enough) >= count or high - low == len(self._by_latitude) or band >= 180.0:
+                return [(distance, self._stations[index]) for distance, index in distances[:count]]
+            band *= 2
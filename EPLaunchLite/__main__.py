@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the package modules import each other by bare module name, so put the package folder itself on the path
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from CommandLine import main  # noqa: E402
+
+sys.exit(main())
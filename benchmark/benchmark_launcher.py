@@ -0,0 +1,304 @@
+"""
+This script benchmarks the overhead of the launcher itself, running a stub in place of EnergyPlus
+
+It measures how long a job takes to get going, how many jobs per second the queue gets through at several
+concurrency levels, how much the launcher's own memory grows while a simulation floods stdout, and how long
+cancelling takes.  The results are written as json, and an earlier result file can be given to compare against:
+
+    python benchmark/benchmark_launcher.py --output results.json
+    python benchmark/benchmark_launcher.py --compare results.json
+
+Only a posix shell and python are needed, no EnergyPlus installation.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+# add the source directory to the path, the same way the unit tests find it
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'EPLaunchLite'))
+
+from EnergyPlusThread import EnergyPlusThread  # noqa: E402
+from SimulationQueue import SimulationQueue  # noqa: E402
+
+STUB_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'stub_energyplus.py')
+
+# the number of repetitions or jobs for each benchmark, in full and in quick mode
+FULL_SIZES = {'latency_runs': 20, 'throughput_jobs': 32, 'concurrency': [1, 2, 4, 8], 'stdout_lines': 200000,
+              'cancel_runs': 10}
+QUICK_SIZES = {'latency_runs': 3, 'throughput_jobs': 4, 'concurrency': [1, 2], 'stdout_lines': 5000,
+               'cancel_runs': 2}
+
+
+def make_stub(folder):
+    """
+    This function writes an EnergyPlus executable into a folder that runs the stub script
+
+    * folder: The folder to write the executable into
+    * Returns: The path to the executable
+    """
+    script = os.path.join(folder, 'EnergyPlus')
+    with open(script, 'w') as f:
+        # exec, so the stub keeps the pid the launcher started, just as EnergyPlus itself would
+        f.write('#!/bin/sh\nexec "%s" "%s" "$@"\n' % (sys.executable, STUB_SCRIPT))
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    return script
+
+
+def configure_stub(**settings):
+    """
+    This function sets the stub environment variables inherited by every simulation started afterwards
+
+    * settings: The stub settings, such as lines=1000 or sleep=0.5, replacing all earlier settings
+    """
+    for name in [name for name in os.environ if name.startswith('STUB_')]:
+        del os.environ[name]
+    for name, value in settings.items():
+        os.environ['STUB_' + name.upper()] = str(value)
+
+
+def summarize(values):
+    """
+    This function reduces a list of measurements to the statistics that are compared between runs
+
+    * values: A list of numbers
+    * Returns: A dictionary with the count, mean, median, min and max
+    """
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2.0
+    return {'count': len(ordered), 'mean': sum(ordered) / float(len(ordered)), 'median': median,
+            'min': ordered[0], 'max': ordered[-1]}
+
+
+def stub_start_time(message):
+    if message.startswith('STUB START '):
+        return float(message.split()[2])
+    return None
+
+
+def current_rss():
+    """
+    This function reads the resident memory of this process
+
+    * Returns: The number of bytes, or None if it cannot be read on this platform
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+def benchmark_dispatch_latency(folder, run_script, runs):
+    """
+    This function times a zero-work job from submission until its process runs, prints, and finishes
+
+    * Returns: A dictionary of summaries, in seconds
+    """
+    configure_stub(lines=1, output_kb=1)
+    process_start, first_output, complete = [], [], []
+    for run in range(runs):
+        seen = {}
+
+        def message(job, text):
+            if 'started' not in seen:
+                started = stub_start_time(text)
+                if started is not None:
+                    seen['started'], seen['received'] = started, time.time()
+        queue = SimulationQueue(run_script, max_workers=1, msg_callback=message)
+        submitted = time.time()
+        queue.submit(os.path.join(folder, 'latency%d.idf' % run), 'w.epw')
+        queue.wait()
+        finished = time.time()
+        process_start.append(seen['started'] - submitted)
+        first_output.append(seen['received'] - submitted)
+        complete.append(finished - submitted)
+    return {
+        'process_start_seconds': summarize(process_start),
+        'first_output_seconds': summarize(first_output),
+        'complete_seconds': summarize(complete),
+    }
+
+
+def benchmark_throughput(folder, run_script, job_count, concurrency_levels):
+    """
+    This function measures how many short jobs per second the queue completes at each concurrency level
+
+    * Returns: A dictionary keyed by the concurrency level
+    """
+    configure_stub(lines=200, output_kb=16)
+    results = {}
+    for workers in concurrency_levels:
+        queue = SimulationQueue(run_script, max_workers=workers)
+        started = time.time()
+        queue.submit_many([(os.path.join(folder, 'throughput%d_%d.idf' % (workers, i)), 'w.epw')
+                           for i in range(job_count)])
+        queue.wait()
+        elapsed = time.time() - started
+        results[str(workers)] = {'jobs': job_count, 'seconds': elapsed, 'jobs_per_second': job_count / elapsed}
+    return results
+
+
+def benchmark_stdout_memory(folder, run_script, line_count):
+    """
+    This function measures how much the launcher's memory grows while a single simulation floods stdout
+
+    * Returns: A dictionary with the line rate and the memory growth in bytes
+    """
+    configure_stub(lines=line_count, line_length=120, output_kb=1)
+    baseline = current_rss()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.01):
+            peak[0] = max(peak[0], current_rss())
+    sampler = None
+    if baseline is not None:
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+    finished = threading.Event()
+    thread = EnergyPlusThread(run_script, os.path.join(folder, 'stdout.idf'), 'w.epw', lambda text: None,
+                              lambda std_out, run_dir, metrics: finished.set(),
+                              lambda std_out, run_dir, metrics: finished.set(), finished.set)
+    started = time.time()
+    thread.start()
+    thread.join()
+    elapsed = time.time() - started
+    done.set()
+    if sampler is not None:
+        sampler.join()
+    return {
+        'lines': line_count,
+        'seconds': elapsed,
+        'lines_per_second': line_count / elapsed,
+        'rss_growth_bytes': None if baseline is None else peak[0] - baseline,
+    }
+
+
+def benchmark_cancel_latency(folder, run_script, runs, ignore_term):
+    """
+    This function times how long a running simulation takes to be gone after it is cancelled
+
+    * ignore_term: True to have the stub ignore SIGTERM, so every cancel has to escalate to SIGKILL
+    * Returns: A dictionary of summaries, in seconds
+    """
+    configure_stub(lines=1, sleep=60, ignore_term=int(ignore_term))
+    latencies = []
+    for run in range(runs):
+        running = threading.Event()
+        cancelled = threading.Event()
+        thread = EnergyPlusThread(run_script, os.path.join(folder, 'cancel%d.idf' % run), 'w.epw',
+                                  lambda text: stub_start_time(text) is not None and running.set(), None, None,
+                                  cancelled.set)
+        thread.start()
+        running.wait(10)
+        requested = time.time()
+        thread.stop(wait=True)
+        cancelled.wait(10)
+        latencies.append(time.time() - requested)
+        thread.join()
+    return {'terminate_timeout_seconds': EnergyPlusThread.TerminateTimeout if ignore_term else None,
+            'cancel_seconds': summarize(latencies)}
+
+
+def run_benchmarks(sizes):
+    """
+    This function runs every benchmark
+
+    * sizes: FULL_SIZES or QUICK_SIZES
+    * Returns: A json serializable dictionary of the results, with details of the machine they were measured on
+    """
+    folder = tempfile.mkdtemp()
+    saved_timeout = EnergyPlusThread.TerminateTimeout
+    try:
+        run_script = make_stub(folder)
+        results = {
+            'dispatch_latency': benchmark_dispatch_latency(folder, run_script, sizes['latency_runs']),
+            'throughput': benchmark_throughput(folder, run_script, sizes['throughput_jobs'], sizes['concurrency']),
+            'stdout_memory': benchmark_stdout_memory(folder, run_script, sizes['stdout_lines']),
+            'cancel_latency': benchmark_cancel_latency(folder, run_script, sizes['cancel_runs'], False),
+        }
+        # a short timeout keeps the escalation benchmark quick, and the time beyond it is the cost of escalating
+        EnergyPlusThread.TerminateTimeout = 0.5
+        results['cancel_latency_escalated'] = benchmark_cancel_latency(folder, run_script, sizes['cancel_runs'], True)
+    finally:
+        EnergyPlusThread.TerminateTimeout = saved_timeout
+        configure_stub()
+        shutil.rmtree(folder)
+    return {
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': multiprocessing.cpu_count(),
+        },
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'benchmarks': results,
+    }
+
+
+def flatten(values, prefix=''):
+    """
+    This function flattens nested result dictionaries into dotted names, keeping only the numbers
+
+    * values: A dictionary of results
+    * Returns: A dictionary of dotted name to number
+    """
+    flat = {}
+    for name, value in values.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + name] = value
+    return flat
+
+
+def format_comparison(baseline, current):
+    """
+    This function lists how every measurement changed from a baseline result
+
+    * baseline: An earlier result dictionary from run_benchmarks
+    * current: The new result dictionary
+    * Returns: The comparison as text, one measurement per line
+    """
+    old, new = flatten(baseline['benchmarks']), flatten(current['benchmarks'])
+    lines = []
+    for name in sorted(set(old) & set(new)):
+        if old[name]:
+            change = '%+.1f%%' % (100.0 * (new[name] - old[name]) / old[name])
+        else:
+            change = 'n/a'
+        lines.append('%s: %.6g -> %.6g (%s)' % (name, old[name], new[name], change))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the EP-Launch-Lite launcher with a stub EnergyPlus")
+    parser.add_argument('--output', '-o', help="file to write the json results to, instead of stdout")
+    parser.add_argument('--compare', help="earlier json results to compare against, written to stderr")
+    parser.add_argument('--quick', action='store_true', help="run far fewer repetitions, as a smoke test")
+    args = parser.parse_args(argv)
+    results = run_benchmarks(QUICK_SIZES if args.quick else FULL_SIZES)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            sys.stderr.write(format_comparison(json.load(f), results) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+This script stands in for the EnergyPlus executable when benchmarking the launcher, so no installation is needed
+
+It accepts the same command line as EnergyPlus and is configured through environment variables, which the launcher
+passes through to every simulation it starts:
+
+* STUB_LINES: The number of lines written to stdout, default 100
+* STUB_LINE_LENGTH: The length of each line, default 80
+* STUB_SLEEP: Seconds to sleep before exiting, default 0
+* STUB_CPU: Seconds of CPU to burn before exiting, default 0
+* STUB_OUTPUT_KB: Kilobytes of eso output to write into the run directory, default 64
+* STUB_IGNORE_TERM: 1 to ignore SIGTERM, so cancelling has to escalate to SIGKILL
+* STUB_EXIT_CODE: The exit code, default 0
+
+The first line written is 'STUB START <time>', the wall clock time at which the stub began running.
+"""
+
+import os
+import signal
+import sys
+import time
+
+
+def setting(name, default):
+    return type(default)(os.environ.get('STUB_' + name, default))
+
+
+def main(argv):
+    start = time.time()
+    if setting('IGNORE_TERM', 0):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    run_dir, prefix = '.', 'eplus'
+    for flag, value in zip(argv, argv[1:]):
+        if flag == '-d':
+            run_dir = value
+        elif flag == '-p':
+            prefix = value
+    sys.stdout.write('STUB START %.6f\n' % start)
+    sys.stdout.flush()
+
+    line_count = setting('LINES', 100)
+    line_length = setting('LINE_LENGTH', 80)
+    for i in range(line_count):
+        # mostly the progress lines a real run prints, padded out to the configured length
+        month, day = divmod(i * 365 // max(line_count, 1), 31)
+        line = 'Continuing Simulation at %02d/%02d for RUN PERIOD 1' % (month % 12 + 1, day + 1)
+        sys.stdout.write(line.ljust(line_length, '.')[:line_length] + '\n')
+    sys.stdout.flush()
+
+    cpu_seconds = setting('CPU', 0.0)
+    deadline = time.time() + cpu_seconds
+    count = 0
+    while time.time() < deadline:
+        count += 1
+    time.sleep(setting('SLEEP', 0.0))
+
+    if not os.path.isdir(run_dir):
+        os.makedirs(run_dir)
+    row = b'2,1.2345678,2.3456789,3.4567890,4.5678901,5.6789012\n'
+    with open(os.path.join(run_dir, prefix + 'out.eso'), 'wb') as f:
+        f.write(row * (setting('OUTPUT_KB', 64) * 1024 // len(row)))
+    with open(os.path.join(run_dir, prefix + 'out.err'), 'w') as f:
+        f.write('Program Version,EnergyPlus, Version 9.0.1-stub\n')
+        f.write('   ************* EnergyPlus Completed Successfully-- 0 Warning; 0 Severe Errors\n')
+    sys.stdout.write('EnergyPlus Completed Successfully\n')
+    return setting('EXIT_CODE', 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
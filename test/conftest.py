@@ -0,0 +1,4 @@
+import sys
+
+# async syntax is a SyntaxError before python 3.6, so the asyncio runner tests are not even collected there
+collect_ignore = [] if sys.version_info >= (3, 6) else ['test_async_runner.py']
@@ -0,0 +1,96 @@
+"""
+The asyncio runner tests, kept apart from test_base because async syntax cannot even be parsed before python 3.6
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# the helpers are used through the module, so importing them does not collect the test_base tests a second time here
+import test_base
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'EPLaunchLite'))
+
+from AsyncRunner import AsyncSimulation, run_many
+from RunDirectories import RunDirectoryAllocator
+from SimulationQueue import JobStatus
+
+
+@unittest.skipIf(os.name == 'nt', "The asyncio runner tests use a posix shell")
+class TestAsyncRunner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_lines_progress_and_result(self):
+        script = test_base.make_stub_energyplus(self.temp_dir, '\n'.join([
+            'echo "Starting Simulation at 01/01 for RUN PERIOD 1"',
+            'echo "Continuing Simulation at 07/02 for RUN PERIOD 1"',
+            'echo oops >&2',
+        ]))
+        simulation = AsyncSimulation(script, os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+        lines, percents = [], []
+
+        async def collect(iterator, values, convert):
+            async for value in iterator:
+                values.append(convert(value))
+
+        async def scenario():
+            results = await asyncio.gather(simulation.run(), collect(simulation.lines(), lines, str),
+                                           collect(simulation.progress(), percents, lambda p: p.percent))
+            return results[0]
+        job = self.loop.run_until_complete(scenario())
+        self.assertEqual(job.status, JobStatus.Succeeded)
+        self.assertEqual(job.std_out.splitlines()[-1], 'Continuing Simulation at 07/02 for RUN PERIOD 1')
+        self.assertIn('oops', lines)
+        self.assertAlmostEqual(percents[-1], 100.0 * 182 / 365)
+        self.assertEqual(job.metrics.return_code, 0)
+        self.assertEqual(job.to_dict()['metrics']['return_code'], 0)
+
+    def test_task_cancellation_reclaims_the_group(self):
+        pid_file = os.path.join(self.temp_dir, 'child.pid')
+        script = test_base.make_stub_energyplus(self.temp_dir,
+                                                'sleep 30 &\necho $! > %s\necho running\nwait' % pid_file)
+        simulation = AsyncSimulation(script, os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+
+        async def scenario():
+            lines = simulation.lines()
+            task = asyncio.ensure_future(simulation.run())
+            async for line in lines:
+                if line == 'running':
+                    break
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.loop.run_until_complete(scenario())
+        self.assertEqual(simulation.job.status, JobStatus.Cancelled)
+        self.assertFalse(test_base.TestProcessGroup.running(int(open(pid_file).read())))
+
+    def test_run_many(self):
+        script = test_base.make_stub_energyplus(self.temp_dir, 'case "$*" in *bad*) exit 1;; esac; echo done')
+        simulations = [AsyncSimulation(script, os.path.join(self.temp_dir, name), 'w.epw', job_id=i + 1)
+                       for i, name in enumerate(['a.idf', 'bad.idf', 'c.idf'])]
+        jobs = self.loop.run_until_complete(run_many(simulations, max_concurrent=2))
+        self.assertEqual([job.status for job in jobs], [JobStatus.Succeeded, JobStatus.Failed, JobStatus.Succeeded])
+        self.assertEqual([job.job_id for job in jobs], [1, 2, 3])
+
+    def test_missing_executable_fails_the_job(self):
+        allocator = RunDirectoryAllocator(root=os.path.join(self.temp_dir, 'runs'))
+        simulation = AsyncSimulation(os.path.join(self.temp_dir, 'missing', 'EnergyPlus'),
+                                     os.path.join(self.temp_dir, 'in.idf'), 'w.epw', run_dir_allocator=allocator)
+        with self.assertRaises(OSError):
+            self.loop.run_until_complete(simulation.run())
+        self.assertEqual(simulation.job.status, JobStatus.Failed)
+        self.assertEqual(simulation.job.run_dir, simulation.run_dir)
+        self.assertEqual(allocator._active, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,16 @@
 import os
+import shutil
+import signal
+import sqlite3
+import stat
+import subprocess
 import sys
+import tempfile
+import json
+import math
 import unittest
 import threading
+import time
 
 # add the source directory to the path so the unit test framework can find it
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'EPLaunchLite'))
@@ -11,8 +20,49 @@ try:
     has_gtk = True
 except ImportError as e:
     has_gtk = False
+from CommandLine import ExitCodes, UsageError, main, read_manifest
+from EnergyPlusInstalls import DEFAULT_ROOTS, InstallationIndex, parse_version
 from EnergyPlusPath import EnergyPlusPath
 from EnergyPlusThread import EnergyPlusThread
+from ErrorFileParser import ErrorFileParser, ErrorFileTail, Severity, message_type
+from FileWatcher import FileWatcher, InotifyBackend, watched_files
+from IDFScanner import IDFScanner, preflight_check
+from International import translate
+from ParametricSweep import ParametricSweep, SweepJob, expand_patterns
+from PostProcessing import PostProcessPool, PostProcessStatus, PostProcessTask
+from PreprocessCache import PreprocessCache, macro_dependencies
+from ResourceLimits import ResourceLimits, available_memory
+from ResultCache import ResultCache
+from ResultsFile import ESOFile, Frequency, open_results
+from RunDirectories import RunDirectoryAllocator
+from RunMetrics import RunMetrics, wait_with_metrics
+from RunMode import RunMode, sizing_only_text
+import ProcessGroup
+from ProcessGroup import group_alive, live_group_members, new_group_kwargs, terminate_group
+from ProgressParser import ProgressParser, day_of_year, format_duration
+from SQLResults import ConnectionPool, RunSet, SQLResults, find_sql_file
+from Settings import Keys, load_settings
+from SimulationQueue import JobStatus, SimulationJob, SimulationQueue
+from StreamReader import StreamReader
+from UpdateChannel import UpdateChannel
+from VersionCache import VersionCache
+from WeatherFile import WeatherFile
+from WeatherLibrary import WeatherLibrary, great_circle_km
+
+
+def make_folder(parent, name):
+    folder = os.path.join(parent, name)
+    os.makedirs(folder)
+    return folder
+
+
+def make_stub_energyplus(folder, body='exit 0'):
+    # writes a tiny shell script that stands in for the EnergyPlus executable
+    script = os.path.join(folder, 'EnergyPlus')
+    with open(script, 'w') as f:
+        f.write('#!/bin/sh\n%s\n' % body)
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    return script
 
 
 @unittest.skipIf(not has_gtk, "Cannot run FileTypes tests without gtk")
@@ -55,6 +105,70 @@ class TestEnergyPlusPaths(unittest.TestCase):
         with self.assertRaises(IndexError):
             EnergyPlusPath.get_version_number_from_path('/EnergyPlus-8-1-0')
 
+    def test_latest_version_compares_numerically(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for version in ('8-9-0', '9-0-1', '10-1-0'):
+                make_stub_energyplus(make_folder(temp_dir, 'EnergyPlus-' + version))
+            self.assertEqual(EnergyPlusPath.get_latest_eplus_version([temp_dir]),
+                             os.path.join(temp_dir, 'EnergyPlus-10-1-0'))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_latest_version_when_nothing_installed(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            self.assertIsNone(EnergyPlusPath.get_latest_eplus_version([temp_dir]))
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+@unittest.skipIf(os.name != 'posix', "Stub EnergyPlus scripts require a posix shell")
+class TestInstallationIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.roots = [make_folder(self.temp_dir, 'usr_local'), make_folder(self.temp_dir, 'opt')]
+        self.index_file = os.path.join(self.temp_dir, 'installs.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_version(self):
+        self.assertEqual(parse_version('EnergyPlus-8-6-0'), (8, 6, 0))
+        self.assertEqual(parse_version('EnergyPlusV9-0-1'), (9, 0, 1))
+        self.assertEqual(parse_version('EnergyPlus, Version 9.0.1-bd2bcd8b1e, YMD=2018.12.19'), (9, 0, 1))
+        self.assertEqual(parse_version('8.6'), (8, 6, 0))
+        self.assertIsNone(parse_version('EnergyPlus'))
+
+    def test_discovery_across_roots(self):
+        make_stub_energyplus(make_folder(self.roots[0], 'EnergyPlus-9-0-1'))
+        make_stub_energyplus(make_folder(self.roots[1], 'EnergyPlus'), 'echo "EnergyPlus, Version 10.1.0-abc"')
+        make_folder(self.roots[1], 'EnergyPlus-7-2-0')  # no executable, so not an installation
+        index = InstallationIndex(self.index_file, self.roots)
+        self.assertEqual([install.version for install in index.installs()], [(9, 0, 1), (10, 1, 0)])
+        self.assertEqual(index.latest().path, os.path.join(self.roots[1], 'EnergyPlus'))
+        self.assertEqual(index.find_version('9-0-1').version_string, '9-0-1')
+        self.assertEqual(index.find_version((10,)).version, (10, 1, 0))
+        self.assertIsNone(index.find_version('8-6-0'))
+
+    def test_saved_index_invalidated_by_root_changes(self):
+        make_stub_energyplus(make_folder(self.roots[0], 'EnergyPlus-9-0-1'))
+        self.assertEqual(len(InstallationIndex(self.index_file, self.roots).installs()), 1)
+        # removing the executable inside the installation leaves the root untouched, so the saved index is reused
+        os.remove(os.path.join(self.roots[0], 'EnergyPlus-9-0-1', 'EnergyPlus'))
+        self.assertEqual(len(InstallationIndex(self.index_file, self.roots).installs()), 1)
+        # now a new installation folder changes the root mtime, forcing a rescan
+        make_stub_energyplus(make_folder(self.roots[0], 'EnergyPlus-9-1-0'))
+        os.utime(self.roots[0], (time.time() + 10, time.time() + 10))
+        self.assertEqual([i.version for i in InstallationIndex(self.index_file, self.roots).installs()], [(9, 1, 0)])
+
+    def test_default_roots_leave_out_the_home_folder(self):
+        self.assertNotIn('~', DEFAULT_ROOTS)
+        settings_file = os.path.join(self.temp_dir, 'settings.json')
+        with open(settings_file, 'w') as f:
+            json.dump({Keys.install_roots: DEFAULT_ROOTS + ['~']}, f)
+        self.assertEqual(load_settings(settings_file)[Keys.install_roots], DEFAULT_ROOTS)
+
 
 class TestEnergyPlusThread(unittest.TestCase):
     def test_construction(self):
@@ -66,6 +180,1656 @@ class TestEnergyPlusThread(unittest.TestCase):
         self.assertTrue(obj.weather_file, paths[2])
 
 
+SAMPLE_ERR = """Program Version,EnergyPlus, Version 8.6.0-198c6a3cff, YMD=2016.10.18 14:25,
+   ** Warning ** GetSurfaceData: Surface="WALL 1" has a very small area
+   **   ~~~   ** Area=0.001 m2
+   ** Warning ** GetSurfaceData: Surface="WALL 2" has a very small area
+   **   ~~~   ** Area=0.002 m2
+   ** Warning ** GetSurfaceData: Surface="WALL 1" has a very small area
+   **   ~~~   ** Area=0.001 m2
+   ** Warning ** CheckWarmupConvergence: Loads Initialization, Zone="CORE" did not converge after 25 warmup days.
+   **  Severe  ** Node connection error for Node=SUPPLY OUTLET
+   **  Fatal  ** Preceding condition causes termination.
+   ************* EnergyPlus Terminated--Fatal Error Detected. 4 Warning; 1 Severe Errors; Elapsed Time=00hr 00min 0.5sec
+"""
+
+
+class TestErrorFileParser(unittest.TestCase):
+    def test_parse_lines(self):
+        parser = ErrorFileParser()
+        for line in SAMPLE_ERR.splitlines():
+            parser.parse_line(line)
+        parser.finish()
+        self.assertEqual(parser.counts, {Severity.Warning: 4, Severity.Severe: 1, Severity.Fatal: 1})
+        self.assertEqual(len(parser.entries), 5)
+        self.assertEqual(parser.entries[0].count, 2)
+        self.assertEqual(parser.entries[0].continuations, ['Area=0.001 m2'])
+        self.assertEqual([entry.count for entry in parser.by_object['WALL 1']], [2])
+        self.assertEqual(parser.by_object['SUPPLY OUTLET'][0].severity, Severity.Severe)
+        self.assertTrue(parser.final_status.startswith('EnergyPlus Terminated'))
+        types = parser.message_types()
+        self.assertEqual(types[0][0], Severity.Fatal)
+        self.assertEqual(types[2], (Severity.Warning, 'GetSurfaceData: Surface=* has a very small area', 3, 2))
+        self.assertIn('Fatal x1: Preceding condition', parser.format_summary(max_types=1))
+
+    def test_message_type(self):
+        self.assertEqual(message_type('Node connection error for Node=SUPPLY OUTLET, value 2.5e3'),
+                         'Node connection error for Node=*, value #')
+
+    def test_tail_growing_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            err_file = os.path.join(temp_dir, 'eplusout.err')
+            tail = ErrorFileTail(err_file, poll_interval=0.01)
+            tail.start()
+            lines = SAMPLE_ERR.splitlines(True)
+            with open(err_file, 'w') as f:
+                for line in lines[:4]:
+                    f.write(line)
+                f.flush()
+                time.sleep(0.05)
+                # leave a partial line behind to make sure it is not parsed until it is complete
+                f.write(lines[4][:10])
+                f.flush()
+                time.sleep(0.05)
+                f.write(lines[4][10:])
+                for line in lines[5:]:
+                    f.write(line)
+            tail.stop()
+            tail.join()
+            self.assertEqual(tail.parser.counts[Severity.Warning], 4)
+            self.assertEqual(tail.parser.line_count, len(lines))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_thread_parses_error_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            script = make_stub_energyplus(temp_dir, '\n'.join([
+                'while [ $# -gt 0 ]; do case $1 in -d) d=$2;; -p) p=$2;; esac; shift; done',
+                'mkdir -p "$d"',
+                'echo "   ** Warning ** Something odd" > "$d/${p}out.err"',
+            ]))
+            for name in ('in.idf', 'w.epw'):
+                open(os.path.join(temp_dir, name), 'w').close()
+            results = []
+            thread = EnergyPlusThread(script, os.path.join(temp_dir, 'in.idf'), os.path.join(temp_dir, 'w.epw'),
+                                      lambda message: None,
+                                      lambda std_out, run_dir, metrics: results.append(run_dir), None, None)
+            thread.start()
+            thread.join()
+            self.assertEqual(len(results), 1)
+            self.assertEqual(thread.error_report.counts[Severity.Warning], 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @unittest.skipIf(not hasattr(os, 'wait4'), "Resource accounting needs wait4")
+    def test_thread_measures_resources(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # the busy loop runs in a child shell, so its CPU time only shows up if descendants are counted
+            script = make_stub_energyplus(temp_dir, '\n'.join([
+                'while [ $# -gt 0 ]; do case $1 in -d) d=$2;; esac; shift; done',
+                'mkdir -p "$d"',
+                'sh -c \'i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done\'',
+                'exit 3',
+            ]))
+            results = []
+            thread = EnergyPlusThread(script, os.path.join(temp_dir, 'in.idf'), 'w.epw', lambda message: None, None,
+                                      lambda std_out, run_dir, metrics: results.append(metrics), None)
+            thread.start()
+            thread.join()
+            metrics = results[0]
+            self.assertEqual(metrics.return_code, 3)
+            self.assertEqual(thread.p.returncode, 3)
+            self.assertGreater(metrics.cpu_time, 0)
+            self.assertGreater(metrics.peak_rss_bytes, 0)
+            saved = RunMetrics.read(thread.run_dir)
+            self.assertEqual(saved.to_dict(), metrics.to_dict())
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+@unittest.skipIf(os.name == 'nt', "Process group tests use a posix shell")
+class TestProcessGroup(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def running(pid):
+        if os.path.isdir('/proc/self'):
+            try:
+                with open('/proc/%d/stat' % pid) as f:
+                    return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+            except (IOError, OSError):
+                return False
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def test_cancel_reaches_wrapper_children(self):
+        pid_file = os.path.join(self.temp_dir, 'child.pid')
+        script = make_stub_energyplus(self.temp_dir, 'sleep 30 &\necho $! > %s\nwait' % pid_file)
+        cancelled = threading.Event()
+        thread = EnergyPlusThread(script, os.path.join(self.temp_dir, 'in.idf'), 'w.epw', lambda message: None,
+                                  None, None, cancelled.set)
+        thread.start()
+        while not os.path.exists(pid_file) or not open(pid_file).read().strip():
+            time.sleep(0.01)
+        child = int(open(pid_file).read())
+        self.assertTrue(self.running(child))
+        thread.stop(wait=True)
+        self.assertFalse(self.running(child))
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(cancelled.is_set())
+
+    def test_escalates_to_kill(self):
+        process = subprocess.Popen(['sh', '-c', 'trap "" TERM; sleep 30 & wait'], **new_group_kwargs())
+        time.sleep(0.2)
+        self.assertTrue(terminate_group(process, timeout=0.2, reap=True))
+        if os.path.isdir('/proc/self'):
+            self.assertEqual(live_group_members(process.pid), [])
+        self.assertEqual(process.wait(), -signal.SIGKILL)
+
+    @unittest.skipIf(not hasattr(os, 'wait4'), "Resource usage needs wait4")
+    def test_leader_is_left_for_its_waiter_without_proc(self):
+        has_proc = ProcessGroup.HAS_PROC
+        ProcessGroup.HAS_PROC = False
+        try:
+            process = subprocess.Popen(['sh', '-c', 'exit 3'], **new_group_kwargs())
+            time.sleep(0.2)
+            # the exited leader still holds its group until it is reaped, which the check leaves to the waiter
+            self.assertTrue(group_alive(process))
+            self.assertIsNone(process.returncode)
+            metrics = wait_with_metrics(process, time.time())
+            self.assertEqual(metrics.return_code, 3)
+            self.assertIsNotNone(metrics.user_time)
+            self.assertFalse(group_alive(process))
+            process = subprocess.Popen(['sh', '-c', 'exit 0'], **new_group_kwargs())
+            time.sleep(0.2)
+            self.assertFalse(group_alive(process, reap=True))
+            self.assertEqual(process.returncode, 0)
+        finally:
+            ProcessGroup.HAS_PROC = has_proc
+
+
+@unittest.skipIf(os.name != 'posix', "Stub preprocessing tools require a posix shell")
+class TestPreprocessCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.install_dir = make_folder(self.temp_dir, 'EnergyPlus-9-0-1')
+        # the stub engine reports the input file and flags it was given
+        self.run_script = make_stub_energyplus(self.install_dir, 'echo "$@"')
+        self.counter = os.path.join(self.temp_dir, 'expansions')
+        self.make_tool('ExpandObjects',
+                       'echo x >> %s\n{ cat in.idf; echo "! expanded"; } > expanded.idf' % self.counter)
+        self.make_tool('EPMacro', 'cp in.imf out.idf')
+        open(os.path.join(self.install_dir, 'Energy+.idd'), 'w').close()
+        self.cache = PreprocessCache(os.path.join(self.temp_dir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_tool(self, name, body):
+        tool = os.path.join(self.install_dir, name)
+        with open(tool, 'w') as f:
+            f.write('#!/bin/sh\n%s\n' % body)
+        os.chmod(tool, os.stat(tool).st_mode | stat.S_IEXEC)
+
+    def write_input(self, name, text):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def expansion_count(self):
+        if not os.path.exists(self.counter):
+            return 0
+        with open(self.counter) as f:
+            return len(f.readlines())
+
+    def simulate(self, input_file, messages=None):
+        results = []
+        thread = EnergyPlusThread(self.run_script, input_file, 'w.epw',
+                                  lambda message: None if messages is None else messages.append(message),
+                                  lambda std_out, run_dir, metrics: results.append(std_out), None, None,
+                                  preprocess_cache=self.cache)
+        thread.start()
+        thread.join()
+        return results[0].split()
+
+    def test_expansion_is_reused(self):
+        input_file = self.write_input('model.idf', 'HVACTemplate:Thermostat, T1;\n')
+        arguments = self.simulate(input_file)
+        self.assertNotIn('-x', arguments)
+        self.assertIn('-r', arguments)
+        with open(arguments[-1]) as f:
+            self.assertIn('! expanded', f.read())
+        self.assertEqual(self.simulate(input_file), arguments)
+        self.assertEqual(self.expansion_count(), 1)
+        # a changed input is expanded again
+        self.write_input('model.idf', 'HVACTemplate:Thermostat, T2;\n')
+        self.assertNotEqual(self.simulate(input_file)[-1], arguments[-1])
+        self.assertEqual(self.expansion_count(), 2)
+
+    def test_only_hits_are_reported_as_reused(self):
+        input_file = self.write_input('model.idf', 'HVACTemplate:Thermostat, T1;\n')
+        self.assertEqual(self.cache.expanded_input(input_file, self.run_script)[1], False)
+        path, hit = self.cache.expanded_input(input_file, self.run_script)
+        self.assertTrue(hit)
+        reused = translate("Reusing the expanded input file")
+        first, second = [], []
+        self.simulate(self.write_input('other.idf', 'HVACTemplate:Thermostat, T2;\n'), first)
+        self.simulate(input_file, second)
+        self.assertNotIn(reused, first)
+        self.assertIn(reused, second)
+
+    def test_schedule_files_are_left_to_energyplus(self):
+        input_file = self.write_input('model.idf', 'Schedule:File, Occupancy, Any Number, occupancy.csv, 2;\n')
+        self.assertEqual(self.simulate(input_file)[-3:], ['-w', 'w.epw', input_file])
+        self.assertIn('-x', self.simulate(input_file))
+        self.assertEqual(self.expansion_count(), 1)
+
+    def test_macro_includes_are_part_of_the_key(self):
+        self.write_input('zones.idf', 'Zone, Z1;\n')
+        include_folder = make_folder(self.temp_dir, 'parts')
+        with open(os.path.join(include_folder, 'more.idf'), 'w') as f:
+            f.write('##include zones.idf\n')
+        input_file = self.write_input('model.imf', '##fileprefix parts/\n##include more.idf\n')
+        self.assertEqual([name for name, path in macro_dependencies(input_file)], ['parts/more.idf', 'zones.idf'])
+        first_key = PreprocessCache.key_for(input_file, self.run_script)
+        self.assertIsNotNone(self.cache.expanded_input(input_file, self.run_script)[0])
+        self.write_input('zones.idf', 'Zone, Z2;\n')
+        self.assertNotEqual(PreprocessCache.key_for(input_file, self.run_script), first_key)
+
+    def test_entries_stay_in_the_cache_folder(self):
+        self.assertTrue(os.path.isabs(PreprocessCache('relative-cache').cache_dir))
+        self.assertRaises(ValueError, PreprocessCache, None)
+        self.simulate(self.write_input('model.idf', 'HVACTemplate:Thermostat, T1;\n'))
+        self.assertEqual([os.path.splitext(name)[1] for name in os.listdir(self.cache.cache_dir)], ['.idf'])
+
+    def test_cancel_stops_expansion(self):
+        self.make_tool('ExpandObjects', 'sleep 30')
+        cancelled = threading.Event()
+        thread = EnergyPlusThread(self.run_script, self.write_input('model.idf', 'Zone, Z1;\n'), 'w.epw',
+                                  lambda message: None, None, None, cancelled.set, preprocess_cache=self.cache)
+        started = time.time()
+        thread.start()
+        time.sleep(0.5)
+        thread.stop(wait=True)
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(cancelled.is_set())
+        self.assertLess(time.time() - started, 10)
+
+
+class TestProgressParser(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.parser = ProgressParser(run_period_days=365, clock=lambda: self.now[0])
+
+    def test_day_of_year(self):
+        self.assertEqual(day_of_year(1, 1), 0)
+        self.assertEqual(day_of_year(3, 1), 59)
+        self.assertEqual(day_of_year(12, 31), 364)
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(45), '45s')
+        self.assertEqual(format_duration(725), '12m 05s')
+        self.assertEqual(format_duration(10920), '3h 02m')
+
+    def test_run_period_percent_and_eta(self):
+        progress = self.parser.parse_line('Starting Simulation at 01/01/2017 for RUN PERIOD 1')
+        self.assertEqual(progress.environment, 'RUN PERIOD 1')
+        self.assertIsNone(progress.percent)
+        self.assertIsNone(progress.eta_seconds)
+        self.now[0] = 10.0
+        progress = self.parser.parse_line('Continuing Simulation at 03/01/2017 for RUN PERIOD 1')
+        self.assertAlmostEqual(progress.percent, 100.0 * 59 / 365)
+        self.assertAlmostEqual(progress.days_per_second, 5.9)
+        self.assertAlmostEqual(progress.eta_seconds, (365 - 59) / 5.9)
+        progress = self.parser.parse_line(' EnergyPlus Completed Successfully-- 0 Warning; 0 Severe Errors')
+        self.assertEqual(progress.percent, 100.0)
+
+    def test_design_day_is_indeterminate(self):
+        progress = self.parser.parse_line('Starting Simulation at 07/21 for CHICAGO ANN CLG .4% CONDNS DB=>MWB')
+        self.assertIsNone(progress.percent)
+        self.assertEqual(progress.describe(), 'CHICAGO ANN CLG .4% CONDNS DB=>MWB')
+
+    def test_warmup_iterations(self):
+        self.parser.parse_line('Initializing New Environment Parameters')
+        self.assertEqual(self.parser.parse_line('Warming up {3}').warmup_iteration, 3)
+        self.assertEqual(self.parser.parse_line('Warming up').warmup_iteration, 4)
+        self.assertIn('4', self.parser.progress.describe())
+
+    def test_unrelated_lines(self):
+        self.assertIsNone(self.parser.parse_line('Processing Data Dictionary'))
+        self.assertIsNone(self.parser.parse_line('Continuing Simulation at 03/01 for RUN PERIOD 1'))
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.temp_dir, 'cache'), max_entries=2)
+        self.files = {}
+        for name in ('in.idf', 'w.epw', 'EnergyPlus'):
+            self.files[name] = os.path.join(self.temp_dir, name)
+            with open(self.files[name], 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_run_dir(self, name):
+        run_dir = os.path.join(self.temp_dir, name)
+        os.makedirs(run_dir)
+        with open(os.path.join(run_dir, 'eplusout.err'), 'w') as f:
+            f.write(name)
+        return run_dir
+
+    def key(self, flags=('-r',)):
+        return ResultCache.key_for(self.files['in.idf'], self.files['w.epw'], self.files['EnergyPlus'], flags)
+
+    def test_key_depends_on_contents_and_flags(self):
+        key = self.key()
+        self.assertEqual(key, self.key())
+        self.assertNotEqual(key, self.key(('-r', '-D')))
+        with open(self.files['w.epw'], 'a') as f:
+            f.write('changed')
+        self.assertNotEqual(key, self.key())
+
+    def test_store_and_lookup(self):
+        self.assertIsNone(self.cache.lookup('abc'))
+        self.cache.store('abc', self.make_run_dir('run1'), 'all done')
+        run_dir, std_out = self.cache.lookup('abc')
+        self.assertEqual(std_out, 'all done')
+        self.assertTrue(os.path.exists(os.path.join(run_dir, 'eplusout.err')))
+        # a fresh instance should read the persisted index
+        self.assertIsNotNone(ResultCache(self.cache.cache_dir).lookup('abc'))
+
+    def test_restore_copies_the_entry(self):
+        self.assertIsNone(self.cache.restore('abc', os.path.join(self.temp_dir, 'copy')))
+        self.cache.store('abc', self.make_run_dir('run1'), 'all done')
+        target = os.path.join(self.temp_dir, 'copy')
+        self.assertEqual(self.cache.restore('abc', target), 'all done')
+        with open(os.path.join(target, 'eplusout.err'), 'w') as f:
+            f.write('changed')
+        cached_dir, _std_out = self.cache.lookup('abc')
+        with open(os.path.join(cached_dir, 'eplusout.err')) as f:
+            self.assertEqual(f.read(), 'run1')
+
+    def test_key_depends_on_dependencies(self):
+        schedule_file = os.path.join(self.temp_dir, 'schedule.csv')
+        with open(schedule_file, 'w') as f:
+            f.write('1')
+        dependencies = [('schedule.csv', schedule_file)]
+        key = ResultCache.key_for(self.files['in.idf'], self.files['w.epw'], self.files['EnergyPlus'], ['-r'],
+                                  dependencies=dependencies)
+        self.assertNotEqual(key, self.key())
+        with open(schedule_file, 'w') as f:
+            f.write('2')
+        self.assertNotEqual(ResultCache.key_for(self.files['in.idf'], self.files['w.epw'], self.files['EnergyPlus'],
+                                                ['-r'], dependencies=dependencies), key)
+
+    def test_least_recently_used_eviction(self):
+        self.cache.store('a', self.make_run_dir('run1'), '')
+        self.cache.store('b', self.make_run_dir('run2'), '')
+        self.cache.lookup('a')
+        self.cache.store('c', self.make_run_dir('run3'), '')
+        self.assertIsNotNone(self.cache.lookup('a'))
+        self.assertIsNone(self.cache.lookup('b'))
+        self.assertIsNotNone(self.cache.lookup('c'))
+
+    def test_size_eviction(self):
+        cache = ResultCache(os.path.join(self.temp_dir, 'small'), max_bytes=6)
+        cache.store('a', self.make_run_dir('run1'), '')
+        cache.store('b', self.make_run_dir('run2'), '')
+        self.assertIsNone(cache.lookup('a'))
+        self.assertIsNotNone(cache.lookup('b'))
+
+
+SAMPLE_ESO = """Program Version,EnergyPlus, Version 8.6.0-198c6a3cff, YMD=2016.10.18 14:25
+1,5,Environment Title[],Latitude[deg],Longitude[deg],Time Zone[],Elevation[m]
+2,8,Day of Simulation[],Month[],Day of Month[],DST Indicator[1=yes 0=no],Hour[],StartMinute[],EndMinute[],DayType
+3,5,Cumulative Day of Simulation[],Month[],Day of Month[],DST Indicator[1=yes 0=no],DayType  ! When Daily Requested
+7,1,Environment,Site Outdoor Air Drybulb Temperature [C] !Hourly
+8,1,ZONE ONE,Zone Mean Air Temperature [C] !Hourly
+9,1,Electricity:Facility [J] !Daily  [Value,Min,Hour,Minute,Max,Hour,Minute]
+End of Data Dictionary
+1,CHICAGO ANN HTG 99.6% CONDNS DB,  41.98, -87.92,  -6.00, 201.00
+2,1, 1,21, 0, 1, 0.00,60.00,WinterDesignDay
+7,-20.0
+8,21.0
+1,RUN PERIOD 1,  41.98, -87.92,  -6.00, 201.00
+2,1, 1, 1, 0, 1, 0.00,60.00,Sunday
+7,-5.0
+8,20.0
+2,1, 1, 1, 0, 2, 0.00,60.00,Sunday
+7,-6.0
+8,20.5
+3,1, 1, 1, 0,Sunday
+9,1000.0,5.0, 1,60,300.0,13,60
+End of Data
+"""
+
+SAMPLE_CSV = """Date/Time,Environment:Site Outdoor Air Drybulb Temperature [C](Hourly),Electricity:Facility [J](Daily)
+ 01/01  01:00:00,-5.0,
+ 01/01  02:00:00,-6.0,
+ 01/01  24:00:00,-7.0,1000.0
+"""
+
+
+class TestResultsFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.eso = os.path.join(self.temp_dir, 'eplusout.eso')
+        with open(self.eso, 'w') as f:
+            f.write(SAMPLE_ESO)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_dictionary(self):
+        results = open_results(self.eso)
+        self.assertEqual([variable.report_id for variable in results.variables], ['7', '8', '9'])
+        meter = results.find('electricity:facility')[0]
+        self.assertEqual((meter.key, meter.units, meter.frequency), ('', 'J', Frequency.Daily))
+        self.assertEqual(results.find('Zone Mean Air Temperature', key='zone one')[0].label,
+                         'ZONE ONE:Zone Mean Air Temperature [C](Hourly)')
+
+    def test_series(self):
+        results = ESOFile(self.eso)
+        series = results.series(results.find('Zone Mean Air Temperature')[0])
+        self.assertEqual(list(series.values), [21.0, 20.0, 20.5])
+        self.assertEqual(series.timestamp(2), ('RUN PERIOD 1', 1, 1, 2, 60))
+        self.assertEqual(series.in_environment('run period 1'), [20.0, 20.5])
+        daily = results.series('9')
+        self.assertEqual(list(daily.values), [1000.0])
+        self.assertEqual(daily.timestamp(0), ('RUN PERIOD 1', 1, 1, 0, 0))
+        # only the variables asked for are held in memory
+        self.assertEqual(sorted(results._columns), ['8', '9'])
+
+    def test_sidecar(self):
+        open_results(self.eso, self.cache_dir).load(['7', '8'])
+        reopened = open_results(self.eso, self.cache_dir)
+
+        def no_reading(wanted, decode_timestamps):
+            raise AssertionError("the results file should not be read again")
+        reopened._stream = no_reading
+        self.assertEqual(list(reopened.series('7').values), [-20.0, -5.0, -6.0])
+        self.assertEqual(reopened.environments[1], 'RUN PERIOD 1')
+        # a variable without a sidecar of its own is read from the file, reusing the stored timestamps
+        fresh = open_results(self.eso, self.cache_dir)
+        self.assertEqual(list(fresh.series('9').values), [1000.0])
+
+    def test_csv(self):
+        csv_file = os.path.join(self.temp_dir, 'eplusout.csv')
+        with open(csv_file, 'w') as f:
+            f.write(SAMPLE_CSV)
+        results = open_results(csv_file, self.cache_dir)
+        self.assertEqual([variable.frequency for variable in results.variables], [Frequency.Hourly, Frequency.Daily])
+        self.assertEqual(list(results.series('1').values), [-5.0, -6.0, -7.0])
+        daily = results.series('2')
+        self.assertEqual(list(daily.values), [1000.0])
+        self.assertEqual(daily.timestamp(0), ('', 1, 1, 24, 0))
+
+
+def make_sql(run_dir, scale):
+    """
+    This function writes a small eplusout.sql with the parts of the EnergyPlus schema that the queries use
+    """
+    if not os.path.isdir(run_dir):
+        os.makedirs(run_dir)
+    connection = sqlite3.connect(os.path.join(run_dir, 'eplusout.sql'))
+    connection.executescript("""
+        CREATE TABLE EnvironmentPeriods (EnvironmentPeriodIndex INTEGER PRIMARY KEY, SimulationIndex INTEGER,
+                                         EnvironmentName TEXT, EnvironmentType INTEGER);
+        CREATE TABLE Time (TimeIndex INTEGER PRIMARY KEY, Year INTEGER, Month INTEGER, Day INTEGER, Hour INTEGER,
+                           Minute INTEGER, Dst INTEGER, Interval INTEGER, IntervalType INTEGER, SimulationDays INTEGER,
+                           DayType TEXT, EnvironmentPeriodIndex INTEGER, WarmupFlag INTEGER);
+        CREATE TABLE ReportDataDictionary (ReportDataDictionaryIndex INTEGER PRIMARY KEY, IsMeter INTEGER, Type TEXT,
+                                           IndexGroup TEXT, TimestepType TEXT, KeyValue TEXT, Name TEXT,
+                                           ReportingFrequency TEXT, ScheduleName TEXT, Units TEXT);
+        CREATE TABLE ReportData (ReportDataIndex INTEGER PRIMARY KEY, TimeIndex INTEGER,
+                                 ReportDataDictionaryIndex INTEGER, Value REAL);
+        CREATE TABLE TabularDataWithStrings (ReportName TEXT, ReportForString TEXT, TableName TEXT, RowName TEXT,
+                                             ColumnName TEXT, Units TEXT, Value TEXT);
+        INSERT INTO EnvironmentPeriods VALUES (1, 1, 'RUN PERIOD 1', 3);
+        INSERT INTO Time VALUES (1, 2017, 1, 1, 1, 0, 0, 60, 1, 1, 'Sunday', 1, 0);
+        INSERT INTO Time VALUES (2, 2017, 1, 1, 2, 0, 0, 60, 1, 1, 'Sunday', 1, 0);
+        INSERT INTO ReportDataDictionary VALUES (1, 0, 'Avg', 'Zone', 'Zone', 'ZONE ONE', 'Zone Mean Air Temperature',
+                                                 'Hourly', '', 'C');
+        INSERT INTO ReportDataDictionary VALUES (2, 1, 'Sum', 'Facility:Electricity', 'Zone', '',
+                                                 'Electricity:Facility', 'Hourly', '', 'J');
+    """)
+    connection.executemany("INSERT INTO ReportData (TimeIndex, ReportDataDictionaryIndex, Value) VALUES (?, ?, ?)",
+                           [(1, 1, 20.0 * scale), (1, 2, 100.0 * scale), (2, 1, 21.0 * scale), (2, 2, 90.0 * scale)])
+    connection.executemany("INSERT INTO TabularDataWithStrings VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ('AnnualBuildingUtilityPerformanceSummary', 'Entire Facility', 'Site and Source Energy', 'Total Site Energy',
+         'Total Energy', 'GJ', '   %.2f' % (12.5 * scale)),
+        ('AnnualBuildingUtilityPerformanceSummary', 'Entire Facility', 'Site and Source Energy', 'Total Site Energy',
+         'Energy Per Total Building Area', 'MJ/m2', '   %.2f' % (250.0 * scale)),
+    ])
+    connection.commit()
+    connection.close()
+
+
+class TestSQLResults(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pool = ConnectionPool()
+        self.run_dirs = [os.path.join(self.temp_dir, name) for name in ('a', 'b', 'c')]
+        make_sql(self.run_dirs[0], 1.0)
+        make_sql(self.run_dirs[1], 2.0)
+        os.makedirs(self.run_dirs[2])  # a run without sqlite output
+
+    def tearDown(self):
+        self.pool.close_all()
+        shutil.rmtree(self.temp_dir)
+
+    def test_series_and_lazy_index(self):
+        results = SQLResults.for_run_dir(self.run_dirs[0], self.pool)
+        self.assertEqual([variable.label for variable in results.variables()],
+                         ['ZONE ONE:Zone Mean Air Temperature [C](Hourly)', 'Electricity:Facility [J](Hourly)'])
+        series = results.series(results.find('zone mean air temperature', key='Zone One')[0])
+        self.assertEqual(list(series.values), [20.0, 21.0])
+        self.assertEqual(series.timestamp(1), ('RUN PERIOD 1', 1, 1, 2, 0))
+        connection = sqlite3.connect(results.database_path)
+        indexes = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        connection.close()
+        self.assertIn('EPLaunchLiteReportDataByVariable', indexes)
+
+    def test_pooled_connections_are_read_only(self):
+        results = SQLResults.for_run_dir(self.run_dirs[0], self.pool)
+        results.variables()
+        connection = self.pool.acquire(results.database_path)
+        self.assertIsNot(self.pool.acquire(results.database_path), connection)
+        with self.assertRaises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM ReportData")
+        self.pool.release(results.database_path, connection)
+        self.assertIs(self.pool.acquire(results.database_path), connection)
+
+    def test_uri_special_characters(self):
+        run_dir = os.path.join(self.temp_dir, 'run #1?x=1 %20')
+        make_sql(run_dir, 3.0)
+        results = SQLResults.for_run_dir(run_dir, self.pool)
+        self.assertEqual(len(results.variables()), 2)
+
+    def test_read_only_without_uri_support(self):
+        connect = sqlite3.connect
+
+        def connect_without_uri(database, uri=False, **kwargs):
+            if uri:
+                raise TypeError("'uri' is an invalid keyword argument for this function")
+            return connect(database, **kwargs)
+        sqlite3.connect = connect_without_uri
+        try:
+            connection = self.pool.acquire(find_sql_file(self.run_dirs[0]))
+        finally:
+            sqlite3.connect = connect
+        with self.assertRaises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM ReportData")
+        connection.close()
+
+    def test_tabular(self):
+        results = SQLResults.for_run_dir(self.run_dirs[1], self.pool)
+        table = results.tabular('AnnualBuildingUtilityPerformanceSummary', 'Site and Source Energy')
+        self.assertEqual(table['rows'], ['Total Site Energy'])
+        self.assertEqual(table['units'], ['GJ', 'MJ/m2'])
+        self.assertEqual(table['values'], [['25.00', '500.00']])
+        self.assertTrue(math.isnan(results.tabular_value('AnnualBuildingUtilityPerformanceSummary',
+                                                         'Site and Source Energy', 'Missing Row', 'Total Energy')))
+
+    def test_run_set(self):
+        runs = RunSet(self.run_dirs, self.pool)
+        self.assertIsNone(runs.results[2])
+        values = runs.tabular_values('AnnualBuildingUtilityPerformanceSummary', 'Site and Source Energy',
+                                     'Total Site Energy', 'Total Energy')
+        self.assertEqual(list(values[:2]), [12.5, 25.0])
+        self.assertTrue(math.isnan(values[2]))
+        series = runs.series('Electricity:Facility')
+        self.assertEqual([list(s.values) for s in series[:2]], [[100.0, 90.0], [200.0, 180.0]])
+        self.assertIsNone(series[2])
+
+
+class TestRunDirectoryAllocator(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.temp_dir, 'model.idf')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def finished_run(self, allocator, job_id, size=0, age=0):
+        run_dir = allocator.allocate(self.input_file, job_id)
+        with open(os.path.join(run_dir, 'eplusout.err'), 'w') as f:
+            f.write('x' * size)
+        allocator._finish(run_dir)
+        stamp = time.time() - age
+        os.utime(run_dir, (stamp, stamp))
+        return run_dir
+
+    def test_concurrent_allocations_are_unique(self):
+        allocator = RunDirectoryAllocator()
+        run_dirs = []
+        threads = [threading.Thread(target=lambda: run_dirs.append(allocator.allocate(self.input_file)))
+                   for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(run_dirs)), 20)
+        self.assertTrue(all(os.path.dirname(d) == os.path.join(self.temp_dir, 'output-model') for d in run_dirs))
+
+    def test_explicit_job_id_collision(self):
+        allocator = RunDirectoryAllocator(root=os.path.join(self.temp_dir, 'runs'))
+        run_dir = allocator.allocate(self.input_file, 'job1')
+        self.assertEqual(run_dir, os.path.join(self.temp_dir, 'runs', 'model', 'job1'))
+        with self.assertRaises(OSError):
+            allocator.allocate(self.input_file, 'job1')
+
+    @unittest.skipIf(not hasattr(os, 'symlink'), "Latest links require symbolic link support")
+    def test_latest_link_follows_successful_runs(self):
+        allocator = RunDirectoryAllocator()
+        first = allocator.allocate(self.input_file)
+        allocator.release(first).join()
+        second = allocator.allocate(self.input_file)
+        allocator.release(second, succeeded=False).join()
+        latest = os.path.join(allocator.run_root(self.input_file), RunDirectoryAllocator.LatestLinkName)
+        self.assertEqual(os.path.realpath(latest), os.path.realpath(first))
+
+    def test_prune_by_count_keeps_active_runs(self):
+        allocator = RunDirectoryAllocator(keep_runs=2)
+        old = [self.finished_run(allocator, 'run%d' % i, age=100 - i) for i in range(4)]
+        active = allocator.allocate(self.input_file, 'active')
+        deleted = allocator.prune(allocator.run_root(self.input_file))
+        self.assertEqual(sorted(deleted), old[:3])
+        self.assertTrue(os.path.isdir(active))
+        self.assertTrue(os.path.isdir(old[3]))
+
+    def test_prune_keeps_runs_active_in_other_launchers(self):
+        allocator = RunDirectoryAllocator(keep_runs=1)
+        runs = [self.finished_run(allocator, 'run%d' % i, age=100 - i) for i in range(4)]
+        # another launcher in this process is still running the oldest, and a crashed one left a marker behind
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        for run_dir, pid in ((runs[0], os.getpid()), (runs[1], exited.pid)):
+            stamp = os.path.getmtime(run_dir)
+            with open(os.path.join(run_dir, RunDirectoryAllocator.ActiveMarkerName), 'w') as f:
+                f.write(str(pid))
+            os.utime(run_dir, (stamp, stamp))
+        deleted = allocator.prune(allocator.run_root(self.input_file))
+        self.assertEqual(sorted(deleted), runs[1:3])
+        self.assertTrue(os.path.isdir(runs[0]))
+
+    def test_keep_own_runs(self):
+        allocator = RunDirectoryAllocator(keep_runs=1, keep_own_runs=True)
+        older = self.finished_run(RunDirectoryAllocator(), 'older', age=100)
+        runs = [allocator.allocate(self.input_file) for _ in range(3)]
+        for run_dir in runs:
+            allocator.release(run_dir).join()
+            self.assertFalse(os.path.exists(os.path.join(run_dir, RunDirectoryAllocator.ActiveMarkerName)))
+        self.assertTrue(all(os.path.isdir(run_dir) for run_dir in runs))
+        self.assertFalse(os.path.isdir(older))
+
+    def test_prune_by_size(self):
+        allocator = RunDirectoryAllocator(keep_runs=None, max_bytes=250)
+        runs = [self.finished_run(allocator, 'run%d' % i, size=100, age=100 - i) for i in range(4)]
+        allocator.prune(allocator.run_root(self.input_file))
+        self.assertEqual([os.path.isdir(run_dir) for run_dir in runs], [False, False, True, True])
+
+
+SAMPLE_IDF = """
+! a header comment; with a semicolon
+  Version,8.6;               !- Version Identifier
+
+  SimulationControl,
+    Yes,                     !- Do Zone Sizing Calculation
+    No,                      !- Do System Sizing Calculation
+    No,                      !- Do Plant Sizing Calculation
+    Yes,                     !- Run Simulation for Sizing Periods
+    No;                      !- Run Simulation for Weather File Run Periods
+
+  RunPeriod,
+    Summer,                  !- Name
+    6,                       !- Begin Month
+    1,                       !- Begin Day of Month
+    8,                       !- End Month
+    31,                      !- End Day of Month
+    UseWeatherFile;          !- Day of Week for Start Day
+
+  Zone,One;
+  Zone,Two;
+  Zone,Three;
+"""
+
+
+class TestIDFScanner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.idf = os.path.join(self.temp_dir, 'in.idf')
+        with open(self.idf, 'w') as f:
+            f.write(SAMPLE_IDF)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_full_scan(self):
+        summary = IDFScanner(self.idf).scan()
+        self.assertTrue(summary.complete)
+        self.assertEqual(summary.version, (8, 6, 0))
+        self.assertEqual(summary.object_counts, {'version': 1, 'simulationcontrol': 1, 'runperiod': 1, 'zone': 3})
+        self.assertTrue(summary.simulation_control['do_zone_sizing'])
+        self.assertFalse(summary.simulation_control['run_weather_file_periods'])
+        self.assertEqual(summary.run_periods[0]['name'], 'Summer')
+        self.assertEqual(summary.run_period_days(), 92)
+
+    def test_small_chunks(self):
+        scanner = IDFScanner(self.idf)
+        scanner.ChunkSize = 7
+        self.assertEqual(scanner.scan().object_counts['zone'], 3)
+
+    def test_scan_stops_early(self):
+        summary = IDFScanner(self.idf).scan(stop_when=['version'])
+        self.assertFalse(summary.complete)
+        self.assertEqual(summary.version_string, '8.6')
+        self.assertNotIn('zone', summary.object_counts)
+
+    def test_version_nine_run_period(self):
+        with open(self.idf, 'w') as f:
+            f.write('Version,9.0;\nRunPeriod,Annual,1,1,2017,12,31,2017,Sunday;\n')
+        self.assertEqual(IDFScanner(self.idf).scan().run_period_days(), 365)
+
+    def test_preflight_check(self):
+        self.assertIsNone(preflight_check(self.idf, 'EnergyPlus, Version 8.6.0-198c6a3cff, YMD=2016.09.29'))
+        self.assertIsNone(preflight_check(self.idf, None))
+        self.assertIn('8.6', preflight_check(self.idf, 'EnergyPlus, Version 9.0.1-bd2bcd8b1e'))
+        self.assertIsNotNone(preflight_check(os.path.join(self.temp_dir, 'missing.idf'), None))
+        with open(self.idf, 'w') as f:
+            f.write('Zone,One;\n')
+        self.assertIsNotNone(preflight_check(self.idf, None))
+
+
+def make_epw(file_path, temperature):
+    """
+    This function writes a full year weather file whose dry bulb temperature is a function of the month and hour
+    """
+    month_days = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    with open(file_path, 'w') as f:
+        f.write('LOCATION,Testville,ST,USA,TMY3,123456,41.98,-87.92,-6.0,201.0\n')
+        for keyword in ('DESIGN CONDITIONS', 'TYPICAL/EXTREME PERIODS', 'GROUND TEMPERATURES',
+                        'HOLIDAYS/DAYLIGHT SAVINGS', 'COMMENTS 1', 'COMMENTS 2'):
+            f.write('%s,0\n' % keyword)
+        f.write('DATA PERIODS,1,1,Data,Sunday, 1/ 1,12/31\n')
+        for month, days in enumerate(month_days, 1):
+            for day in range(1, days + 1):
+                for hour in range(1, 25):
+                    f.write('1999,%d,%d,%d,60,?9?9?9,%.1f,0.0,50,101325%s\n' % (
+                        month, day, hour, temperature(month, hour), ',0' * 22
+                    ))
+
+
+class TestRunMode(unittest.TestCase):
+    def scan(self, text):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'in.idf')
+            with open(path, 'w') as f:
+                f.write(text)
+            return IDFScanner(path).scan()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_patches_simulation_control(self):
+        patched = sizing_only_text(SAMPLE_IDF)
+        summary = self.scan(patched)
+        self.assertEqual(summary.simulation_control, {'do_zone_sizing': True, 'do_system_sizing': False,
+                                                      'do_plant_sizing': False, 'run_sizing_periods': False,
+                                                      'run_weather_file_periods': False})
+        self.assertEqual(summary.object_counts['simulationcontrol'], 1)
+        self.assertIn('    No,                     !- Run Simulation for Sizing Periods\n', patched)
+
+    def test_fills_in_defaulted_fields(self):
+        summary = self.scan(sizing_only_text('Version,9.0;\nSimulationControl,Yes,Yes;\n'))
+        self.assertTrue(summary.simulation_control['do_system_sizing'])
+        self.assertFalse(summary.simulation_control['run_sizing_periods'])
+        self.assertFalse(summary.simulation_control['run_weather_file_periods'])
+
+    def test_adds_missing_simulation_control(self):
+        summary = self.scan(sizing_only_text('Version,9.0;\nSizing:Zone,Core;  ! no simulation control\n'))
+        self.assertEqual(summary.simulation_control, {'do_zone_sizing': True, 'do_system_sizing': False,
+                                                      'do_plant_sizing': False, 'run_sizing_periods': False,
+                                                      'run_weather_file_periods': False})
+        # a macro file may get its simulation control from an include, so it is left alone
+        self.assertIsNone(sizing_only_text('##include header.imf\nZone,One;\n', is_macro=True))
+
+    @unittest.skipIf(os.name != 'posix', "Run mode tests use a shell script stand-in")
+    def test_thread_runs_patched_copy(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # copies the input it was given, which only exists while the simulation runs
+            script = make_stub_energyplus(temp_dir, 'echo "$@" > %s; for last; do :; done; cp "$last" %s' % (
+                os.path.join(temp_dir, 'args'), os.path.join(temp_dir, 'given.idf')))
+            input_file = os.path.join(temp_dir, 'in.idf')
+            with open(input_file, 'w') as f:
+                f.write(SAMPLE_IDF)
+            for mode in RunMode.All:
+                thread = EnergyPlusThread(script, input_file, 'w.epw', lambda message: None, lambda *args: None,
+                                          None, None, run_mode=mode)
+                thread.start()
+                thread.join()
+                with open(os.path.join(temp_dir, 'args')) as f:
+                    args = f.read().split()
+                self.assertEqual('-D' in args, mode == RunMode.DesignDay)
+                self.assertEqual(args[-1] == input_file, mode != RunMode.SizingOnly)
+                self.assertEqual(os.listdir(temp_dir).count('in.idf'), 1)
+                self.assertEqual(len([name for name in os.listdir(temp_dir) if name.startswith('.sizing-')]), 0)
+            self.assertFalse(self.scan(open(os.path.join(temp_dir, 'given.idf')).read()).simulation_control[
+                'run_sizing_periods'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestFileWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.temp_dir, 'in.idf')
+        self.write(self.input_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def write(path, text='Version,9.0;\n'):
+        with open(path, 'a') as f:
+            f.write(text)
+
+    def watch(self, use_inotify):
+        changes = []
+        changed = threading.Event()
+
+        def on_change(paths):
+            changes.append(paths)
+            changed.set()
+        watcher = FileWatcher(lambda: [self.input_file], on_change, debounce=0.3, poll_interval=0.05,
+                              use_inotify=use_inotify)
+        watcher.start()
+        try:
+            time.sleep(0.05)  # the polling backend needs a later modified time than the one in its first snapshot
+            for _ in range(3):
+                self.write(self.input_file)
+                self.write(os.path.join(self.temp_dir, 'other.idf'))
+                time.sleep(0.05)
+            self.assertTrue(changed.wait(10))
+            time.sleep(0.5)
+        finally:
+            watcher.stop()
+            watcher.join()
+        return changes, watcher
+
+    def test_polling_debounces_saves(self):
+        changes, watcher = self.watch(False)
+        self.assertEqual(changes, [[self.input_file]])
+
+    @unittest.skipIf(not sys.platform.startswith('linux'), "inotify is only available on Linux")
+    def test_inotify_debounces_saves(self):
+        changes, watcher = self.watch(True)
+        self.assertIsInstance(watcher.backend, InotifyBackend)
+        self.assertEqual(changes, [[self.input_file]])
+
+    def test_watched_files_include_macro_includes(self):
+        macro = os.path.join(self.temp_dir, 'in.imf')
+        self.write(macro, '##include header.imf\n')
+        self.write(os.path.join(self.temp_dir, 'header.imf'))
+        self.assertEqual(watched_files(macro, 'w.epw'), [macro, 'w.epw', os.path.join(self.temp_dir, 'header.imf')])
+
+
+class TestWeatherFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.epw = os.path.join(self.temp_dir, 'w.epw')
+        make_epw(self.epw, lambda month, hour: month * 2.0 + (1.0 if hour > 12 else -1.0))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_header_only_until_needed(self):
+        weather = WeatherFile(self.epw)
+        self.assertEqual(weather.location.describe(), 'Testville, ST, USA')
+        self.assertAlmostEqual(weather.location.latitude, 41.98)
+        self.assertIsNone(weather._columns)
+
+    def test_statistics(self):
+        weather = WeatherFile(self.epw)
+        self.assertEqual(len(weather.column('dry_bulb')), 8760)
+        self.assertEqual(weather.data_period_days(), 365)
+        self.assertEqual(weather.monthly_means(), [month * 2.0 for month in range(1, 13)])
+        # monthly means of 2 C per month number put January through August below 18 C and October onward above it
+        month_days = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+        heating, cooling = weather.degree_days()
+        self.assertAlmostEqual(heating, sum((18.0 - 2.0 * m) * month_days[m - 1] for m in range(1, 9)))
+        self.assertAlmostEqual(cooling, sum((2.0 * m - 18.0) * month_days[m - 1] for m in range(10, 13)))
+        design = weather.design_temperatures()
+        self.assertEqual(design['heating_99_6'], 1.0)
+        self.assertEqual(design['cooling_0_4'], 25.0)
+        self.assertEqual(weather.statistics()['hours'], 8760)
+
+    def test_missing_hours(self):
+        # the first two hours of every January day are missing, and all of December is
+        make_epw(self.epw, lambda month, hour: WeatherFile.MissingDryBulb if month == 12 or (month == 1 and hour < 3)
+                 else (1.0 if hour > 12 else -1.0))
+        weather = WeatherFile(self.epw)
+        daily = weather.daily_means()
+        self.assertAlmostEqual(daily[0], (12 * 1.0 - 10 * 1.0) / 22)
+        self.assertEqual(daily[31], 0.0)
+        self.assertEqual(daily[-31:], [None] * 31)
+        monthly = weather.monthly_means()
+        self.assertAlmostEqual(monthly[0], (12 * 1.0 - 10 * 1.0) / 22)
+        self.assertIsNone(monthly[11])
+        heating, cooling = weather.degree_days()
+        self.assertAlmostEqual(heating, 31 * (18.0 - 2.0 / 22) + (365 - 62) * 18.0)
+        self.assertEqual(cooling, 0.0)
+        self.assertEqual(weather.design_temperatures()['cooling_0_4'], 1.0)
+
+    def test_sidecar(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        parsed = WeatherFile(self.epw, cache_dir)
+        expected = list(parsed.column('dry_bulb'))
+        self.assertTrue(os.path.exists(parsed.sidecar_path()))
+        loaded = WeatherFile(self.epw, cache_dir)
+        self.assertEqual(loaded._load_sidecar()['dry_bulb'].tolist(), expected)
+        self.assertEqual(loaded.monthly_means(), parsed.monthly_means())
+        # a changed weather file must never be served from a stale sidecar
+        make_epw(self.epw, lambda month, hour: 30.0)
+        os.utime(self.epw, (time.time() + 10, time.time() + 10))
+        self.assertEqual(WeatherFile(self.epw, cache_dir).monthly_means(), [30.0] * 12)
+
+
+class TestWeatherLibrary(unittest.TestCase):
+    Sites = [
+        ('USA_IL_Chicago-OHare.Intl.AP.725300_TMY3.epw', 'Chicago Ohare Intl,IL,USA,TMY3,725300,41.98,-87.92,-6,201'),
+        ('USA_CO_Golden-NREL.724666_TMY3.epw', 'Golden NREL,CO,USA,TMY3,724666,39.74,-105.18,-7,1829'),
+        ('USA_IL_Peoria.725320_TMY3.epw', 'Greater Peoria Rgnl Ap,IL,USA,TMY3,725320,40.67,-89.68,-6,199'),
+        ('ESP_Madrid.082210_IWEC.epw', 'MADRID,-,ESP,IWEC Data,082210,40.45,-3.55,1,582'),
+    ]
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file_name = os.path.join(self.temp_dir, 'library.json')
+        self.folder = os.path.join(self.temp_dir, 'weather')
+        os.makedirs(os.path.join(self.folder, 'usa'))
+        for file_name, location in TestWeatherLibrary.Sites:
+            sub_folder = 'usa' if file_name.startswith('USA') else ''
+            with open(os.path.join(self.folder, sub_folder, file_name), 'w') as f:
+                f.write('LOCATION,%s\nDESIGN CONDITIONS,0\n' % location)
+        open(os.path.join(self.folder, 'readme.txt'), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_search(self):
+        library = WeatherLibrary(self.index_file_name, [self.folder])
+        self.assertEqual(len(library.stations()), 4)
+        self.assertEqual([s.wmo for s in library.search('chic')], ['725300'])
+        self.assertEqual([s.wmo for s in library.search('il tmy3')], ['725300', '725320'])
+        self.assertEqual(library.search('peoria madrid'), [])
+        self.assertEqual([s.wmo for s in library.search('082210')], ['082210'])
+        self.assertEqual([s.city for s in library.in_region('usa', 'co')], ['Golden NREL'])
+
+    def test_nearest(self):
+        library = WeatherLibrary(None, [self.folder])
+        nearest = library.nearest(41.88, -87.63, 2)
+        self.assertEqual([station.wmo for _distance, station in nearest], ['725300', '725320'])
+        self.assertLess(nearest[0][0], 30)
+        self.assertEqual(library.nearest(40.4, -3.7, 1)[0][1].city, 'MADRID')
+        self.assertEqual(len(library.nearest(0, 0, 10)), 4)
+        self.assertAlmostEqual(great_circle_km(0, 0, 0, 1), 111.19, places=1)
+
+    def test_incremental_refresh(self):
+        WeatherLibrary(self.index_file_name, [self.folder]).stations()
+        with open(self.index_file_name) as f:
+            self.assertEqual(len(json.load(f)['stations']), 4)
+        # a saved index is used as is while no library folder has changed
+        reloaded = WeatherLibrary(self.index_file_name, [self.folder])
+        self.assertEqual(len(reloaded.stations()), 4)
+        new_file = os.path.join(self.folder, 'usa', 'USA_IL_Rockford.725430_TMY3.epw')
+        with open(new_file, 'w') as f:
+            f.write('LOCATION,Rockford,IL,USA,TMY3,725430,42.2,-89.1,-6,221\n')
+        os.utime(os.path.join(self.folder, 'usa'), (time.time() + 10, time.time() + 10))
+        library = WeatherLibrary(self.index_file_name, [self.folder])
+        self.assertEqual([s.wmo for s in library.search('rock')], ['725430'])
+
+
+class TestStreamReader(unittest.TestCase):
+    def test_both_pipes_streamed_with_bounded_tail(self):
+        # write far more than a pipe buffer to stderr first, which deadlocks a reader that drains stdout only
+        code = ("import sys\n"
+                "for i in range(20000): sys.stderr.write('err %d\\n' % i)\n"
+                "for i in range(20000): sys.stdout.write('out %d\\n' % i)\n")
+        p = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        lines = []
+        reader = StreamReader(p.stdout, p.stderr, lines.append, max_lines=10)
+        reader.start()
+        reader.join()
+        p.wait()
+        self.assertEqual(len(lines), 40000)
+        self.assertEqual(reader.line_count, 40000)
+        self.assertEqual(reader.std_out().splitlines(), ['out %d' % i for i in range(19990, 20000)])
+        self.assertEqual(reader.std_err().splitlines()[-1], 'err 19999')
+
+    def test_missing_stderr_pipe(self):
+        p = subprocess.Popen([sys.executable, '-c', 'print("hello")'], stdout=subprocess.PIPE)
+        reader = StreamReader(p.stdout, None)
+        reader.start()
+        reader.join()
+        p.wait()
+        self.assertEqual(reader.std_out(), 'hello')
+        self.assertEqual(reader.std_err(), '')
+
+
+@unittest.skipIf(os.name != 'posix', "Stub EnergyPlus scripts require a posix shell")
+class TestSimulationQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_all_jobs_complete(self):
+        script = make_stub_energyplus(self.temp_dir)
+        queue = SimulationQueue(script, max_workers=2)
+        pairs = [(os.path.join(self.temp_dir, 'in%d.idf' % i), 'w.epw') for i in range(5)]
+        jobs = queue.submit_many(pairs)
+        self.assertTrue(queue.wait(10))
+        self.assertEqual([job.status for job in jobs], [JobStatus.Succeeded] * 5)
+        self.assertEqual(queue.status_counts()[JobStatus.Succeeded], 5)
+        self.assertTrue(jobs[0].run_dir.endswith('output-in0'))
+
+    def test_missing_executable_fails_the_job(self):
+        messages = []
+        allocator = RunDirectoryAllocator(root=os.path.join(self.temp_dir, 'runs'))
+        queue = SimulationQueue(os.path.join(self.temp_dir, 'missing', 'EnergyPlus'), run_dir_allocator=allocator,
+                                msg_callback=lambda job, message: messages.append(message))
+        job = queue.submit(os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+        self.assertTrue(queue.wait(10))
+        self.assertEqual(job.status, JobStatus.Failed)
+        self.assertIn(os.path.join('missing', 'EnergyPlus'), messages[-1])
+        self.assertEqual(allocator._active, set())
+
+    def test_stalled_jobs_are_failed(self):
+        script = make_stub_energyplus(self.temp_dir)
+
+        def broken_callback(job, message):
+            if job.job_id == 1:
+                raise RuntimeError("stop the simulation thread without a result")
+        saved_hook = getattr(threading, 'excepthook', None)
+        if saved_hook is not None:
+            threading.excepthook = lambda hook_args: None  # the exception is expected, so it is not reported
+        try:
+            queue = SimulationQueue(script, msg_callback=broken_callback)
+            jobs = queue.submit_many([(os.path.join(self.temp_dir, 'in%d.idf' % i), 'w.epw') for i in range(2)])
+            # the first job is started right away and its thread dies, leaving the second job waiting behind it
+            jobs[0].thread.join(10)
+        finally:
+            if saved_hook is not None:
+                threading.excepthook = saved_hook
+        self.assertFalse(queue.wait(0.1))
+        self.assertEqual(queue.fail_stalled(), [jobs[0]])
+        self.assertEqual(jobs[0].status, JobStatus.Failed)
+        self.assertTrue(queue.wait(10))
+        self.assertEqual(jobs[1].status, JobStatus.Succeeded)
+
+    def test_output_is_forwarded_line_by_line(self):
+        script = make_stub_energyplus(self.temp_dir, 'echo first; echo second; echo oops >&2')
+        messages = []
+        queue = SimulationQueue(script, msg_callback=lambda job, message: messages.append(message))
+        job = queue.submit(os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+        self.assertTrue(queue.wait(10))
+        self.assertIn('first', messages)
+        self.assertIn('oops', messages)
+        self.assertEqual(job.std_out, 'first\nsecond')
+
+    def test_progress_is_reported(self):
+        script = make_stub_energyplus(
+            self.temp_dir,
+            'echo "Starting Simulation at 01/01 for RUN PERIOD 1"\n'
+            'echo "Continuing Simulation at 07/02 for RUN PERIOD 1"'
+        )
+        reported = []
+        queue = SimulationQueue(script, progress_callback=lambda job, progress: reported.append(progress.percent))
+        job = queue.submit(os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+        self.assertTrue(queue.wait(10))
+        self.assertIsNone(reported[0])
+        self.assertAlmostEqual(job.progress.percent, 100.0 * 182 / 365)
+
+    def test_failures_are_reported_per_job(self):
+        script = make_stub_energyplus(self.temp_dir, 'case "$*" in *bad*) exit 1;; esac')
+        queue = SimulationQueue(script, max_workers=4)
+        good = queue.submit(os.path.join(self.temp_dir, 'good.idf'), 'w.epw')
+        bad = queue.submit(os.path.join(self.temp_dir, 'bad.idf'), 'w.epw')
+        self.assertTrue(queue.wait(10))
+        self.assertEqual(good.status, JobStatus.Succeeded)
+        self.assertEqual(bad.status, JobStatus.Failed)
+
+    def test_concurrency_limit(self):
+        script = make_stub_energyplus(self.temp_dir, 'sleep 0.2')
+        peak = [0]
+        lock = threading.Lock()
+
+        def on_job(_job):
+            with lock:
+                peak[0] = max(peak[0], queue.status_counts()[JobStatus.Running])
+
+        queue = SimulationQueue(script, max_workers=2, job_callback=on_job)
+        queue.submit_many([(os.path.join(self.temp_dir, 'in%d.idf' % i), 'w.epw') for i in range(6)])
+        self.assertTrue(queue.wait(10))
+        self.assertEqual(peak[0], 2)
+
+    def test_cancel_all(self):
+        # the stub is a wrapper with a child of its own, and is cancelled before it may even have started
+        script = make_stub_energyplus(self.temp_dir, 'sleep 5')
+        finished = threading.Event()
+        queue = SimulationQueue(script, max_workers=1, finished_callback=finished.set)
+        jobs = queue.submit_many([(os.path.join(self.temp_dir, 'in%d.idf' % i), 'w.epw') for i in range(3)])
+        queue.cancel_all()
+        self.assertTrue(queue.wait(10))
+        self.assertTrue(finished.is_set())
+        self.assertEqual([job.status for job in jobs], [JobStatus.Cancelled] * 3)
+
+    def test_run_dir_allocator_separates_repeated_inputs(self):
+        script = make_stub_energyplus(self.temp_dir, 'sleep 0.1')
+        queue = SimulationQueue(script, max_workers=3, run_dir_allocator=RunDirectoryAllocator())
+        jobs = queue.submit_many([(os.path.join(self.temp_dir, 'in.idf'), 'w%d.epw' % i) for i in range(3)])
+        self.assertTrue(queue.wait(10))
+        self.assertEqual(len(set(job.run_dir for job in jobs)), 3)
+
+    def test_result_cache_skips_identical_runs(self):
+        count_file = os.path.join(self.temp_dir, 'count')
+        script = make_stub_energyplus(
+            self.temp_dir,
+            'while [ "$1" != "-d" ]; do shift; done; mkdir -p "$2"; echo results > "$2/eplusout.err"; '
+            'echo run >> %s; echo done' % count_file
+        )
+        input_file = os.path.join(self.temp_dir, 'in.idf')
+        weather_file = os.path.join(self.temp_dir, 'w.epw')
+        for path in (input_file, weather_file):
+            with open(path, 'w') as f:
+                f.write('contents')
+        queue = SimulationQueue(script, max_workers=1, result_cache=ResultCache(os.path.join(self.temp_dir, 'cache')),
+                                run_dir_allocator=RunDirectoryAllocator(root=os.path.join(self.temp_dir, 'runs')))
+        first = queue.submit(input_file, weather_file)
+        self.assertTrue(queue.wait(10))
+        second = queue.submit(input_file, weather_file)
+        self.assertTrue(queue.wait(10))
+        with open(count_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(second.status, JobStatus.Succeeded)
+        self.assertEqual(second.std_out, first.std_out)
+        # the hit is copied into a run directory of its own, so nothing done with the results reaches the cache
+        self.assertNotEqual(second.run_dir, first.run_dir)
+        self.assertTrue(second.run_dir.startswith(os.path.join(self.temp_dir, 'runs')))
+        with open(os.path.join(second.run_dir, 'eplusout.err')) as f:
+            self.assertEqual(f.read(), 'results\n')
+
+    def test_result_cache_covers_schedule_files(self):
+        count_file = os.path.join(self.temp_dir, 'count')
+        script = make_stub_energyplus(self.temp_dir, 'while [ "$1" != "-d" ]; do shift; done; mkdir -p "$2"; '
+                                                     'echo run >> %s' % count_file)
+        input_file = os.path.join(self.temp_dir, 'in.idf')
+        with open(input_file, 'w') as f:
+            f.write('Schedule:File, Occupancy, Any Number, schedules/occupancy.csv, 2;\n')
+        weather_file = os.path.join(self.temp_dir, 'w.epw')
+        open(weather_file, 'w').close()
+        schedule_file = os.path.join(make_folder(self.temp_dir, 'schedules'), 'occupancy.csv')
+        queue = SimulationQueue(script, max_workers=1, result_cache=ResultCache(os.path.join(self.temp_dir, 'cache')))
+        for contents in ('1', '1', '2'):
+            with open(schedule_file, 'w') as f:
+                f.write(contents)
+            queue.submit(input_file, weather_file)
+            self.assertTrue(queue.wait(10))
+        with open(count_file) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_supersede_cancels_the_outdated_run(self):
+        # only the first simulation is slow, consuming the marker file
+        marker = os.path.join(self.temp_dir, 'slow')
+        open(marker, 'w').close()
+        script = make_stub_energyplus(self.temp_dir, 'if [ -f %s ]; then rm %s; sleep 5; fi' % (marker, marker))
+        queue = SimulationQueue(script, max_workers=1)
+        input_file = os.path.join(self.temp_dir, 'in.idf')
+        outdated = queue.submit(input_file, 'w.epw')
+        other = queue.submit(os.path.join(self.temp_dir, 'other.idf'), 'w.epw')
+        while os.path.exists(marker):
+            time.sleep(0.01)
+        started = time.time()
+        current = queue.supersede(input_file, 'w.epw')
+        self.assertEqual(queue.cancel_input(other.input_file), [other])
+        self.assertTrue(queue.wait(10))
+        self.assertLess(time.time() - started, 4)
+        self.assertEqual([outdated.status, other.status, current.status],
+                         [JobStatus.Cancelled, JobStatus.Cancelled, JobStatus.Succeeded])
+
+    def test_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            SimulationQueue('/dummy/', max_workers=0)
+
+
+@unittest.skipIf(os.name != 'posix', "Post processing tests use shell script stand-ins")
+class TestPostProcessing(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # records its flags and writes an eso file, as EnergyPlus does when ReadVarsESO is left out
+        self.script = make_stub_energyplus(
+            self.temp_dir,
+            'echo "$@" > %s; while [ "$1" != "-p" ]; do shift; done; mkdir -p "$4"; echo eso > "$4/$2out.eso"'
+            % os.path.join(self.temp_dir, 'args')
+        )
+        os.mkdir(os.path.join(self.temp_dir, 'PostProcess'))
+        self.read_vars = os.path.join(self.temp_dir, 'PostProcess', 'ReadVarsESO')
+        with open(self.read_vars, 'w') as f:
+            # converts the file named on the first line of the instructions into the one named on the second
+            f.write('#!/bin/sh\n{ read source; read target; } < "$1"\ncp "$source" "$target"\n')
+        os.chmod(self.read_vars, os.stat(self.read_vars).st_mode | stat.S_IEXEC)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_eso(self, base_file_name):
+        run_dir = os.path.join(self.temp_dir, 'run')
+        os.mkdir(run_dir)
+        with open(os.path.join(run_dir, base_file_name + 'out.eso'), 'w') as f:
+            f.write('eso\n')
+        return run_dir
+
+    def test_task_converts_on_demand(self):
+        run_dir = self.write_eso('in')
+        task = PostProcessTask(self.script, run_dir, 'in')
+        self.assertEqual(task.status, PostProcessStatus.Deferred)
+        self.assertTrue(task.run())
+        self.assertEqual(task.csv_files, [os.path.join(run_dir, 'inout.csv')])
+        with open(os.path.join(run_dir, 'inout.rvi')) as f:
+            self.assertEqual(f.read(), 'inout.eso\ninout.csv\n')
+        # a second request, or a pool getting to the task late, does not convert again
+        os.remove(self.read_vars)
+        self.assertTrue(task.run())
+        self.assertEqual(task.to_dict()['status'], PostProcessStatus.Done)
+
+    def test_missing_tool_fails(self):
+        os.remove(self.read_vars)
+        task = PostProcessTask(self.script, self.write_eso('in'), 'in')
+        self.assertFalse(task.run())
+        self.assertEqual(task.status, PostProcessStatus.Failed)
+        self.assertIn('ReadVarsESO', task.error)
+
+    def test_queue_defers_to_pool(self):
+        pool = PostProcessPool(max_workers=2, limits=None)
+        queue = SimulationQueue(self.script, max_workers=2, post_process_pool=pool)
+        jobs = queue.submit_many([(os.path.join(self.temp_dir, 'in%d.idf' % i), 'w.epw') for i in range(3)])
+        self.assertTrue(queue.wait(10))
+        self.assertTrue(pool.wait(10))
+        with open(os.path.join(self.temp_dir, 'args')) as f:
+            self.assertNotIn('-r', f.read().split())
+        for job in jobs:
+            self.assertEqual(job.to_dict()['post_processing']['status'], PostProcessStatus.Done)
+            self.assertTrue(os.path.isfile(job.post_processing.csv_files[0]))
+
+    def test_queue_runs_read_vars_by_default(self):
+        queue = SimulationQueue(self.script)
+        job = queue.submit(os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+        self.assertTrue(queue.wait(10))
+        with open(os.path.join(self.temp_dir, 'args')) as f:
+            self.assertIn('-r', f.read().split())
+        self.assertIsNone(job.post_processing)
+
+
+@unittest.skipIf(os.name != 'posix', "Resource limits need a posix system")
+class TestResourceLimits(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            ResourceLimits(nice=40)
+        with self.assertRaises(ValueError):
+            ResourceLimits(cpus=[])
+
+    def test_partition_cpus(self):
+        self.assertEqual(SimulationQueue.partition_cpus([0, 1, 2, 3], 2), [[0, 2], [1, 3]])
+        self.assertEqual(SimulationQueue.partition_cpus([4, 5], 3), [[4], [5], [4]])
+
+    def test_limits_reach_the_simulation(self):
+        script = make_stub_energyplus(self.temp_dir, '\n'.join([
+            'echo "memory $(ulimit -v)"',
+            'echo "cpu $(ulimit -t)"',
+            'echo "nice $(nice)"',
+            'grep Cpus_allowed_list /proc/self/status 2>/dev/null || echo "Cpus_allowed_list: unknown"',
+        ]))
+        limits = ResourceLimits(nice=3, memory_bytes=512 * 1024 * 1024, cpu_seconds=600)
+        queue = SimulationQueue(script, max_workers=2, limits=limits, pin_cpus=True)
+        job = queue.submit(os.path.join(self.temp_dir, 'in.idf'), 'w.epw')
+        self.assertTrue(queue.wait(10))
+        lines = dict(line.split(None, 1) for line in job.std_out.splitlines())
+        self.assertEqual(lines['memory'], str(512 * 1024))
+        self.assertEqual(lines['cpu'], '600')
+        self.assertEqual(int(lines['nice']), os.nice(0) + 3)
+        if hasattr(os, 'sched_getaffinity') and lines['Cpus_allowed_list:'] != 'unknown':
+            # the first slot gets every other cpu, none of which are adjacent, so the kernel lists them one by one
+            first_slot = sorted(os.sched_getaffinity(0))[0::2]
+            self.assertEqual(lines['Cpus_allowed_list:'], ','.join(str(cpu) for cpu in first_slot))
+
+    @unittest.skipIf(available_memory() is None, "Free memory cannot be measured on this platform")
+    def test_jobs_wait_for_memory(self):
+        script = make_stub_energyplus(self.temp_dir, 'sleep 0.2')
+        most_running = []
+
+        def job_changed(job):
+            most_running.append(sum(1 for j in queue.jobs if j.status == JobStatus.Running))
+        # no machine has this much memory free, so the jobs run one at a time despite the free slots
+        queue = SimulationQueue(script, max_workers=3, job_callback=job_changed, job_memory=1 << 60)
+        jobs = queue.submit_many([(os.path.join(self.temp_dir, 'in%d.idf' % i), 'w.epw') for i in range(3)])
+        self.assertTrue(queue.wait(10))
+        self.assertEqual([job.status for job in jobs], [JobStatus.Succeeded] * 3)
+        self.assertEqual(max(most_running), 1)
+
+
+@unittest.skipIf(os.name != 'posix', "Stub EnergyPlus scripts require a posix shell")
+class TestUpdateChannel(unittest.TestCase):
+    def setUp(self):
+        # stands in for gobject.timeout_add, recording the deliveries the main loop would make
+        self.scheduled = []
+        self.channel = UpdateChannel(lambda milliseconds, function: self.scheduled.append((milliseconds, function)),
+                                     frame_rate=25, max_output_lines=3)
+
+    def test_updates_are_batched_into_one_delivery(self):
+        delivered = []
+        self.channel.post_latest('status', delivered.append, 'first')
+        for i in range(5):
+            self.channel.post_line('output', lambda lines, skipped: delivered.append((lines, skipped)), str(i))
+        self.channel.post_latest('status', delivered.append, 'latest')
+        self.channel.post(delivered.append, 'done')
+        self.assertEqual([milliseconds for milliseconds, _function in self.scheduled], [40])
+        self.assertFalse(self.scheduled[0][1]())
+        # the output went in before the latest status, and only the last three lines were kept
+        self.assertEqual(delivered, [(['2', '3', '4'], 2), 'latest', 'done'])
+
+    def test_next_post_schedules_again(self):
+        delivered = []
+        self.channel.deliver()
+        self.channel.post(delivered.append, 1)
+        self.channel.post(delivered.append, 2)
+        self.assertEqual(len(self.scheduled), 1)
+        self.channel.deliver()
+        self.channel.post(delivered.append, 3)
+        self.assertEqual(len(self.scheduled), 2)
+        self.channel.deliver()
+        self.assertEqual(delivered, [1, 2, 3])
+
+    def test_failed_call_does_not_stop_delivery(self):
+        delivered = []
+
+        def fail(value):
+            raise ValueError("bad update %s" % value)
+        self.channel.post(delivered.append, 1)
+        self.channel.post(fail, 2)
+        self.channel.post_latest('status', delivered.append, 3)
+        stderr = sys.stderr
+        sys.stderr = tempfile.TemporaryFile('w+')
+        try:
+            self.assertFalse(self.channel.deliver())
+            sys.stderr.seek(0)
+            logged = sys.stderr.read()
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+        self.assertEqual(delivered, [1, 3])
+        self.assertIn('ValueError: bad update 2', logged)
+
+    def test_posts_from_many_threads(self):
+        delivered = []
+
+        def worker(job):
+            for i in range(200):
+                self.channel.post_latest(job, lambda value, key=job: delivered.append((key, value)), i)
+        threads = [threading.Thread(target=worker, args=(job,)) for job in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.channel.deliver()
+        self.assertEqual(sorted(delivered), [(job, 199) for job in range(4)])
+        self.assertEqual(len(self.scheduled), 1)
+
+
+class TestVersionCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, 'versions.json')
+        self.script = make_stub_energyplus(self.temp_dir, 'echo "EnergyPlus, Version 8.6.0-198c6a3cff"')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_probe_then_cached(self):
+        cache = VersionCache(self.cache_file)
+        self.assertIsNone(cache.get(self.script))
+        self.assertEqual(cache.probe(self.script), 'EnergyPlus, Version 8.6.0-198c6a3cff')
+        # a new instance reads the persisted entry without running the executable
+        self.assertEqual(VersionCache(self.cache_file).get(self.script), 'EnergyPlus, Version 8.6.0-198c6a3cff')
+
+    def test_changed_binary_is_stale(self):
+        cache = VersionCache(self.cache_file)
+        cache.probe(self.script)
+        make_stub_energyplus(self.temp_dir, 'echo "EnergyPlus, Version 9.0.1-bd2bcd8b1e"')
+        self.assertIsNone(cache.get(self.script))
+
+    def test_missing_binary(self):
+        self.assertIsNone(VersionCache().get(os.path.join(self.temp_dir, 'nothing')))
+
+    def test_background_probe(self):
+        results = []
+        VersionCache().probe_in_background(self.script, results.append).join(10)
+        self.assertEqual(results, ['EnergyPlus, Version 8.6.0-198c6a3cff'])
+        results = []
+        VersionCache().probe_in_background(os.path.join(self.temp_dir, 'nothing'), results.append).join(10)
+        self.assertEqual(results, [None])
+
+
+@unittest.skipIf(os.name != 'posix', "Stub EnergyPlus scripts require a posix shell")
+class TestParametricSweep(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # the stub writes a marker into its run directory so the tests can tell the directories apart
+        body = 'while [ "$1" != "-d" ]; do shift; done; mkdir -p "$2"; echo "$4" > "$2/weather.txt"'
+        self.script_a = make_stub_energyplus(make_folder(self.temp_dir, 'EnergyPlus-9-0-1'), body)
+        self.script_b = make_stub_energyplus(make_folder(self.temp_dir, 'EnergyPlus-9-1-0'), body)
+        self.files = {}
+        for name, contents in (('a.idf', 'a'), ('b.idf', 'b'), ('copy_of_a.idf', 'a'), ('x.epw', 'x'), ('y.epw', 'y')):
+            self.files[name] = os.path.join(self.temp_dir, name)
+            with open(self.files[name], 'w') as f:
+                f.write(contents)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_expand_patterns(self):
+        self.assertEqual(expand_patterns(['*.epw', 'x.epw'], self.temp_dir), [self.files['x.epw'], self.files['y.epw']])
+
+    def test_expand_removes_equivalent_jobs(self):
+        sweep = ParametricSweep(
+            [self.files['a.idf'], self.files['b.idf'], self.files['copy_of_a.idf']],
+            [self.files['x.epw'], self.files['y.epw']],
+            [('9-0-1', self.script_a), ('9-1-0', self.script_b)],
+            os.path.join(self.temp_dir, 'out')
+        )
+        jobs = sweep.expand()
+        self.assertEqual(len(jobs), 8)
+        self.assertEqual(len(set(job.run_dir for job in jobs)), 8)
+        self.assertEqual(sum(len(job.duplicates) for job in jobs), 4)
+
+    def test_matrix_run_and_summary(self):
+        matrix_file = os.path.join(self.temp_dir, 'matrix.json')
+        with open(matrix_file, 'w') as f:
+            json.dump({'idf': ['a.idf', 'b.idf'], 'epw': ['*.epw'], 'versions': ['9-0-1', '9-1-0']}, f)
+        engines = {'9-0-1': self.script_a, '9-1-0': self.script_b}
+        sweep = ParametricSweep.from_matrix_file(matrix_file, lambda version: (version, engines[version]))
+        queue = sweep.run(max_workers=4)
+        self.assertEqual(queue.status_counts()[JobStatus.Succeeded], 8)
+        for job in sweep.jobs:
+            with open(os.path.join(job.run_dir, 'weather.txt')) as f:
+                self.assertEqual(f.read().strip(), job.weather_file)
+        csv_file = os.path.join(self.temp_dir, 'summary.csv')
+        sweep.write_summary_csv(csv_file)
+        with open(csv_file) as f:
+            self.assertEqual(len(f.readlines()), 9)
+        self.assertEqual(len(sweep.format_summary().splitlines()), 9)
+
+    def test_missing_version(self):
+        matrix_file = os.path.join(self.temp_dir, 'matrix.json')
+        with open(matrix_file, 'w') as f:
+            json.dump({'idf': ['a.idf'], 'epw': ['x.epw'], 'versions': ['7-2-0']}, f)
+        with self.assertRaises(ValueError):
+            ParametricSweep.from_matrix_file(matrix_file, lambda version: None)
+
+    def test_summary_reports_the_actual_run_dir(self):
+        job = SweepJob(self.files['a.idf'], self.files['x.epw'], '9-0-1', self.script_a, 'key')
+        job.run_dir = os.path.join(self.temp_dir, 'planned')
+        self.assertEqual(job.summary_row()['run_dir'], job.run_dir)
+        job.queue_job = SimulationJob(1, job.input_file, job.weather_file, job.run_script, job.run_dir)
+        job.queue_job.run_dir = os.path.join(self.temp_dir, 'actual')
+        self.assertEqual(job.summary_row()['run_dir'], job.queue_job.run_dir)
+
+
+@unittest.skipIf(os.name != 'posix', "The benchmark stub requires a posix shell")
+class TestBenchmarks(unittest.TestCase):
+    def test_quick_benchmarks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            output_file = os.path.join(temp_dir, 'results.json')
+            benchmark = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'benchmark',
+                                     'benchmark_launcher.py')
+            self.assertEqual(subprocess.call([sys.executable, benchmark, '--quick', '--output', output_file]), 0)
+            with open(output_file) as f:
+                results = json.load(f)['benchmarks']
+            self.assertEqual(sorted(results), ['cancel_latency', 'cancel_latency_escalated', 'dispatch_latency',
+                                               'stdout_memory', 'throughput'])
+            self.assertGreater(results['throughput']['1']['jobs_per_second'], 0)
+            self.assertEqual(results['dispatch_latency']['complete_seconds']['count'], 3)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+@unittest.skipIf(os.name != 'posix', "Stub EnergyPlus scripts require a posix shell")
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.script = make_stub_energyplus(self.temp_dir, 'case "$*" in *bad*) exit 1;; esac; echo done')
+        for name in ('good.idf', 'bad.idf', 'w.epw'):
+            open(os.path.join(self.temp_dir, name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def run_main(self, argv):
+        # capture the json written to stdout
+        output_file_name = self.path('output.json')
+        saved_stdout = sys.stdout
+        try:
+            with open(output_file_name, 'w') as sys.stdout:
+                code = main(argv)
+        finally:
+            sys.stdout = saved_stdout
+        with open(output_file_name) as f:
+            text = f.read()
+        return code, json.loads(text) if text else None
+
+    def test_single_run(self):
+        code, result = self.run_main(['run', self.path('good.idf'), self.path('w.epw'),
+                                      '--energyplus', self.script, '--no-cache', '-q'])
+        self.assertEqual(code, ExitCodes.Success)
+        self.assertEqual(result['summary']['succeeded'], 1)
+        self.assertEqual(result['jobs'][0]['std_out'], 'done')
+
+    def test_manifest_with_failure(self):
+        with open(self.path('manifest.json'), 'w') as f:
+            json.dump({'jobs': [{'idf': 'good.idf', 'epw': 'w.epw'}, {'idf': 'bad.idf', 'epw': 'w.epw'}]}, f)
+        self.assertEqual(read_manifest(self.path('manifest.json'))[1], (self.path('bad.idf'), self.path('w.epw')))
+        code, result = self.run_main(['run', '--manifest', self.path('manifest.json'),
+                                      '--energyplus', self.script, '--no-cache', '-q', '-j', '2'])
+        self.assertEqual(code, ExitCodes.SimulationFailed)
+        self.assertEqual([job['status'] for job in result['jobs']], [JobStatus.Succeeded, JobStatus.Failed])
+
+    def test_manifest_larger_than_the_retention_limit(self):
+        # more runs of one input than keep_runs allows, all of which have to survive to be reported
+        with open(self.path('manifest.json'), 'w') as f:
+            json.dump([{'idf': 'good.idf', 'epw': 'w.epw'}] * 15, f)
+        code, result = self.run_main(['run', '--manifest', self.path('manifest.json'),
+                                      '--energyplus', self.script, '--no-cache', '-q', '-j', '4'])
+        self.assertEqual(code, ExitCodes.Success)
+        run_dirs = [job['run_dir'] for job in result['jobs']]
+        self.assertEqual(len(set(run_dirs)), 15)
+        self.assertTrue(all(os.path.isdir(run_dir) for run_dir in run_dirs))
+
+    def test_bad_manifest(self):
+        with open(self.path('manifest.json'), 'w') as f:
+            json.dump([{'idf': 'good.idf'}], f)
+        with self.assertRaises(UsageError):
+            read_manifest(self.path('manifest.json'))
+
+    def test_sweep(self):
+        # give the inputs different contents, otherwise the sweep folds them into a single job
+        with open(self.path('bad.idf'), 'w') as f:
+            f.write('bad')
+        with open(self.path('matrix.json'), 'w') as f:
+            json.dump({'idf': ['good.idf', 'bad.idf'], 'epw': ['w.epw']}, f)
+        code, result = self.run_main(['sweep', self.path('matrix.json'), '--energyplus', self.script, '--no-cache',
+                                      '-q', '--output-dir', self.path('sweep')])
+        self.assertEqual(code, ExitCodes.SimulationFailed)
+        self.assertEqual(result['summary']['succeeded'], 1)
+        self.assertTrue(os.path.exists(self.path(os.path.join('sweep', 'sweep_summary.csv'))))
+
+    def test_usage_errors(self):
+        self.assertEqual(self.run_main(['run', '--energyplus', self.script])[0], ExitCodes.UsageError)
+        self.assertEqual(self.run_main(['run', self.path('missing.idf'), self.path('w.epw')])[0],
+                         ExitCodes.UsageError)
+        self.assertEqual(self.run_main(['run', self.path('good.idf'), self.path('w.epw'), '--energyplus', self.script,
+                                        '--nice', '40'])[0], ExitCodes.UsageError)
+
+    def test_missing_energyplus(self):
+        not_executable = self.path('EnergyPlus.txt')
+        open(not_executable, 'w').close()
+        for run_script in (self.path('missing'), not_executable):
+            self.assertEqual(self.run_main(['run', self.path('good.idf'), self.path('w.epw'), '--energyplus',
+                                            run_script, '--no-cache', '-q'])[0], ExitCodes.EnergyPlusNotFound)
+        with open(self.path('matrix.json'), 'w') as f:
+            json.dump({'idf': ['good.idf'], 'epw': ['w.epw']}, f)
+        self.assertEqual(self.run_main(['sweep', self.path('matrix.json'), '--energyplus', self.path('missing'),
+                                        '-q'])[0], ExitCodes.EnergyPlusNotFound)
+
+    def test_never_imports_gtk(self):
+        # blocking gtk makes any attempt to import it raise ImportError and exit with a failure code
+        code = "import sys, runpy; sys.modules['gtk'] = None; sys.argv = ['x', 'run', '--help']\n" \
+               "try:\n    runpy.run_module('EPLaunchLite', run_name='__main__')\nexcept SystemExit:\n    pass\n"
+        package_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+        with open(os.devnull, 'w') as devnull:
+            self.assertEqual(subprocess.call([sys.executable, '-c', code], cwd=package_root, stdout=devnull), 0)
+
+
 # allow execution directly as python tests/test_ghx.py
 if __name__ == '__main__':
+    if sys.version_info >= (3, 6):
+        # the asyncio runner tests are written with async syntax, so they live in a module only python 3.6 can read
+        from test_async_runner import TestAsyncRunner
     unittest.main()